@@ -0,0 +1,420 @@
+"""In-process stand-in for the parts of Discord the bot's handlers touch.
+
+`FakeDiscord` owns guilds, members and voice channels, sends every REST call
+the bot makes through a `FakeHTTP` (simulated latency and 429s) and feeds the
+voice state updates a real gateway would send back into `on_voice_state_update`
+(a member joining or leaving, the update that follows a move). Channels and
+members subclass the discord.py types so the bot's isinstance checks hold.
+
+`VirtualClockLoop` runs all of it on a virtual clock: CPU time passes as
+usual, but idle time until the next timer is skipped (or compressed by
+`speed`) unless a worker thread is still running, so minutes of auto-delete timeouts and REST latency take no real time.
+"""
+import asyncio
+import itertools
+import math
+import selectors
+import time
+
+import discord
+
+from bench.fake_http import FakeHTTP, FakeResponse
+
+
+# ——— Virtual clock ——————————————————————————————————————————————
+class _SkippingSelector(selectors.DefaultSelector):
+    def __init__(self, clock: "VirtualClockLoop"):
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout=None):
+        if timeout is None or timeout <= 0 or self.clock.in_executor:
+            # Waiting on a worker thread is real time, not idle time
+            return super().select(timeout)
+        real = 0 if math.isinf(self.clock.speed) else timeout / self.clock.speed
+        started = time.monotonic()
+        events = super().select(real)
+        if not events:
+            # Nothing happened for real: jump the clock to the timer that was waited for
+            self.clock.skipped += timeout - (time.monotonic() - started)
+        return events
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """Event loop whose `time()` skips idle waits; `speed` = inf fast-forwards, 10 waits 1/10 of real time."""
+
+    def __init__(self, speed: float = math.inf):
+        self.speed       = speed
+        self.skipped     = 0.0
+        self.in_executor = 0  # to_thread / run_in_executor jobs still running
+        super().__init__(_SkippingSelector(self))
+
+    def time(self) -> float:
+        return time.monotonic() + self.skipped
+
+    def run_in_executor(self, executor, func, *args):
+        future = super().run_in_executor(executor, func, *args)
+        self.in_executor += 1
+        future.add_done_callback(self._executor_done)
+        return future
+
+    def _executor_done(self, _):
+        self.in_executor -= 1
+
+
+def run(coro, speed: float = math.inf):
+    loop = VirtualClockLoop(speed)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        # Like asyncio.run(): stop what is still running (schedulers, edit queues) before closing
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+# ——— Guild objects ——————————————————————————————————————————————
+class FakeRole(discord.Role):
+    def __init__(self, guild: "FakeGuild", role_id: int, name: str):
+        self.guild        = guild
+        self.id           = role_id
+        self.name         = name
+        self._permissions = 0
+
+    @property
+    def members(self) -> list:
+        return [m for m in self.guild.members if self in m.roles]
+
+    def __repr__(self):
+        return f"<FakeRole id={self.id} name={self.name!r}>"
+
+
+class FakeVoiceState:
+    def __init__(self, channel=None):
+        self.channel = channel
+
+
+class FakeMember(discord.Member):
+    def __init__(self, backend: "FakeDiscord", guild: "FakeGuild", member_id: int, admin: bool = False):
+        self.guild    = guild
+        self._backend = backend
+        self._id      = member_id
+        self._voice   = None
+        self._roles_  = [guild.default_role]
+        self._perms   = discord.Permissions.all() if admin else discord.Permissions.none()
+
+    id                = property(lambda self: self._id)
+    name              = property(lambda self: f"user{self._id}")
+    display_name      = property(lambda self: f"User {self._id}")
+    mention           = property(lambda self: f"<@{self._id}>")
+    roles             = property(lambda self: self._roles_)
+    voice             = property(lambda self: self._voice)
+    guild_permissions = property(lambda self: self._perms)
+
+    def __hash__(self):
+        return hash(self._id)
+
+    def __repr__(self):
+        return f"<FakeMember id={self._id}>"
+
+    async def move_to(self, channel, *, reason=None):
+        if self._voice is None:
+            raise discord.HTTPException(FakeResponse(400, "Bad Request"), "Target user is not connected to voice.")
+        await self._backend.http.request("move_member")
+        self._backend.moved_at[self._id] = asyncio.get_running_loop().time()
+        self._backend.dispatch(self._backend.voice_update(self, channel))
+
+    async def send(self, content=None, **kwargs):
+        await self._backend.http.request("dm")
+        self._backend.dms[self._id] = content
+
+
+class FakeCategory:
+    def __init__(self, guild: "FakeGuild", channel_id: int):
+        self.guild = guild
+        self.id    = channel_id
+        self.name  = "voice"
+
+
+class FakeVoiceChannel(discord.VoiceChannel):
+    def __init__(self, backend: "FakeDiscord", guild: "FakeGuild", channel_id: int, name: str,
+                 category_id: int | None = None, overwrites: dict | None = None, user_limit: int = 0):
+        self._backend      = backend
+        self.guild         = guild
+        self.id            = channel_id
+        self.name          = name
+        self.category_id   = category_id
+        self.user_limit    = user_limit
+        self._fake_ow      = dict(overwrites or {})
+        self.voice_members = []
+
+    members = property(lambda self: self.voice_members)
+
+    @property
+    def overwrites(self) -> dict:
+        # Like discord.py: member targets come back as cached Members, otherwise as Object(type=User)
+        resolved = {}
+        for target, overwrite in self._fake_ow.items():
+            if isinstance(target, discord.Object):
+                target = self.guild.get_member(target.id) or discord.Object(target.id, type=discord.User)
+            resolved[target] = overwrite
+        return resolved
+
+    def __repr__(self):
+        return f"<FakeVoiceChannel id={self.id} name={self.name!r}>"
+
+    async def edit(self, *, name=None, user_limit=None, overwrites=None, reason=None, **_):
+        await self._backend.http.request("edit_channel")
+        if name is not None:
+            self.name = name
+        if user_limit is not None:
+            self.user_limit = user_limit
+        if overwrites is not None:
+            self._fake_ow = dict(overwrites)
+        return self
+
+    async def delete(self, *, reason=None):
+        await self._backend.http.request("delete_channel")
+        if self.guild._channels.pop(self.id, None) is None:
+            raise discord.NotFound(FakeResponse(404, "Not Found"), "Unknown Channel")
+
+    async def send(self, content=None, *, embed=None, view=None, **_):
+        await self._backend.http.request("send_message")
+        if view is not None:
+            self._backend.panels[self.id] = view
+        return FakeMessage(self._backend, self.id, view)
+
+
+class FakeThread:
+    def __init__(self, backend: "FakeDiscord", thread_id: int):
+        self._backend = backend
+        self.id       = thread_id
+
+    async def send(self, content=None, **_):
+        await self._backend.http.request("send_message")
+
+    async def delete(self):
+        await self._backend.delete_thread(self.id)
+
+
+class FakeMessage:
+    def __init__(self, backend: "FakeDiscord", channel_id: int, view=None):
+        self._backend   = backend
+        self.id         = backend.snowflake()
+        self.channel_id = channel_id
+        self.view       = view
+
+    async def create_thread(self, *, name: str, auto_archive_duration: int = 60, **_):
+        await self._backend.http.request("create_thread")
+        thread = FakeThread(self._backend, self._backend.snowflake())
+        self._backend.threads[thread.id] = thread
+        return thread
+
+
+class FakeGuild:
+    def __init__(self, backend: "FakeDiscord", guild_id: int):
+        self._backend     = backend
+        self.id           = guild_id
+        self.name         = f"guild{guild_id}"
+        self.chunked      = True
+        self.default_role = FakeRole(self, guild_id, "@everyone")  # @everyone shares the guild's id
+        self._roles:    dict[int, FakeRole] = {guild_id: self.default_role}
+        self._members:  dict[int, FakeMember] = {}
+        self._channels: dict[int, object] = {}
+        self.category = self._add(FakeCategory(self, backend.snowflake()))
+        self.trigger  = self._add(FakeVoiceChannel(backend, self, backend.snowflake(), "➕ Create", self.category.id))
+
+    def _add(self, channel):
+        self._channels[channel.id] = channel
+        return channel
+
+    @property
+    def members(self) -> list:
+        return list(self._members.values())
+
+    @property
+    def member_count(self) -> int:
+        return len(self._members)
+
+    def add_member(self, member_id: int | None = None, admin: bool = False) -> FakeMember:
+        member = FakeMember(self._backend, self, member_id or self._backend.snowflake(), admin)
+        self._members[member.id] = member
+        return member
+
+    def add_role(self, name: str = "role") -> FakeRole:
+        role = FakeRole(self, self._backend.snowflake(), name)
+        self._roles[role.id] = role
+        return role
+
+    def add_voice_channel(self, channel_id: int | None = None, name: str = "voice") -> FakeVoiceChannel:
+        return self._add(FakeVoiceChannel(self._backend, self, channel_id or self._backend.snowflake(), name))
+
+    def get_member(self, member_id: int):
+        return self._members.get(member_id)
+
+    def get_channel(self, channel_id: int):
+        return self._channels.get(channel_id)
+
+    def get_role(self, role_id: int):
+        return self._roles.get(role_id)
+
+    async def fetch_member(self, member_id: int):
+        await self._backend.http.request("fetch_member")
+        member = self._members.get(member_id)
+        if member is None:
+            raise discord.NotFound(FakeResponse(404, "Not Found"), "Unknown Member")
+        return member
+
+    async def create_voice_channel(self, name: str, *, category=None, overwrites=None, user_limit: int = 0, **_):
+        await self._backend.http.request("create_channel")
+        return self._add(FakeVoiceChannel(
+            self._backend, self, self._backend.snowflake(), name,
+            category.id if category else None, overwrites, user_limit,
+        ))
+
+
+# ——— Interactions ———————————————————————————————————————————————
+class FakeInteractionResponse:
+    def __init__(self, backend: "FakeDiscord"):
+        self._backend = backend
+        self._done    = False
+        self.modal    = None
+        self.message  = None
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _respond(self, message=None):
+        if self._done:
+            raise discord.InteractionResponded(None)
+        await self._backend.http.request("interaction_response")
+        self._done   = True
+        self.message = message
+
+    async def send_message(self, content=None, **kwargs):
+        await self._respond(content if content is not None else kwargs.get("embed"))
+
+    async def edit_message(self, **kwargs):
+        await self._respond(kwargs.get("embed"))
+
+    async def defer(self, **_):
+        await self._respond()
+
+    async def send_modal(self, modal):
+        await self._respond()
+        self.modal = modal
+
+
+class FakeFollowup:
+    def __init__(self, backend: "FakeDiscord"):
+        self._backend = backend
+
+    async def send(self, content=None, **_):
+        await self._backend.http.request("followup")
+
+
+class FakeInteraction:
+    """What the bot's command and component callbacks read from a discord.Interaction."""
+
+    def __init__(self, backend: "FakeDiscord", guild: FakeGuild, user: FakeMember,
+                 channel_id: int | None = None, custom_id: str | None = None):
+        self._backend   = backend
+        self.client     = backend.client
+        self.guild      = guild
+        self.guild_id   = guild.id
+        self.user       = user
+        self.channel_id = channel_id
+        self.data       = {"custom_id": custom_id} if custom_id else {}
+        self.extras     = {}
+        self.command    = None
+        self.response   = FakeInteractionResponse(backend)
+        self.followup   = FakeFollowup(backend)
+
+    async def edit_original_response(self, **_):
+        await self._backend.http.request("followup")
+
+
+# ——— Backend ——————————————————————————————————————————————————
+class FakeDiscord:
+    """Guilds, REST endpoints and gateway events for one `bot` module."""
+
+    def __init__(self, bot_module, http: FakeHTTP | None = None):
+        self.bot      = bot_module
+        self.client   = bot_module.bot
+        self.http     = http or FakeHTTP()
+        self.guilds:  dict[int, FakeGuild] = {}
+        self.threads: dict[int, FakeThread] = {}
+        self.panels:  dict[int, object] = {}   # voice channel id → management panel posted in it
+        self.moved_at: dict[int, float] = {}   # member id → loop time of their last move
+        self.dms:     dict[int, str] = {}
+        self._ids     = itertools.count(10**17 + 1)
+        self._events: set[asyncio.Task] = set()
+        self.client.get_guild = self.guilds.get
+        self.client.http.delete_channel = self.delete_thread
+
+    def snowflake(self) -> int:
+        return next(self._ids)
+
+    def add_guild(self, members: int = 0, admins: int = 0) -> FakeGuild:
+        guild = FakeGuild(self, self.snowflake())
+        self.guilds[guild.id] = guild
+        for i in range(members):
+            guild.add_member(admin=i < admins)
+        self.bot.config["guilds"][str(guild.id)] = {
+            "trigger_channel_id":  guild.trigger.id,
+            "default_category_id": guild.category.id,
+            "create_category_id":  guild.category.id,
+        }
+        return guild
+
+    async def delete_thread(self, thread_id: int, *, reason=None):
+        await self.http.request("delete_channel")
+        if self.threads.pop(thread_id, None) is None:
+            raise discord.NotFound(FakeResponse(404, "Not Found"), "Unknown Channel")
+
+    def dispatch(self, coro) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._events.add(task)
+        task.add_done_callback(self._events.discard)
+        return task
+
+    async def voice_update(self, member: FakeMember, channel):
+        """Move `member`'s voice state to `channel` (None: disconnect), then run the bot's handler."""
+        before = FakeVoiceState(member.voice.channel if member.voice else None)
+        if before.channel is not None and member in before.channel.voice_members:
+            before.channel.voice_members.remove(member)
+        if channel is not None and channel.guild._channels.get(channel.id) is not channel:
+            channel = None  # deleted meanwhile: Discord disconnects the member
+        member._voice = FakeVoiceState(channel) if channel is not None else None
+        if channel is not None:
+            channel.voice_members.append(member)
+        if before.channel is channel:
+            return
+        await self.bot.on_voice_state_update(member, before, FakeVoiceState(channel))
+
+    def interaction(self, guild: FakeGuild, user: FakeMember, **kwargs) -> FakeInteraction:
+        return FakeInteraction(self, guild, user, **kwargs)
+
+    async def press(self, interaction: FakeInteraction, action: str):
+        """Click `action` on the panel of `interaction.channel_id` the way discord.py dispatches dynamic items."""
+        for child in self.panels[interaction.channel_id].children:
+            match = child.template.fullmatch(child.custom_id)
+            if match and match["action"] == action:
+                break
+        else:
+            raise KeyError(action)
+        interaction.data = {"custom_id": child.custom_id, "component_type": 2}
+        item = await type(child).from_custom_id(interaction, child.item, match)
+        if await item.interaction_check(interaction):
+            await item.callback(interaction)
+
+    async def settle(self):
+        """Wait until dispatched events and the bot's background tasks (panels, refills) are done."""
+        while True:
+            pending = self._events | self.bot._background_tasks
+            if not pending:
+                return
+            await asyncio.gather(*pending, return_exceptions=True)
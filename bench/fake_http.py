@@ -0,0 +1,63 @@
+"""Local stand-in for Discord's REST layer.
+
+`FakeHTTP.endpoint(route)` returns a coroutine function that behaves like a
+discord.py REST call: it takes a simulated latency, lets at most
+`bucket_limit` calls of a route run at once and raises a real
+`discord.HTTPException` with status 429 when that bucket is exceeded (or at
+random with probability `rate_429`). With `retry_after` set, 429s are handled
+the way discord.py's HTTP client does instead: the call sleeps and retries.
+Nothing touches the network.
+"""
+import asyncio
+import random
+from collections import Counter
+
+import discord
+
+
+class FakeResponse:
+    def __init__(self, status: int, reason: str):
+        self.status = status
+        self.reason = reason
+
+
+class FakeHTTP:
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, rate_429: float = 0.0,
+                 bucket_limit: int | None = None, seed: int = 0, retry_after: float | None = None):
+        self.latency      = latency
+        self.jitter       = jitter
+        self.rate_429     = rate_429
+        self.bucket_limit = bucket_limit
+        self.retry_after  = retry_after
+        self.random       = random.Random(seed)
+        self.calls        = Counter()
+        self.rate_limited = Counter()
+        self.in_flight    = Counter()
+
+    def _limited(self, route: str) -> bool:
+        if self.bucket_limit is not None and self.in_flight[route] >= self.bucket_limit:
+            return True
+        return bool(self.rate_429) and self.random.random() < self.rate_429
+
+    async def request(self, route: str, result=None):
+        self.calls[route] += 1
+        while self._limited(route):
+            self.rate_limited[route] += 1
+            if self.retry_after is None:
+                raise discord.HTTPException(FakeResponse(429, "Too Many Requests"), "You are being rate limited.")
+            await asyncio.sleep(self.retry_after)
+            self.calls[route] += 1
+        self.in_flight[route] += 1
+        try:
+            await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+        finally:
+            self.in_flight[route] -= 1
+        return result
+
+    def endpoint(self, route: str, result=None):
+        async def call(*args, **kwargs):
+            return await self.request(route, result)
+        return call
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
@@ -0,0 +1,114 @@
+"""Member-cache memory with full vs minimal gateway intents.
+
+Feeds a synthetic GUILD_CREATE payload (N members, K of them in voice, with
+presences) through discord.py's real ConnectionState, once with the bot's
+default `Intents.all()` cache and once with `BOT_MINIMAL_INTENTS=1`, where
+only voice members are cached and the MemberResolver LRU is filled to
+capacity. Each mode runs in its own process so RSS numbers are comparable.
+
+    python -m bench.intents_memory [--members 150000] [--in-voice 2000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def user(i: int) -> dict:
+    return {"id": str(10**17 + i), "username": f"user{i}", "discriminator": "0",
+            "global_name": f"User {i}", "avatar": None}
+
+
+def member(i: int) -> dict:
+    return {"user": user(i), "roles": [], "joined_at": "2024-01-01T00:00:00+00:00",
+            "deaf": False, "mute": False, "nick": None, "flags": 0}
+
+
+def guild_payload(members: int, in_voice: int) -> dict:
+    return {
+        "id": "1", "name": "bench", "member_count": members,
+        "emojis": [], "stickers": [], "features": [],
+        "roles": [{"id": "1", "name": "@everyone", "permissions": "0", "position": 0, "color": 0,
+                   "hoist": False, "managed": False, "mentionable": False}],
+        "channels": [{"id": "5", "type": 2, "name": "voice", "position": 0,
+                      "permission_overwrites": [], "bitrate": 64000, "user_limit": 0}],
+        "members": [member(i) for i in range(members)],
+        "presences": [{"user": {"id": str(10**17 + i)}, "status": "online", "activities": [],
+                       "client_status": {"desktop": "online"}} for i in range(members)],
+        "voice_states": [{"user_id": str(10**17 + i), "channel_id": "5", "session_id": "s",
+                          "deaf": False, "mute": False, "self_deaf": False, "self_mute": False,
+                          "suppress": False, "self_video": False} for i in range(in_voice)],
+    }
+
+
+def run_mode(mode: str, members: int, in_voice: int) -> dict:
+    os.environ["BOT_MINIMAL_INTENTS"] = "1" if mode == "minimal" else "0"
+    sys.path.insert(0, ROOT)
+    import time
+    import discord
+    from discord.state import ConnectionState
+    import bot
+
+    payload = guild_payload(members, in_voice)
+    state = ConnectionState(
+        dispatch=lambda *a, **k: None, handlers={}, hooks={}, http=None,
+        intents=bot.bot.intents, member_cache_flags=bot.bot._connection.member_cache_flags,
+        chunk_guilds_at_startup=False,
+    )
+    rss_before = rss_bytes()
+    tracemalloc.start()
+    guild = state._add_guild_from_data(payload)
+    if mode == "minimal":
+        # Members fetched on cache misses (template invites, deputies) fill the LRU up to its bound
+        resolver = bot.member_resolver
+        for i in range(in_voice, in_voice + min(resolver.size, members - in_voice)):
+            resolver._lru[(guild.id, 10**17 + i)] = (time.monotonic(), discord.Member(
+                data=member(i), guild=guild, state=state))
+    traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    rss = rss_bytes() - rss_before
+    return {
+        "mode": mode,
+        "cached_members": len(guild.members),
+        "lru_members": len(bot.member_resolver._lru),
+        "traced_mb": round(traced / 2**20, 1),
+        "rss_mb": round(rss / 2**20, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=150_000)
+    parser.add_argument("--in-voice", type=int, default=2_000)
+    parser.add_argument("--mode", choices=("full", "minimal"))
+    args = parser.parse_args()
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.members, args.in_voice)))
+        return
+    print(f"{args.members} members, {args.in_voice} in voice")
+    for mode in ("full", "minimal"):
+        out = subprocess.run(
+            [sys.executable, "-m", "bench.intents_memory", "--mode", mode,
+             "--members", str(args.members), "--in-voice", str(args.in_voice)],
+            cwd=ROOT, check=True, capture_output=True, text=True,
+        ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{r['mode']:<8} cached={r['cached_members']:>7}  lru={r['lru_members']:>5}  "
+              f"traced={r['traced_mb']:>7} MB  rss_delta={r['rss_mb']:>7} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""Load test: the bot's real handlers against the fake Discord backend.
+
+Scenarios, each run in its own process on a virtual clock (idle time is
+skipped, CPU time is real):
+
+    join_burst      --members join the trigger channels of --guilds within --duration seconds
+    churn           --churn-members join, leave and come back for --churn-duration seconds; empty VCs auto-delete
+    template_edits  VC owners send /limit, /rename, /lock, /unlock and the visibility panel buttons
+
+For each scenario it reports wall-clock throughput, operation latency
+percentiles on the virtual clock (join until moved into a VC, command until
+answered), Discord REST calls per operation and peak RSS. `--save` writes
+the results to bench/baselines/load_test.json; `--compare` checks a run
+against that baseline and exits non-zero on a regression.
+
+    python -m bench.load_test [--scenario all] [--latency 0.05] [--rate-429 0.01] [--save | --compare]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT          = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "bench", "baselines", "load_test.json")
+SCENARIOS     = ("join_burst", "churn", "template_edits")
+# Metrics compared against the baseline: name → (higher is worse, allowed relative change)
+REGRESSION_CHECKS = {
+    "latency_p50":  (True, 0.25),
+    "latency_p99":  (True, 0.25),
+    "rest_per_op":  (True, 0.05),
+    "peak_rss_mb":  (True, 0.25),
+    "ops_per_s":    (False, 0.25),
+}
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+
+async def join_burst(fake, bot, args, rng, phase) -> list[float]:
+    guilds = [fake.add_guild(args.members // args.guilds) for _ in range(args.guilds)]
+    members = [m for g in guilds for m in g.members]
+    rng.shuffle(members)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    latencies = []
+
+    async def join(member, at):
+        await asyncio.sleep(max(0.0, start + at - loop.time()))
+        joined = loop.time()
+        await fake.voice_update(member, member.guild.trigger)
+        if member.id in fake.moved_at:
+            latencies.append(fake.moved_at[member.id] - joined)
+
+    await asyncio.gather(*(join(m, i * args.duration / len(members)) for i, m in enumerate(members)))
+    return latencies
+
+
+async def churn(fake, bot, args, rng, phase) -> list[float]:
+    guilds = [fake.add_guild(args.churn_members // args.guilds) for _ in range(args.guilds)]
+    loop = asyncio.get_running_loop()
+    end = loop.time() + args.churn_duration
+    latencies = []
+
+    async def member_life(member):
+        await asyncio.sleep(rng.uniform(0, 60))
+        while loop.time() < end:
+            fake.moved_at.pop(member.id, None)
+            joined = loop.time()
+            await fake.voice_update(member, member.guild.trigger)
+            if member.id in fake.moved_at:
+                latencies.append(fake.moved_at[member.id] - joined)
+            await asyncio.sleep(rng.expovariate(1 / 120))  # stay ~2 minutes
+            await fake.voice_update(member, None)
+            await asyncio.sleep(rng.expovariate(1 / 300))  # back after ~5 minutes, around the auto-delete timeout
+
+    await asyncio.gather(*(member_life(m) for g in guilds for m in g.members))
+    return latencies
+
+
+async def template_edits(fake, bot, args, rng, phase) -> list[float]:
+    guilds = [fake.add_guild(args.members // args.guilds) for _ in range(args.guilds)]
+    owners = [m for g in guilds for m in g.members]
+    await asyncio.gather(*(fake.voice_update(m, m.guild.trigger) for m in owners))
+    await fake.settle()
+    fake.http.calls.clear()
+    fake.http.rate_limited.clear()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    phase.update(wall=time.perf_counter(), virtual=start)  # measure the edits, not the VC setup
+    edits = args.members * args.edits_per_owner
+    commands = (
+        lambda i: bot.limit_cmd.callback(i, rng.randrange(0, 20)),
+        lambda i: bot.rename_cmd.callback(i, f"room {rng.randrange(1000)}"),
+        lambda i: bot.lock_cmd.callback(i),
+        lambda i: bot.unlock_cmd.callback(i),
+        lambda i: fake.press(i, "visible"),
+        lambda i: fake.press(i, "invisible"),
+    )
+    latencies = []
+
+    async def edit(n):
+        await asyncio.sleep(max(0.0, start + n * args.duration / edits - loop.time()))
+        owner = rng.choice(owners)
+        interaction = fake.interaction(owner.guild, owner, channel_id=owner.voice.channel.id)
+        sent = loop.time()
+        await rng.choice(commands)(interaction)
+        latencies.append(loop.time() - sent)
+
+    await asyncio.gather(*(edit(n) for n in range(edits)))
+    return latencies
+
+
+def run_scenario(name: str, args) -> dict:
+    os.environ["BOT_DATA_DIR"] = tempfile.mkdtemp(prefix="voicy-load-")
+    sys.path.insert(0, ROOT)
+    import bot
+    from bench.fake_discord import FakeDiscord, run
+    from bench.fake_http import FakeHTTP
+
+    http = FakeHTTP(latency=args.latency, jitter=args.latency / 4, rate_429=args.rate_429,
+                    seed=args.seed, retry_after=args.retry_after)
+    fake = FakeDiscord(bot, http)
+    rng = random.Random(args.seed)
+
+    async def main():
+        bot.auto_delete.start()
+        await bot.load_templates()
+        phase = {"wall": time.perf_counter(), "virtual": asyncio.get_running_loop().time()}
+        latencies = await globals()[name](fake, bot, args, rng, phase)
+        await fake.settle()
+        await bot.flush_all()
+        return latencies, time.perf_counter() - phase["wall"], asyncio.get_running_loop().time() - phase["virtual"]
+
+    latencies, wall, virtual = run(main())
+    latencies.sort()
+    ops = {"join_burst": args.members, "template_edits": args.members * args.edits_per_owner}.get(name, len(latencies))
+    calls = http.total_calls()
+    files = bot.persistence_stats()
+    return {
+        "scenario":       name,
+        "ops":            ops,
+        "completed":      len(latencies),
+        "wall_s":         round(wall, 2),
+        "virtual_s":      round(virtual, 1),
+        "ops_per_s":      round(ops / wall, 1),
+        "latency_p50":    round(percentile(latencies, 0.50), 4),
+        "latency_p95":    round(percentile(latencies, 0.95), 4),
+        "latency_p99":    round(percentile(latencies, 0.99), 4),
+        "rest_per_op":    round(calls / ops, 3),
+        "rest_calls":     dict(sorted(http.calls.items())),
+        "rate_limited":   sum(http.rate_limited.values()),
+        "busy_rejected":  bot.creation_gate.rejected,
+        "auto_deleted":   bot.auto_delete.deleted,
+        "file_writes":    sum(st["writes"] for st in files.values()),
+        "peak_rss_mb":    round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def report(r: dict):
+    print(f"{r['scenario']:<15} ops={r['ops']:>6} done={r['completed']:>6}  {r['ops_per_s']:>8.1f} ops/s  "
+          f"p50={r['latency_p50'] * 1000:7.1f} ms  p95={r['latency_p95'] * 1000:7.1f} ms  "
+          f"p99={r['latency_p99'] * 1000:7.1f} ms  rest/op={r['rest_per_op']:6.2f}  "
+          f"429={r['rate_limited']:>4}  busy={r['busy_rejected']:>4}  rss={r['peak_rss_mb']:6.1f} MB  "
+          f"(wall {r['wall_s']} s, simulated {r['virtual_s']} s)")
+
+
+def compare(results: list[dict], baseline: dict) -> bool:
+    ok = True
+    for r in results:
+        base = baseline.get("results", {}).get(r["scenario"])
+        if base is None:
+            print(f"{r['scenario']:<15} no baseline")
+            continue
+        for metric, (higher_is_worse, tolerance) in REGRESSION_CHECKS.items():
+            old, new = base[metric], r[metric]
+            if not old:
+                continue
+            change = (new - old) / old
+            regressed = change > tolerance if higher_is_worse else change < -tolerance
+            ok &= not regressed
+            print(f"{r['scenario']:<15} {metric:<12} {old:>10} → {new:>10}  {change:+7.1%}"
+                  f"{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=(*SCENARIOS, "all"), default="all")
+    parser.add_argument("--members", type=int, default=10_000)
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=60.0, help="simulated seconds")
+    parser.add_argument("--churn-members", type=int, default=2_000)
+    parser.add_argument("--churn-duration", type=float, default=3600.0, help="simulated seconds")
+    parser.add_argument("--edits-per-owner", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated REST latency (s)")
+    parser.add_argument("--rate-429", type=float, default=0.01, help="share of REST calls answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="429 retry delay (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--save", action="store_true", help=f"write results to {os.path.relpath(BASELINE_PATH, ROOT)}")
+    mode.add_argument("--compare", action="store_true", help="compare against the saved baseline")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_scenario(args.scenario, args)))
+        return
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    params = {k: v for k, v in vars(args).items() if k not in ("scenario", "child", "save", "compare")}
+    passthrough = [a for k, v in params.items() for a in (f"--{k.replace('_', '-')}", str(v))]
+    results = []
+    for name in scenarios:
+        out = subprocess.run(
+            [sys.executable, "-m", "bench.load_test", "--child", "--scenario", name, *passthrough],
+            cwd=ROOT, check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+        report(results[-1])
+
+    if args.save:
+        baseline = {"params": params, "results": {}}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH, encoding="utf-8") as f:
+                baseline = json.load(f)
+            baseline["params"] = params
+        baseline["results"].update({r["scenario"]: r for r in results})
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"Saved {os.path.relpath(BASELINE_PATH, ROOT)}")
+    elif args.compare:
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["params"] != params:
+            print(f"⚠️ Baseline was recorded with {baseline['params']}")
+        if not compare(results, baseline):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
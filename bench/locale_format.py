@@ -0,0 +1,58 @@
+"""Create-path formatting: per-call `t()` + command list vs the cached locale payload.
+
+Builds the management panel embed the way `post_panel` used to (a dict
+lookup and `str.format` per string, the command list joined every time)
+and through `panel_embed()`, for every bundled language.
+
+    python -m bench.locale_format [--iterations 100000]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord  # noqa: E402
+
+import bot  # noqa: E402
+
+
+class Owner:
+    mention = "<@123456789012345678>"
+
+
+def legacy_embed(strings: dict, owner) -> discord.Embed:
+    def t(key, **kwargs):
+        return strings.get(key, key).format(**kwargs)
+    commands_list = "\n".join(
+        f"• /{cmd} — {t('cmd_' + cmd + '_desc')}"
+        for cmd in ["limit", "rename", "invite", "kick", "visible", "invisible", "lock", "unlock", "assign", "unassign", "delete"]
+    )
+    return discord.Embed(
+        title=t("embed_title"),
+        description=t("embed_desc", owner=owner.mention, commands=commands_list),
+        color=discord.Color.blurple()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100_000)
+    args = parser.parse_args()
+    owner = Owner()
+    for code in bot.LANGUAGES:
+        with open(os.path.join(bot.LANG_DIR, f"{code}.json"), encoding="utf-8") as f:
+            strings = json.load(f)
+        guild_id = 1000 + bot.LANGUAGES.index(code)
+        bot.config["guilds"][str(guild_id)] = {"lang": code}
+        assert legacy_embed(strings, owner).description == bot.panel_embed(guild_id, owner).description
+        for label, fn in (("per-call", lambda: legacy_embed(strings, owner)),
+                          ("cached", lambda: bot.panel_embed(guild_id, owner))):
+            seconds = timeit.timeit(fn, number=args.iterations)
+            print(f"{code:<4} {label:<10} {seconds / args.iterations * 1e6:7.2f} µs/embed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Replay a traffic log recorded with BOT_RECORD through the bot's handlers.
+
+Voice state updates and interactions from the log are dispatched at their
+recorded offsets against the fake Discord backend, on a virtual clock: at
+`--speed 1` in real time, at 10 ten times faster, at `max` as fast as the
+handlers run. Auto-deletes (DEFAULT_TIMEOUT) fire on the same clock. Moves
+the bot made are not replayed from the log; the fake produces them when the
+replayed bot moves someone. Reports per-event latency on the virtual clock
+and the REST calls issued, per route.
+
+    python -m bench.replay traffic.log [--speed max] [--latency 0.05] [--rate-429 0] [--drain] [--json]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load(path: str) -> list[list]:
+    """Events of every session in the log, with times shifted so sessions follow each other."""
+    events, offset, last = [], 0.0, 0.0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue  # torn last line of a session that crashed
+            if event[1] == "session":
+                offset = last
+                continue
+            event[0] += offset
+            last = event[0]
+            events.append(event)
+    return events
+
+
+def percentiles(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    pick = lambda p: ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+    return {"count": len(ordered), "p50": round(pick(0.50), 4), "p95": round(pick(0.95), 4),
+            "p99": round(pick(0.99), 4), "max": round(ordered[-1], 4)}
+
+
+class Replayer:
+    def __init__(self, fake, bot):
+        self.fake      = fake
+        self.bot       = bot
+        self.guilds    = {}
+        self.latency   = defaultdict(list)
+        self.skipped   = Counter()
+
+    def guild(self, guild_id: int):
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            guild = self.guilds[guild_id] = self.fake.add_guild()
+        return guild
+
+    @staticmethod
+    def member(guild, member_id: int):
+        return guild.get_member(member_id) or guild.add_member(member_id)
+
+    def channel(self, guild, ref):
+        """Replay counterpart of a recorded channel; False if it does not exist in this replay."""
+        if ref is None:
+            return None
+        if ref[0] == "t":
+            return guild.trigger
+        if ref[0] == "p":
+            record = self.bot.get_user_vc(ref[1], guild.id)
+            return record.channel if record else False
+        return guild.get_channel(ref[1]) or guild.add_voice_channel(ref[1])
+
+    async def _timed(self, kind: str, coro):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await coro
+        self.latency[kind].append(loop.time() - started)
+        return started
+
+    async def voice(self, event):
+        _, _, guild_id, member_id, before, after = event
+        if before == ["t"] and after and after[0] == "p":
+            self.skipped["move by bot"] += 1
+            return
+        guild = self.guild(guild_id)
+        member = self.member(guild, member_id)
+        target = self.channel(guild, after)
+        if target is False:
+            self.skipped["unknown private VC"] += 1
+            return
+        kind = "join trigger" if after == ["t"] else "leave" if after is None else "switch"
+        moved = self.fake.moved_at.get(member.id)
+        started = await self._timed(kind, self.fake.voice_update(member, target))
+        if after == ["t"] and self.fake.moved_at.get(member.id, moved) != moved:
+            self.latency["trigger → move"].append(self.fake.moved_at[member.id] - started)
+
+    def _handler(self, guild, name: str, options: dict, channel):
+        if name.startswith("button:"):
+            action = name.removeprefix("button:").removesuffix("_btn")  # older logs hold the legacy custom_id
+            if channel is None or channel.id not in self.fake.panels:
+                return None
+            return lambda interaction: self.fake.press(interaction, action)
+        command = self.bot.tree.get_command(name)
+        if command is None:
+            return None
+        kwargs = {}
+        for param in command.parameters:
+            if param.choices:
+                return None  # Choice values are free text, not recorded
+            if param.name in options:
+                value = options[param.name]
+                if param.type.name in ("user", "mentionable"):
+                    value = self.member(guild, value)
+                elif param.type.name == "role":
+                    return None
+                kwargs[param.name] = value
+            elif param.type.name == "string":
+                kwargs[param.name] = "replay"
+            elif param.required:
+                return None
+        return lambda interaction: command.callback(interaction, **kwargs)
+
+    async def interaction(self, event):
+        _, _, guild_id, user_id, name, options, channel_ref = event
+        guild = self.guild(guild_id)
+        channel = self.channel(guild, channel_ref)
+        handler = self._handler(guild, name, options, channel or None)
+        if handler is None:
+            self.skipped[name] += 1
+            return
+        interaction = self.fake.interaction(guild, self.member(guild, user_id),
+                                            channel_id=channel.id if channel else None)
+        await self._timed(name, handler(interaction))
+
+    async def run(self, events: list[list]):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        tasks = []
+        for event in events:
+            await asyncio.sleep(max(0.0, start + event[0] - loop.time()))
+            handler = self.voice if event[1] == "v" else self.interaction
+            tasks.append(self.fake.dispatch(handler(event)))
+        await asyncio.gather(*tasks)
+        await self.fake.settle()
+
+
+def replay(path: str, args) -> dict:
+    os.environ["BOT_DATA_DIR"] = tempfile.mkdtemp(prefix="voicy-replay-")
+    sys.path.insert(0, ROOT)
+    import bot
+    from bench.fake_discord import FakeDiscord, run
+    from bench.fake_http import FakeHTTP
+
+    events = load(path)
+    fake = FakeDiscord(bot, FakeHTTP(latency=args.latency, jitter=args.latency / 4, rate_429=args.rate_429,
+                                     seed=args.seed, retry_after=args.retry_after))
+    replayer = Replayer(fake, bot)
+
+    async def main():
+        bot.auto_delete.start()
+        await bot.load_templates()
+        loop = asyncio.get_running_loop()
+        started, virtual = time.perf_counter(), loop.time()
+        await replayer.run(events)
+        if args.drain:
+            while bot.auto_delete.pending:
+                await asyncio.sleep(1)
+            await fake.settle()
+        await bot.flush_all()
+        return time.perf_counter() - started, loop.time() - virtual
+
+    wall, virtual = run(main(), speed=args.speed)
+    return {
+        "events":       len(events),
+        "wall_s":       round(wall, 2),
+        "virtual_s":    round(virtual, 1),
+        "latency":      {kind: percentiles(s) for kind, s in sorted(replayer.latency.items())},
+        "rest_per_event": round(fake.http.total_calls() / max(1, len(events)), 3),
+        "rest_calls":   dict(sorted(fake.http.calls.items())),
+        "rate_limited": sum(fake.http.rate_limited.values()),
+        "auto_deleted": bot.auto_delete.deleted,
+        "skipped":      dict(replayer.skipped),
+    }
+
+
+def speed(value: str) -> float:
+    return math.inf if value == "max" else float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("log")
+    parser.add_argument("--speed", type=speed, default=math.inf, help="1, 10, ... or max (default)")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated REST latency (s)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="share of REST calls answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="429 retry delay (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--drain", action="store_true", help="keep the clock running until pending auto-deletes fired")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    result = replay(args.log, args)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['events']} events in {result['wall_s']} s (simulated {result['virtual_s']} s), "
+          f"{sum(result['rest_calls'].values())} REST calls ({result['rest_per_event']}/event), "
+          f"{result['rate_limited']} 429s, {result['auto_deleted']} auto-deleted")
+    for kind, p in result["latency"].items():
+        print(f"  {kind:<22} n={p['count']:>6}  p50={p['p50'] * 1000:8.1f} ms  p95={p['p95'] * 1000:8.1f} ms  "
+              f"p99={p['p99'] * 1000:8.1f} ms  max={p['max'] * 1000:8.1f} ms")
+    for route, n in result["rest_calls"].items():
+        print(f"  {route:<22} {n:>8}")
+    if result["skipped"]:
+        print("  skipped: " + ", ".join(f"{name} ×{n}" for name, n in result["skipped"].items()))
+
+
+if __name__ == "__main__":
+    main()
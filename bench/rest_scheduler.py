@@ -0,0 +1,62 @@
+"""Move latency under background REST load, with and without priorities.
+
+Queues a burst of background work (panel posts, thread creation, cleanup
+deletes) and then a handful of member moves against the fake REST layer, and
+reports how long the moves waited.
+
+    python -m bench.rest_scheduler [--background 400] [--moves 20] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot  # noqa: E402
+from bench.fake_http import FakeHTTP  # noqa: E402
+
+
+async def run(background: int, moves: int, latency: float, prioritized: bool) -> list[float]:
+    http = FakeHTTP(latency=latency, jitter=latency / 4)
+    # One shared route models Discord buckets/global limit that all of this competes for
+    scheduler = bot.RestScheduler(limits={"shared": 4}, global_limit=4)
+    loop = asyncio.get_running_loop()
+    bg_priority = bot.PRIORITY_BACKGROUND if prioritized else bot.PRIORITY_USER
+
+    bg = [
+        asyncio.create_task(scheduler.call("shared", bg_priority, http.endpoint("delete_channel")))
+        for _ in range(background)
+    ]
+    await asyncio.sleep(0)
+
+    async def move():
+        start = loop.time()
+        await scheduler.call("shared", bot.PRIORITY_USER, http.endpoint("move_member"))
+        return loop.time() - start
+
+    latencies = await asyncio.gather(*(move() for _ in range(moves)))
+    await asyncio.gather(*bg)
+    return list(latencies)
+
+
+def report(label: str, latencies: list[float]):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<12} moves p50={statistics.median(latencies) * 1000:8.1f} ms  "
+          f"p99={p99 * 1000:8.1f} ms  max={latencies[-1] * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--background", type=int, default=400)
+    parser.add_argument("--moves", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    for label, prioritized in (("fifo", False), ("prioritized", True)):
+        report(label, asyncio.run(run(args.background, args.moves, args.latency, prioritized)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Resident memory of loaded templates: plain dicts vs TemplateRecord.
+
+Builds N synthetic templates the way `load_templates()` holds them — once
+as the decoded JSON dicts the bot used to keep, once as `TemplateRecord`s
+with packed id arrays — and reports traced bytes per template.
+
+    python -m bench.templates_memory [--templates 1000000]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot  # noqa: E402
+
+
+def synthetic(n: int, seed: int = 0):
+    """Mostly default templates; some with invited/kicked users and deputies."""
+    rng = random.Random(seed)
+    base = 10**17
+    for i in range(n):
+        yield base + i, {
+            "name":       f"user{i}'s VC",
+            "user_limit": rng.choice((0, 2, 5, 10)),
+            "invited":    [base + rng.randrange(n) for _ in range(rng.choice((0, 0, 0, 1, 3)))],
+            "kicked":     [base + rng.randrange(n) for _ in range(rng.choice((0, 0, 0, 0, 1)))],
+            "visible":    rng.random() > 0.1,
+            "locked":     rng.random() < 0.1,
+            "deputies":   [base + rng.randrange(n) for _ in range(rng.choice((0, 0, 0, 0, 1)))],
+        }
+
+
+def measure(n: int, convert) -> tuple[float, float]:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    templates = {owner: convert(tpl) for owner, tpl in synthetic(n)}
+    elapsed = time.perf_counter() - start
+    traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(templates) == n
+    del templates
+    return traced / n, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--templates", type=int, default=1_000_000)
+    args = parser.parse_args()
+    print(f"{args.templates} templates")
+    for label, convert in (("dict", lambda tpl: tpl), ("record", bot.TemplateRecord.from_json)):
+        per_template, elapsed = measure(args.templates, convert)
+        print(f"{label:<8} {per_template:8.0f} bytes/template  "
+              f"{per_template * args.templates / 2**20:8.1f} MB  build={elapsed:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
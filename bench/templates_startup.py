@@ -0,0 +1,81 @@
+"""Startup cost of a large templates.json: full parse vs the indexed store.
+
+Writes N synthetic templates in the old `json.dump` layout to a temporary
+directory, then times loading them all into memory the way `load_templates()`
+used to, the one-time conversion to the indexed layout, a regular open of the
+indexed store and single-owner lookups.
+
+    python -m bench.templates_startup [--templates 1000000] [--lookups 10000]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot  # noqa: E402
+from bench.templates_memory import synthetic  # noqa: E402
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def full_load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    return {int(owner): bot.TemplateRecord.from_json(tpl) for owner, tpl in raw.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--templates", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "templates.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({str(owner): tpl for owner, tpl in synthetic(args.templates)}, f, ensure_ascii=False)
+        print(f"{args.templates} templates, {os.path.getsize(path) / 2**20:.1f} MB")
+
+        def report(label, elapsed):
+            print(f"{label:<16} {elapsed * 1000:10.1f} ms")
+
+        loaded, elapsed = timed(lambda: full_load(path))
+        report("full parse", elapsed)
+        del loaded
+
+        def open_store():
+            store = bot.TemplateStore(path, cache_size=bot.TEMPLATE_CACHE_SIZE, compact_after=10_000)
+            store.open()
+            return store
+
+        _, elapsed = timed(open_store)
+        report("convert (once)", elapsed)
+        store, elapsed = timed(open_store)
+        report("indexed open", elapsed)
+
+        rng = random.Random(1)
+        owners = [10**17 + rng.randrange(args.templates) for _ in range(args.lookups)]
+        latencies = []
+        for owner in owners:
+            start = time.perf_counter()
+            assert store.get(owner) is not None
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"{'lookup':<16} p50={statistics.median(latencies) * 1e6:6.1f} µs  "
+              f"p99={latencies[int(len(latencies) * 0.99)] * 1e6:6.1f} µs  "
+              f"(cache hits {store.hits}/{args.lookups})")
+        store._close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,32 @@
+import time
+_process_start = time.perf_counter()  # before the heavy imports, so startup timing includes them
 import os
+import sys
 import json
+import string
+import hashlib
+import heapq
+import sqlite3
+import struct
+import csv
+import io
+import re
+import mmap
+import itertools
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from collections import deque, OrderedDict, Counter
+import math
+import signal
 import asyncio
+import threading
+import queue
+import concurrent.futures
+import subprocess
+import logging
+import traceback
+from logging.handlers import RotatingFileHandler
 import discord
 from discord.ext import commands
 from discord import app_commands
@@ -10,13 +36,99 @@ from datetime import datetime, timedelta
 
 load_dotenv()
 
+# ——— Startup Timing ——————————————————————————————————————————————
+class StartupTimer:
+    """Durations of the startup phases, logged once the bot is ready."""
+
+    def __init__(self, start: float):
+        self.start  = start
+        self._last  = start
+        self.phases: list[tuple[str, float]] = []
+        self.reported = False
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self):
+        if self.reported:
+            return
+        self.reported = True
+        phases = " · ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.phases)
+        print(f"⏱️ Ready in {time.perf_counter() - self.start:.2f}s: {phases}")
+
+startup = StartupTimer(_process_start)
+startup.mark("import")
+
 # ——— Localization ———————————————————————————————————————
-LANG = os.getenv("BOT_LANG", "en")
-lang_path = os.path.join(os.path.dirname(__file__), "lang", f"{LANG}.json")
-with open(lang_path, encoding="utf-8") as f:
-    _T = json.load(f)
-def t(key: str, **kwargs) -> str:
-    return _T.get(key, key).format(**kwargs)
+LANG = os.getenv("BOT_LANG", "en")  # default language; guilds can pick their own with /vcconfig_lang
+LANG_DIR = os.path.join(os.path.dirname(__file__), "lang")
+LANGUAGES = sorted(name[:-5] for name in os.listdir(LANG_DIR) if name.endswith(".json"))
+
+class Locale:
+    """One language bundle, compiled once.
+
+    Strings without placeholders are rendered up front, so looking them up
+    is a single dict hit. Keys missing from the bundle fall back to the
+    default language, then to the key itself. `cached()` keeps static UI
+    payloads (e.g. the panel's command list) per locale.
+    """
+
+    def __init__(self, code: str, strings: dict, fallback: "Locale | None" = None):
+        self.code     = code
+        self.fallback = fallback
+        self._static:   dict[str, str] = {}
+        self._formats:  dict[str, str] = {}
+        self._payloads: dict[str, object] = {}
+        for key, value in strings.items():
+            if any(field is not None for _, field, _, _ in string.Formatter().parse(value)):
+                self._formats[key] = value
+            else:
+                self._static[key] = value.format()  # unescapes {{ }}
+
+    def __call__(self, key: str, **kwargs) -> str:
+        value = self._static.get(key)
+        if value is not None:
+            return value
+        template = self._formats.get(key)
+        if template is not None:
+            return template.format(**kwargs)
+        return self.fallback(key, **kwargs) if self.fallback else key
+
+    def cached(self, name: str, build):
+        """`build(self)`, computed once per locale."""
+        try:
+            return self._payloads[name]
+        except KeyError:
+            payload = self._payloads[name] = build(self)
+            return payload
+
+_locales: dict[str, Locale] = {}
+
+def get_locale(code: str) -> Locale:
+    """Load a bundle on first use; unknown codes get the default language."""
+    locale = _locales.get(code)
+    if locale is not None:
+        return locale
+    if code not in LANGUAGES:
+        return get_locale(LANG) if code != LANG else Locale(LANG, {})
+    with open(os.path.join(LANG_DIR, f"{code}.json"), encoding="utf-8") as f:
+        strings = json.load(f)
+    locale = _locales[code] = Locale(code, strings, None if code == LANG else get_locale(LANG))
+    return locale
+
+def locale_for(guild_id: int | str | None) -> Locale:
+    if guild_id is None:
+        return get_locale(LANG)
+    return get_locale(config["guilds"].get(str(guild_id), {}).get("lang", LANG))
+
+def t(key: str, guild_id: int | str | None = None, **kwargs) -> str:
+    """Translate `key` into the guild's language (the default language without a guild)."""
+    return locale_for(guild_id)(key, **kwargs)
+
+get_locale(LANG)
+startup.mark("lang")
 
 
 # ——— Constants & Paths —————————————————————————————————————
@@ -24,130 +136,2819 @@ def t(key: str, **kwargs) -> str:
 CREATE_VC_CHANNEL_ID = 1386893005578834020  # fallback trigger channel
 VC_CATEGORY_ID       = 1386453793012453417  # fallback category
 DEFAULT_TIMEOUT      = 5   # minutes before auto-delete
-BASE_DIR             = os.path.dirname(__file__)
+BASE_DIR             = os.getenv("BOT_DATA_DIR") or os.path.dirname(__file__)  # config, templates, active VCs, database
 TEMPLATES_FILE       = "templates.json"
 TEMPLATES_PATH       = os.path.join(BASE_DIR, TEMPLATES_FILE)
+ACTIVE_VCS_PATH      = os.path.join(BASE_DIR, "active_vcs.json")
+SAVE_DELAY           = float(os.getenv("BOT_SAVE_DELAY", "2"))  # seconds to coalesce writes
+STORAGE              = os.getenv("BOT_STORAGE", "json")  # "json" or "sqlite"
+SQLITE_PATH          = os.getenv("BOT_SQLITE_PATH", os.path.join(BASE_DIR, "voicy.db"))
+SQLITE_WRITE_ATTEMPTS = 3  # tries per queued write while other workers hold the database lock
+TEMPLATE_CACHE_SIZE  = int(os.getenv("BOT_TEMPLATE_CACHE_SIZE", "10000"))  # decoded templates kept in memory
+TEMPLATE_COMPACT_AFTER = 10000  # logged template changes before they are folded into templates.json
+EDIT_DEBOUNCE        = float(os.getenv("BOT_EDIT_DEBOUNCE", "0.3"))  # seconds to merge channel edits
+CREATE_CONCURRENCY   = int(os.getenv("BOT_CREATE_CONCURRENCY", "4"))    # VC creations in flight per guild
+CREATE_QUEUE_LIMIT   = int(os.getenv("BOT_CREATE_QUEUE_LIMIT", "500"))  # members waiting per guild before refusing
+MINIMAL_INTENTS      = os.getenv("BOT_MINIMAL_INTENTS", "0") == "1"  # no presences/messages, no member chunking
+MEMBER_CACHE_SIZE    = int(os.getenv("BOT_MEMBER_CACHE_SIZE", "5000"))  # LRU of members fetched on cache miss
+MEMBER_CACHE_TTL     = 600  # seconds before a fetched member is fetched again
+MEMBER_PAGE_SIZE     = 1000  # members per REST page when the cache is incomplete (Discord's maximum)
+DENIED_MEMBERS_TTL   = 600  # seconds before /vcrevoke_list rescans the guild
+LIST_PAGE_SIZE       = 20   # entries per page of the admin list commands
+MOVE_RETRY_DELAYS    = (0.2, 0.5, 1.0, 2.0)  # backoff between move attempts right after channel creation
+DELETE_RETRY_S       = 60   # seconds before an empty VC whose delete failed is tried again
+WARM_POOL_WINDOW     = 300  # seconds of trigger joins used to estimate the join rate
+WARM_POOL_HORIZON    = 60   # keep enough warm channels for this many seconds of joins
+WARM_POOL_NAME       = "⏳"
+RECONCILE_CONCURRENCY = int(os.getenv("BOT_RECONCILE_CONCURRENCY", "8"))  # parallel restores on startup
+COMMAND_SYNC_PATH    = os.path.join(BASE_DIR, "command_sync.json")  # hashes of the last synced command trees
+DEV_GUILD_ID         = int(os.getenv("BOT_DEV_GUILD", "0")) or None  # sync commands to this guild only
+FORCE_SYNC           = os.getenv("BOT_FORCE_SYNC", "0") == "1"  # sync even if the command tree is unchanged
+
+
+# ——— Sharding & Cluster Mode ——————————————————————————————————————
+def _parse_shard_ids(spec: str) -> list[int]:
+    """"0-3,8" → [0, 1, 2, 3, 8]"""
+    ids = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        low, _, high = part.partition("-")
+        ids.extend(range(int(low), int(high or low) + 1))
+    return ids
+
+WORKERS     = int(os.getenv("BOT_WORKERS", "1"))        # >1: this process only launches and supervises workers
+_shard_env  = os.getenv("BOT_SHARD_COUNT", "")          # "", "auto" or a number
+SHARD_COUNT = int(_shard_env) if _shard_env.isdigit() else None
+SHARD_IDS   = _parse_shard_ids(os.getenv("BOT_SHARD_IDS", ""))  # set per worker by the launcher
+SHARDED     = bool(_shard_env) or bool(SHARD_IDS)
+CLUSTERED   = WORKERS > 1 or bool(SHARD_IDS)  # several processes share the storage
+
+if SHARD_IDS and SHARD_COUNT is None:
+    raise SystemExit("BOT_SHARD_IDS requires a numeric BOT_SHARD_COUNT")
+if CLUSTERED and STORAGE != "sqlite":
+    # Whole-file JSON rewrites from several processes would overwrite each other
+    print("ℹ️ Cluster mode: using the SQLite backend")
+    STORAGE = "sqlite"
+
+def shard_of(guild_id: int) -> int:
+    return (guild_id >> 22) % SHARD_COUNT
+
+def owns_guild(guild_id: int) -> bool:
+    """True if this process runs the shard the guild lives on."""
+    return not SHARD_IDS or shard_of(guild_id) in SHARD_IDS
+
+
+# ——— Write-Behind Persistence ——————————————————————————————————
+class WriteStats:
+    """Commit counters of a persisted store, as reported by persistence_stats()."""
+
+    def __init__(self):
+        self.writes             = 0
+        self.bytes_written      = 0
+        self.write_seconds      = 0.0
+        self.last_write_seconds = 0.0
+
+    def _record(self, start: float, size: int):
+        elapsed = time.perf_counter() - start
+        self.writes             += 1
+        self.bytes_written      += size
+        self.write_seconds      += elapsed
+        self.last_write_seconds  = elapsed
+
+    def stats(self) -> dict:
+        return {
+            "writes":             self.writes,
+            "bytes":              self.bytes_written,
+            "write_seconds":      round(self.write_seconds, 6),
+            "last_write_seconds": round(self.last_write_seconds, 6),
+            "dirty":              self.dirty,
+        }
+
+class WriteBehind(WriteStats):
+    """Debounced flushing: `mark_dirty()` only flags the state, and changes
+    landing within `delay` seconds are committed by one `flush()`."""
+
+    def __init__(self, delay: float = SAVE_DELAY):
+        super().__init__()
+        self.delay = delay
+        self.dirty = False
+        self._task: asyncio.Task | None = None
+
+    def mark_dirty(self):
+        self.dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts, shutdown): nothing to block, write now
+            return self.flush_sync()
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.delay)
+        await self.flush()
+        if self.dirty:
+            # Marked again while the previous commit was being written
+            self._task = asyncio.get_running_loop().create_task(self._flush_later())
+        else:
+            self._flushed()
+
+    def _flushed(self):
+        """Called once the state is clean after a debounced flush."""
+
+    async def flush(self):
+        raise NotImplementedError
+
+    def flush_sync(self):
+        raise NotImplementedError
+
+class JsonFile(WriteBehind):
+    """A JSON document persisted write-behind.
+
+    Coalesced writes are serialized in a worker thread and committed via
+    temp file + fsync + rename, so a crash never leaves a truncated file.
+    """
+
+    def __init__(self, path: str, snapshot, indent: int | None = None, delay: float = SAVE_DELAY):
+        super().__init__(delay)
+        self.path     = path
+        self.snapshot = snapshot  # called on the loop thread: data safe to dump off-loop, or the encoded bytes
+        self.indent   = indent
+        self._io_lock  = threading.Lock()
+        self._seq      = 0  # snapshot generation, guards against an older snapshot landing last
+        self._written  = 0
+
+    def _take_snapshot(self):
+        self.dirty = False
+        self._seq += 1
+        return self._seq, self.snapshot()
+
+    def _commit(self, seq: int, data) -> int:
+        if isinstance(data, bytes):
+            payload = data  # already serialized by the snapshot
+        else:
+            payload = json.dumps(data, ensure_ascii=False, indent=self.indent, default=_to_json).encode("utf-8")
+        with self._io_lock:
+            if seq <= self._written:
+                return 0
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            if hasattr(os, "O_DIRECTORY"):
+                dir_fd = os.open(os.path.dirname(self.path) or ".", os.O_DIRECTORY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+            self._written = seq
+        return len(payload)
+
+    async def flush(self):
+        if not self.dirty:
+            return
+        seq, data = self._take_snapshot()
+        start = time.perf_counter()
+        try:
+            size = await asyncio.to_thread(self._commit, seq, data)
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"⚠️ Failed to write {self.path}: {e!r}")
+            self.mark_dirty()
+            return
+        self._record(start, size)
+
+    def flush_sync(self):
+        if not self.dirty:
+            return
+        seq, data = self._take_snapshot()
+        start = time.perf_counter()
+        self._record(start, self._commit(seq, data))
+
+
+def _to_json(obj):
+    # json.dumps hook for the record classes below
+    if hasattr(obj, "to_json"):
+        return obj.to_json()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+def read_template_log(path: str):
+    """Yield (owner, template dict) from a template log, skipping a torn last line."""
+    for candidate in (f"{path}.old", path):
+        if not os.path.exists(candidate):
+            continue
+        with open(candidate, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    owner, data = json.loads(line)
+                except ValueError:
+                    continue
+                yield owner, data
+
+def _now_ts() -> int:
+    # Same clock _perm_entry stamps "expires" with
+    return int(datetime.utcnow().timestamp())
+
+
+# ——— SQLite Storage Backend ———————————————————————————————————————
+class SqliteStore(WriteStats):
+    """Optional SQLite (WAL) storage for templates, guild config and permission entries.
+
+    Every write touches only the rows it changes and runs on a single writer
+    thread fed by a queue, so lock waits (other cluster workers) never stall
+    the event loop. On first open the existing config.json / templates.json
+    are imported once.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS templates (
+            owner_id INTEGER PRIMARY KEY,
+            data     TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS guild_config (
+            guild_id INTEGER PRIMARY KEY,
+            data     TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS permissions (
+            guild_id  INTEGER NOT NULL,
+            list_name TEXT    NOT NULL,
+            type      TEXT    NOT NULL,
+            target_id INTEGER NOT NULL,
+            expires   INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS permissions_guild   ON permissions (guild_id, list_name, target_id);
+        CREATE INDEX IF NOT EXISTS permissions_expires ON permissions (expires) WHERE expires IS NOT NULL;
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        super().__init__()
+        self.conn = self._connect()  # startup, then reads in worker threads; writes have their own
+        self.conn.executescript(self.SCHEMA)
+        self.template_rows: int | None = None
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer: threading.Thread | None = None
+        self._guilds: dict[str, tuple[str, list | None]] = {}  # guild id → latest unwritten config
+        self._guilds_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @staticmethod
+    def _transaction(conn: sqlite3.Connection, fn):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    # Writer thread: the loop only queues writes, lock waits happen here
+    def _submit(self, fn, size: int = 0):
+        """Run `fn(conn)` in its own transaction on the writer thread, after every write queued before it.
+
+        A callable returned by `fn` runs once the transaction has committed.
+        """
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="sqlite-writer", daemon=True)
+            self._writer.start()
+        self._queue.put((fn, size))
+
+    def _write_loop(self):
+        conn = self._connect()
+        while (job := self._queue.get()) is not None:
+            fn, size = job
+            if isinstance(fn, concurrent.futures.Future):
+                fn.set_result(None)  # flush marker: everything before it is committed
+                continue
+            start = time.perf_counter()
+            for attempt in range(1, SQLITE_WRITE_ATTEMPTS + 1):
+                try:
+                    committed = self._transaction(conn, fn)
+                    break
+                except sqlite3.OperationalError as e:  # "database is locked" past busy_timeout
+                    if attempt == SQLITE_WRITE_ATTEMPTS:
+                        print(f"⚠️ Failed to write {self.path}: {e!r}")
+                    else:
+                        time.sleep(attempt)
+            else:
+                continue
+            if callable(committed):
+                committed()
+            self._record(start, size)
+        conn.close()
+
+    async def flush(self):
+        if self._writer is not None and self._writer.is_alive():
+            done = concurrent.futures.Future()
+            self._queue.put((done, 0))
+            await asyncio.wrap_future(done)
+
+    def flush_sync(self):
+        if self._writer is not None and self._writer.is_alive():
+            done = concurrent.futures.Future()
+            self._queue.put((done, 0))
+            done.result()
+
+    @property
+    def dirty(self) -> bool:
+        return not self._queue.empty()
+
+    def migrate_json(self, config_path: str, templates_path: str):
+        """Import config.json and templates.json, once per database."""
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return
+        cfg, tpls = {"guilds": {}}, {}
+        if os.path.exists(config_path):
+            with open(config_path, encoding="utf-8") as f:
+                cfg = json.load(f)
+        if os.path.exists(templates_path):
+            with open(templates_path, encoding="utf-8") as f:
+                tpls = json.load(f)
+        # Changes not yet compacted into templates.json
+        tpls.update((str(owner), tpl) for owner, tpl in read_template_log(f"{templates_path}.log"))
+
+        def run(conn):
+            # Cluster workers may start together: re-check under the write lock
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+                return False
+            for gid, guild_cfg in cfg.get("guilds", {}).items():
+                self._put_guild(conn, gid, *self._guild_rows(gid, guild_cfg, permissions=True))
+            conn.executemany(
+                "INSERT OR REPLACE INTO templates (owner_id, data) VALUES (?, ?)",
+                ((int(owner), json.dumps(tpl, ensure_ascii=False)) for owner, tpl in tpls.items() if owner.isdigit()),
+            )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (str(_now_ts()),))
+            return True
+        # Runs at import, before the loop exists
+        if self._transaction(self.conn, run):
+            print(f"📦 Imported {len(cfg.get('guilds', {}))} guild configs and {len(tpls)} templates into {self.path}")
+
+    # Guild config & permissions
+    def load_config(self) -> dict:
+        guilds = {
+            str(gid): json.loads(data)
+            for gid, data in self.conn.execute("SELECT guild_id, data FROM guild_config")
+        }
+        for gid, list_name, kind, target_id, expires in self.conn.execute(
+            "SELECT guild_id, list_name, type, target_id, expires FROM permissions ORDER BY rowid"
+        ):
+            perms = guilds.setdefault(str(gid), {}).setdefault("permissions", {"allowed": [], "banned": []})
+            perms.setdefault(list_name, []).append({"type": kind, "id": target_id, "expires": expires})
+        return {"guilds": guilds}
+
+    @staticmethod
+    def _guild_rows(guild_id: str, cfg: dict, permissions: bool) -> tuple[str, list | None]:
+        data = json.dumps({k: v for k, v in cfg.items() if k != "permissions"}, ensure_ascii=False)
+        if not permissions:
+            return data, None
+        gid = int(guild_id)
+        return data, [
+            (gid, list_name, e["type"], e["id"], e["expires"])
+            for list_name, entries in cfg.get("permissions", {}).items()
+            for e in entries
+        ]
+
+    @staticmethod
+    def _put_guild(conn: sqlite3.Connection, guild_id: str, data: str, permission_rows: list | None):
+        conn.execute("INSERT OR REPLACE INTO guild_config (guild_id, data) VALUES (?, ?)", (int(guild_id), data))
+        if permission_rows is not None:
+            conn.execute("DELETE FROM permissions WHERE guild_id = ?", (int(guild_id),))
+            conn.executemany(
+                "INSERT INTO permissions (guild_id, list_name, type, target_id, expires) VALUES (?, ?, ?, ?, ?)",
+                permission_rows,
+            )
+
+    def save_guild(self, guild_id: str, cfg: dict, permissions: bool = False):
+        """Queue a guild's settings; its permission rows are rewritten only with `permissions`.
+
+        Saves of the same guild still waiting in the queue are coalesced into one.
+        """
+        data, rows = self._guild_rows(guild_id, cfg, permissions)
+        with self._guilds_lock:
+            queued = self._guilds.get(guild_id)
+            if queued is not None and rows is None:
+                rows = queued[1]  # keep a permission rewrite that has not run yet
+            self._guilds[guild_id] = (data, rows)
+        if queued is None:
+            taken = []  # survives a retried transaction
+            def run(conn):
+                if not taken:
+                    with self._guilds_lock:
+                        taken.append(self._guilds.pop(guild_id))
+                self._put_guild(conn, guild_id, *taken[0])
+            self._submit(run, len(data))
+
+    def update_permissions(self, guild_id: str, removed: list[tuple[str, str, int]],
+                           upserts: list[tuple[str, dict]]):
+        """Delete (list, type, id) rows and write merged entries in one transaction."""
+        gid = int(guild_id)
+        deletes = [(gid, *key) for key in removed] + [(gid, ln, e["type"], e["id"]) for ln, e in upserts]
+        inserts = [(gid, ln, e["type"], e["id"], e["expires"]) for ln, e in upserts]
+        def run(conn):
+            conn.executemany(
+                "DELETE FROM permissions WHERE guild_id = ? AND list_name = ? AND type = ? AND target_id = ?",
+                deletes,
+            )
+            conn.executemany(
+                "INSERT INTO permissions (guild_id, list_name, type, target_id, expires) VALUES (?, ?, ?, ?, ?)",
+                inserts,
+            )
+        self._submit(run)
+
+    def delete_expired(self, guild_id: str, now_ts: int):
+        self._submit(lambda conn: conn.execute(
+            "DELETE FROM permissions WHERE guild_id = ? AND expires IS NOT NULL AND expires <= ?",
+            (int(guild_id), now_ts),
+        ))
+
+    # Templates: reads block on disk, so callers on the loop run them in a worker thread
+    def template_count(self) -> int:
+        self.template_rows = self.conn.execute("SELECT COUNT(*) FROM templates").fetchone()[0]
+        return self.template_rows
+
+    def get_template(self, owner_id: int) -> "TemplateRecord | None":
+        row = self.conn.execute("SELECT data FROM templates WHERE owner_id = ?", (owner_id,)).fetchone()
+        return TemplateRecord.from_json(json.loads(row[0])) if row else None
+
+    def put_template(self, owner_id: int, tpl: "TemplateRecord", written=None):
+        """Queue a template write; `written()` is called on the writer thread once it is committed."""
+        data = json.dumps(tpl.to_json(), ensure_ascii=False)
+        def run(conn):
+            new = conn.execute("SELECT 1 FROM templates WHERE owner_id = ?", (owner_id,)).fetchone() is None
+            conn.execute("INSERT OR REPLACE INTO templates (owner_id, data) VALUES (?, ?)", (owner_id, data))
+            def committed():
+                if new and self.template_rows is not None:
+                    self.template_rows += 1
+                if written is not None:
+                    written()
+            return committed
+        self._submit(run, len(data))
+
+    def close(self):
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+        self.conn.close()
 
 
 # ——— Per-Guild Configuration ——————————————————————————————————
 CONFIG_PATH = os.path.join(BASE_DIR, "config.json")
-if os.path.exists(CONFIG_PATH):
+db: SqliteStore | None = None
+if STORAGE == "sqlite":
+    db = SqliteStore(SQLITE_PATH)
+    db.migrate_json(CONFIG_PATH, TEMPLATES_PATH)
+    config = db.load_config()
+    if SHARD_IDS:
+        # Guilds of other workers' shards are theirs to load and prune
+        config["guilds"] = {gid: cfg for gid, cfg in config["guilds"].items() if owns_guild(int(gid))}
+elif os.path.exists(CONFIG_PATH):
     with open(CONFIG_PATH, encoding="utf-8") as f:
         config = json.load(f)
 else:
     config = {"guilds": {}}
+startup.mark("config")
 
-def save_config():
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
+def _encode(data) -> bytes:
+    # Compact separators keep json.dumps on the C encoder
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
-def _add_permission(guild_id: str, list_name: str, user_id: int, duration_s: int | None):
-    """Add an entry to 'allowed' or 'banned' for a guild, with optional expiry in seconds."""
-    cfg = config["guilds"].setdefault(guild_id, {})
-    perms = cfg.setdefault("permissions", {"allowed": [], "banned": []})
-    entry = {"type": "user", "id": user_id, "expires": None}
+class ConfigSnapshot:
+    """config.json as bytes, re-encoding only the guilds saved since the last snapshot.
+
+    Runs on the loop, so the write-behind thread never sees a dict that is
+    still being mutated, and unchanged guilds cost a join instead of a dump.
+    """
+
+    def __init__(self):
+        self._guilds: dict[str, bytes] = {}  # guild id → encoded '"id":{...}'
+        self._dirty: set[str] | None = None  # None: everything
+
+    def touch(self, guild_id: str | None):
+        if guild_id is None:
+            self._dirty = None
+        elif self._dirty is not None:
+            self._dirty.add(guild_id)
+
+    def __call__(self) -> bytes:
+        guilds = config["guilds"]
+        if self._dirty is None:
+            self._guilds.clear()
+        for gid in guilds if self._dirty is None else self._dirty:
+            if gid in guilds:
+                self._guilds[gid] = _encode(gid) + b":" + _encode(guilds[gid])
+            else:
+                self._guilds.pop(gid, None)
+        self._dirty = set()
+        rest = _encode({k: v for k, v in config.items() if k != "guilds"})[1:-1]
+        return b'{"guilds":{' + b",".join(self._guilds.values()) + b"}" + (b"," + rest if rest else b"") + b"}"
+
+config_snapshot = ConfigSnapshot()
+config_file = JsonFile(CONFIG_PATH, config_snapshot)
+
+def save_config(guild_id: str | None = None, permissions: bool = False):
+    """Persist config; with the SQLite backend only the given guild's settings are rewritten,
+    and its permission rows only with `permissions` (they are otherwise kept per entry)."""
+    if db is None:
+        config_snapshot.touch(guild_id)
+        return config_file.mark_dirty()
+    for gid in ([guild_id] if guild_id is not None else list(config["guilds"])):
+        db.save_guild(gid, config["guilds"].get(gid, {}), permissions)
+
+def _duration(years=0, months=0, days=0, hours=0, minutes=0, seconds=0) -> int | None:
+    """Seconds of a grant/ban given in command units (a month is 30 days), or None for permanent."""
+    total_secs = (
+        years   * 365 * 24 * 3600 +
+        months  * 30  * 24 * 3600 +
+        days    * 24  * 3600 +
+        hours   * 3600 +
+        minutes * 60 +
+        seconds
+    )
+    return total_secs if total_secs > 0 else None
+
+def _perm_entry(kind: str, target_id: int, duration_s: int | None) -> dict:
+    """A permission entry for a user or role, with optional expiry in seconds."""
+    entry = {"type": kind, "id": target_id, "expires": None}
     if duration_s:
         entry["expires"] = int((datetime.utcnow() + timedelta(seconds=duration_s)).timestamp())
-    perms.setdefault(list_name, []).append(entry)
-    save_config()
+    return entry
+
+def _update_permissions(guild_id: str, add: dict[str, list[dict]] | None = None,
+                        remove: dict[str, set[tuple[str, int]]] | None = None, replace: bool = False) -> int:
+    """Apply a batch of 'allowed'/'banned' changes to a guild with one index pass and one save.
+
+    `remove` drops every entry for the given (type, id) keys. Entries in `add`
+    are merged by (type, id): an existing entry keeps the later expiry instead
+    of gaining a duplicate. `replace` clears both lists first. Returns how many
+    entries were removed, added or extended.
+    """
+    cfg = config["guilds"].setdefault(guild_id, {})
+    if replace:
+        cfg["permissions"] = {"allowed": [], "banned": []}
+        perm_indexes[guild_id] = PermissionIndex()
+        denied_members.invalidate(guild_id)
+    perms = cfg.setdefault("permissions", {"allowed": [], "banned": []})
+    index = get_perm_index(guild_id)
+    removed: list[tuple[str, str, int]] = []
+    upserts: dict[tuple[str, str, int], tuple[str, dict]] = {}  # one row per key even if the batch repeats it
+    touched: set[tuple[str, int]] = set()
+    for list_name, keys in (remove or {}).items():
+        entries = perms.get(list_name, [])
+        present = keys & {(e["type"], e["id"]) for e in entries}
+        if not present:
+            continue
+        perms[list_name] = [e for e in entries if (e["type"], e["id"]) not in present]
+        for kind, target_id in present:
+            index.discard(list_name, kind, target_id)
+            removed.append((list_name, kind, target_id))
+        touched |= present
+    for list_name, new_entries in (add or {}).items():
+        entries = perms.setdefault(list_name, [])
+        by_key = {(e["type"], e["id"]): e for e in entries}
+        for new in new_entries:
+            key = (new["type"], new["id"])
+            entry = by_key.get(key)
+            if entry is None:
+                entry = by_key[key] = dict(new)
+                entries.append(entry)
+            elif entry["expires"] is None or (new["expires"] is not None and new["expires"] <= entry["expires"]):
+                continue
+            else:
+                entry["expires"] = new["expires"]
+            index.add(list_name, entry)
+            upserts[(list_name, *key)] = (list_name, entry)
+            touched.add(key)
+    if not touched and not replace:
+        return 0
+    for expires in {e["expires"] for _, e in upserts.values()}:
+        permission_expiry.register(guild_id, expires)
+    denied_members.targets_changed(guild_id, touched)
+    if db is not None and not replace:
+        db.update_permissions(guild_id, removed, list(upserts.values()))
+    else:
+        save_config(guild_id, permissions=True)
+    return len(removed) + len(upserts)
+
+def _add_permission(guild_id: str, list_name: str, user_id: int, duration_s: int | None):
+    """Add a user to 'allowed' or 'banned' for a guild, with optional expiry in seconds."""
+    _update_permissions(guild_id, add={list_name: [_perm_entry("user", user_id, duration_s)]})
+
+def _remove_permission(guild_id: str, list_name: str, kind: str, target_id: int):
+    """Remove every entry for `target_id` from 'allowed' or 'banned' of a guild."""
+    _update_permissions(guild_id, remove={list_name: {(kind, target_id)}})
+
+def _prune_expired(guild_id: str, now_ts: int) -> bool:
+    """Drop expired 'allowed'/'banned' entries of a guild. Returns True if anything was removed."""
+    perms = config["guilds"].get(guild_id, {}).get("permissions")
+    if not perms:
+        return False
+    expired: set[tuple[str, int]] = set()
+    for list_name in ("allowed", "banned"):
+        entries = perms.get(list_name, [])
+        kept = [e for e in entries if e["expires"] is None or e["expires"] > now_ts]
+        if len(kept) != len(entries):
+            perms[list_name] = kept
+            expired |= {(e["type"], e["id"]) for e in entries if e["expires"] is not None and e["expires"] <= now_ts}
+    if expired and guild_id in perm_indexes:
+        perm_indexes[guild_id].expire(now_ts)
+    if expired:
+        denied_members.targets_changed(guild_id, expired)
+    return bool(expired)
+
+
+# ——— Permission Index ———————————————————————————————————————————
+class PermissionIndex:
+    """Compiled 'allowed'/'banned' lists of one guild.
+
+    User and role ids map to their latest expiry (None = never), so admission
+    is decided by hash lookups over the member's roles instead of list scans.
+    """
+
+    def __init__(self):
+        self.users: dict[str, dict[int, int | None]] = {"allowed": {}, "banned": {}}
+        self.roles: dict[str, dict[int, int | None]] = {"allowed": {}, "banned": {}}
+
+    @classmethod
+    def build(cls, perms: dict) -> "PermissionIndex":
+        index = cls()
+        for list_name in ("allowed", "banned"):
+            for e in perms.get(list_name, []):
+                index.add(list_name, e)
+        return index
+
+    def _bucket(self, list_name: str, kind: str) -> dict[int, int | None]:
+        return (self.roles if kind == "role" else self.users)[list_name]
+
+    def add(self, list_name: str, entry: dict):
+        bucket = self._bucket(list_name, entry["type"])
+        expires = entry["expires"]
+        if entry["id"] in bucket:
+            current = bucket[entry["id"]]
+            if current is None or (expires is not None and expires <= current):
+                return
+        bucket[entry["id"]] = expires
+
+    def discard(self, list_name: str, kind: str, target_id: int):
+        self._bucket(list_name, kind).pop(target_id, None)
+
+    def expire(self, now_ts: int):
+        for bucket in (*self.users.values(), *self.roles.values()):
+            for target_id in [k for k, exp in bucket.items() if exp is not None and exp <= now_ts]:
+                del bucket[target_id]
+
+    @staticmethod
+    def _active(bucket: dict, target_id: int, now_ts: int) -> bool:
+        if target_id not in bucket:
+            return False
+        expires = bucket[target_id]
+        return expires is None or expires > now_ts
+
+    def _matches(self, list_name: str, member: discord.Member, now_ts: int) -> bool:
+        if self._active(self.users[list_name], member.id, now_ts):
+            return True
+        roles = self.roles[list_name]
+        return bool(roles) and any(self._active(roles, r.id, now_ts) for r in member.roles)
+
+    def check(self, member: discord.Member) -> str | None:
+        """Lang key explaining why `member` may not create a VC, or None if admitted.
+
+        An explicit user ban always wins; role bans (e.g. /vcperm_revoke_all on
+        @everyone) spare administrators and explicitly allowed members.
+        """
+        now_ts = _now_ts()
+        if self._active(self.users["banned"], member.id, now_ts):
+            return "error_banned"
+        if member.guild_permissions.administrator:
+            return None
+        if self._matches("allowed", member, now_ts):
+            return None
+        if self.roles["banned"] and any(self._active(self.roles["banned"], r.id, now_ts) for r in member.roles):
+            return "error_banned"
+        if self.users["allowed"] or self.roles["allowed"]:
+            return "error_no_permission"
+        return None
+
+perm_indexes: dict[str, PermissionIndex] = {}
+
+def get_perm_index(guild_id: str) -> PermissionIndex:
+    index = perm_indexes.get(guild_id)
+    if index is None:
+        perms = config["guilds"].get(guild_id, {}).get("permissions", {})
+        index = perm_indexes[guild_id] = PermissionIndex.build(perms)
+    return index
+
+
+# ——— Permission Expiry Scheduler ———————————————————————————————————
+class PermissionExpiry:
+    """Min-heap of (expires, guild_id) for timed permission entries.
+
+    A single background task sleeps until the earliest expiry, prunes the due
+    guilds and saves config only if an entry was actually removed.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[int, str]] = []
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def register(self, guild_id: str, expires: int | None):
+        if expires is None:
+            return
+        heapq.heappush(self._heap, (expires, guild_id))
+        if self._wakeup and self._heap[0] == (expires, guild_id):
+            self._wakeup.set()
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        for gid, cfg in config["guilds"].items():
+            for list_name in ("allowed", "banned"):
+                for e in cfg.get("permissions", {}).get(list_name, []):
+                    self.register(gid, e["expires"])
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - _now_ts()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            now_ts = _now_ts()
+            due = set()
+            while self._heap and self._heap[0][0] <= now_ts:
+                due.add(heapq.heappop(self._heap)[1])
+            changed = [gid for gid in due if _prune_expired(gid, now_ts)]
+            if changed and db is not None:
+                for gid in changed:
+                    db.delete_expired(gid, now_ts)
+            else:
+                for gid in changed:
+                    save_config(gid)
+
+permission_expiry = PermissionExpiry()
 
 
 # ——— Per-User Templates & Active VCs —————————————————————————————
-templates: dict[int, dict] = {}
-private_vcs: dict[int, dict] = {}
+_NO_IDS = array("Q")  # shared by every record without ids; id arrays are replaced, never mutated
 
-def save_templates():
-    data = {
-        str(owner): tpl for owner, tpl in templates.items()
-    }
-    with open(TEMPLATES_PATH, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def id_array(ids) -> array:
+    """Sorted, de-duplicated user ids packed 8 bytes each."""
+    if isinstance(ids, array):
+        return ids  # already built by id_array
+    ids = sorted(set(ids))
+    return array("Q", ids) if ids else _NO_IDS
 
-async def load_templates():
-    if not os.path.exists(TEMPLATES_PATH):
-        return
-    with open(TEMPLATES_PATH, encoding="utf-8") as f:
-        raw = json.load(f)
-    for owner_str, tpl in raw.items():
+def has_id(ids: array, user_id: int) -> bool:
+    i = bisect_left(ids, user_id)
+    return i < len(ids) and ids[i] == user_id
+
+class TemplateRecord:
+    """A user's saved VC settings; `to_json()` is the templates.json entry format."""
+
+    __slots__ = ("name", "user_limit", "invited", "kicked", "deputies", "visible", "locked")
+
+    def __init__(self, name: str | None = None, user_limit: int = 5, invited=(), kicked=(), deputies=(),
+                 visible: bool = True, locked: bool = False):
+        self.name       = name  # None: "<display name>'s VC"
+        self.user_limit = user_limit
+        self.invited    = id_array(invited)
+        self.kicked     = id_array(kicked)
+        self.deputies   = id_array(deputies)
+        self.visible    = visible
+        self.locked     = locked
+
+    @classmethod
+    def from_json(cls, data: dict) -> "TemplateRecord":
+        return cls(
+            data.get("name"), data.get("user_limit", 5),
+            data.get("invited", ()), data.get("kicked", ()), data.get("deputies", ()),
+            data.get("visible", True), data.get("locked", False),
+        )
+
+    def to_json(self) -> dict:
+        data = {
+            "user_limit": self.user_limit,
+            "invited":    self.invited.tolist(),
+            "kicked":     self.kicked.tolist(),
+            "visible":    self.visible,
+            "locked":     self.locked,
+            "deputies":   self.deputies.tolist(),
+        }
+        if self.name is not None:
+            data = {"name": self.name, **data}
+        return data
+
+class VCRecord:
+    """An active private VC. Only ids are kept; the channel resolves through the guild cache."""
+
+    __slots__ = ("guild_id", "channel_id", "owner", "thread_id", "message", "deputies", "timeout", "empty_since")
+
+    def __init__(self, guild_id: int, channel_id: int, owner: int, thread_id: int | None = None,
+                 message: int | None = None, deputies=(), timeout: int = DEFAULT_TIMEOUT,
+                 empty_since: float | None = None):
+        self.guild_id    = guild_id
+        self.channel_id  = channel_id
+        self.owner       = owner
+        self.thread_id   = thread_id
+        self.message     = message
+        self.deputies    = id_array(deputies)
+        self.timeout     = timeout
+        self.empty_since = empty_since
+
+    @property
+    def channel(self) -> discord.VoiceChannel | None:
+        guild = bot.get_guild(self.guild_id)
+        return guild.get_channel(self.channel_id) if guild else None
+
+    def is_deputy(self, user_id: int) -> bool:
+        return has_id(self.deputies, user_id)
+
+    def add_deputy(self, user_id: int):
+        self.deputies = id_array([*self.deputies, user_id])
+
+    def remove_deputy(self, user_id: int):
+        self.deputies = id_array([d for d in self.deputies if d != user_id])
+
+    @classmethod
+    def from_json(cls, rec: dict) -> "VCRecord":
+        return cls(
+            rec["guild"], rec["channel"], rec["owner"], rec.get("thread"), rec.get("message"),
+            rec.get("deputies", ()), rec.get("timeout", DEFAULT_TIMEOUT), rec.get("empty_since"),
+        )
+
+    def to_json(self) -> dict:
+        return {
+            "channel":     self.channel_id,
+            "guild":       self.guild_id,
+            "owner":       self.owner,
+            "thread":      self.thread_id,
+            "message":     self.message,
+            "deputies":    self.deputies.tolist(),
+            "timeout":     self.timeout,
+            "empty_since": self.empty_since,
+        }
+
+class VCRegistry:
+    """Active private VCs keyed by channel id.
+
+    Reverse indexes ((guild, owner) → channel id and guild → channel ids)
+    are updated together with the main mapping, so owner lookups are O(1)
+    and scoped to the guild they happen in.
+    """
+
+    def __init__(self):
+        self._by_channel: dict[int, VCRecord] = {}
+        self._keys: dict[int, tuple[int, int]] = {}  # channel id → (guild id, owner id)
+        self._by_guild_owner: dict[tuple[int, int], int] = {}
+        self._by_guild: dict[int, set[int]] = {}
+        self.on_change = None  # called after every insert/pop, e.g. to persist the registry
+
+    def changed(self):
+        if self.on_change:
+            self.on_change()
+
+    def __setitem__(self, channel_id: int, record: VCRecord):
+        if channel_id in self._by_channel:
+            self._unindex(channel_id)
+        key = (record.guild_id, record.owner)
+        self._by_channel[channel_id] = record
+        self._keys[channel_id] = key
+        self._by_guild_owner[key] = channel_id
+        self._by_guild.setdefault(key[0], set()).add(channel_id)
+        self.changed()
+
+    def _unindex(self, channel_id: int):
+        guild_id, _ = key = self._keys.pop(channel_id)
+        if self._by_guild_owner.get(key) == channel_id:
+            del self._by_guild_owner[key]
+        in_guild = self._by_guild.get(guild_id)
+        if in_guild is not None:
+            in_guild.discard(channel_id)
+            if not in_guild:
+                del self._by_guild[guild_id]
+
+    def pop(self, channel_id: int, default=None):
+        if channel_id not in self._by_channel:
+            return default
+        self._unindex(channel_id)
+        record = self._by_channel.pop(channel_id)
+        self.changed()
+        return record
+
+    def __getitem__(self, channel_id: int) -> VCRecord:
+        return self._by_channel[channel_id]
+
+    def __contains__(self, channel_id) -> bool:
+        return channel_id in self._by_channel
+
+    def __len__(self) -> int:
+        return len(self._by_channel)
+
+    def __iter__(self):
+        return iter(self._by_channel)
+
+    def get(self, channel_id: int, default=None):
+        return self._by_channel.get(channel_id, default)
+
+    def values(self):
+        return self._by_channel.values()
+
+    def items(self):
+        return self._by_channel.items()
+
+    def owned_by(self, owner_id: int, guild_id: int) -> VCRecord | None:
+        channel_id = self._by_guild_owner.get((guild_id, owner_id))
+        return self._by_channel.get(channel_id) if channel_id is not None else None
+
+    def channels_in(self, guild_id: int) -> set[int]:
+        return self._by_guild.get(guild_id, set())
+
+private_vcs = VCRegistry()
+
+
+# ——— Template Store ——————————————————————————————————————————————
+TEMPLATE_INDEX = struct.Struct("<QQI")   # owner id, value offset, value length
+TEMPLATE_HEADER = struct.Struct("<4sQQQ")  # magic, entries, indexed file size, indexed file mtime_ns
+TEMPLATE_INDEX_MAGIC = b"VTI1"
+
+class _TemplateCache(ABC):
+    """LRU of decoded templates (None caches "no template") in front of a backend lookup."""
+
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        self._lru: OrderedDict[int, TemplateRecord | None] = OrderedDict()
+        self.hits   = 0
+        self.misses = 0
+
+    @abstractmethod
+    def _load(self, owner_id: int) -> TemplateRecord | None:
+        """The stored template of `owner_id`, or None."""
+
+    @abstractmethod
+    def _store(self, owner_id: int, tpl: TemplateRecord):
+        """Persist `tpl` as the template of `owner_id`."""
+
+    async def _load_async(self, owner_id: int) -> TemplateRecord | None:
+        return self._load(owner_id)
+
+    def get(self, owner_id: int) -> TemplateRecord | None:
+        if owner_id in self._lru:
+            self.hits += 1
+            self._lru.move_to_end(owner_id)
+            return self._lru[owner_id]
+        self.misses += 1
+        tpl = self._load(owner_id)
+        self._remember(owner_id, tpl)
+        return tpl
+
+    async def fetch(self, owner_id: int) -> TemplateRecord | None:
+        """`get` for the event loop: a cache miss is loaded without blocking it."""
+        if owner_id in self._lru:
+            return self.get(owner_id)
+        self.misses += 1
+        tpl = await self._load_async(owner_id)
+        self._remember(owner_id, tpl)
+        return tpl
+
+    def put(self, owner_id: int, tpl: TemplateRecord):
+        self._store(owner_id, tpl)
+        self._remember(owner_id, tpl)
+
+    def _remember(self, owner_id: int, tpl: TemplateRecord | None):
+        if self.cache_size <= 0:
+            return
+        self._lru[owner_id] = tpl
+        self._lru.move_to_end(owner_id)
+        while len(self._lru) > self.cache_size:
+            self._lru.popitem(last=False)
+
+    def cache_stats(self) -> dict:
+        return {"cached": len(self._lru), "hits": self.hits, "misses": self.misses}
+
+class TemplateStore(_TemplateCache, WriteBehind):
+    """templates.json read on demand through a sorted on-disk index.
+
+    The file stays a JSON object, written one `"owner": {...}` entry per
+    line sorted by owner; `<file>.idx` maps owner → value offset and is
+    memory-mapped, so opening costs the same for ten templates or ten
+    million. Changes go to an append-only `<file>.log` (write-behind, like
+    JsonFile) plus an in-memory overlay, and are folded back into the file
+    by a background compaction once the overlay grows past `compact_after`.
+    """
+
+    def __init__(self, path: str, cache_size: int, compact_after: int, delay: float = SAVE_DELAY):
+        _TemplateCache.__init__(self, cache_size)
+        WriteBehind.__init__(self, delay)
+        self.path          = path
+        self.index_path    = f"{path}.idx"
+        self.log_path      = f"{path}.log"
+        self.compact_after = compact_after
+        self.compactions   = 0
+        self._overlay: dict[int, TemplateRecord] = {}  # changed since the last compaction
+        self._unlogged: list[bytes] = []
+        self._count    = 0
+        self._added    = 0  # overlay owners not in the index yet
+        self._file     = self._data = self._index = None
+        self._compacting = False
+        self._log_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count + self._added
+
+    # Opening
+    def open(self):
+        """Map the index (rebuilding it if stale), then replay the change log. Called once per process."""
+        if os.path.exists(self.path) and not self._map():
+            self._rebuild()
+            self._map()
+        for owner, data in read_template_log(self.log_path):
+            self._overlay[owner] = TemplateRecord.from_json(data)
+        self._recount()
+
+    def _recount(self):
+        self._added = sum(1 for owner in self._overlay if self._lookup(owner) is None)
+
+    def _map(self) -> bool:
         try:
-            owner = int(owner_str)
-        except ValueError:
-            continue
-        templates[owner] = tpl
+            stat = os.stat(self.path)
+            with open(self.index_path, "rb") as f:
+                header = f.read(TEMPLATE_HEADER.size)
+                magic, count, size, mtime_ns = TEMPLATE_HEADER.unpack(header)
+                if magic != TEMPLATE_INDEX_MAGIC or (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                    return False
+                index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if count else None
+        except (OSError, struct.error):
+            return False
+        self._close()
+        self._count, self._index = count, index
+        if count:
+            self._file = open(self.path, "rb")
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return True
 
-def update_template_from_channel(owner_id: int, channel: discord.VoiceChannel, deputies: list[int]):
-    invited = []
-    kicked = []
-    for target, perm in channel.overwrites.items():
-        if isinstance(target, discord.Member):
-            if perm.connect is True:
-                invited.append(target.id)
-            if perm.connect is False:
-                kicked.append(target.id)
-    default_overwrite = channel.overwrites.get(channel.guild.default_role)
-    visible = True
-    locked = False
-    if default_overwrite:
-        if default_overwrite.view_channel is not None:
-            visible = default_overwrite.view_channel
-        if default_overwrite.connect is not None:
-            locked = not default_overwrite.connect
-    templates[owner_id] = {
-        "name":       channel.name,
-        "user_limit": channel.user_limit,
-        "invited":    invited,
-        "kicked":     kicked,
-        "visible":    visible,
-        "locked":     locked,
-        "deputies":   deputies,
-    }
-    save_templates()
+    def _close(self):
+        for handle in (self._index, self._data, self._file):
+            if handle is not None:
+                handle.close()
+        self._file = self._data = self._index = None
+        self._count = 0
+
+    def _scan(self):
+        """Entries of a file in the one-per-line layout, or None if it is in any other layout."""
+        entries, offset, previous = [], 0, -1
+        with open(self.path, "rb") as f:
+            for line in f:
+                start, offset = offset, offset + len(line)
+                body = line.rstrip(b"\r\n").rstrip(b",")
+                if body in (b"{", b"}", b""):
+                    continue
+                key, sep, value = body.partition(b": ")
+                if not sep or not key.startswith(b'"') or not key.endswith(b'"') or not key[1:-1].isdigit():
+                    return None
+                owner = int(key[1:-1])
+                if owner <= previous:
+                    return None
+                previous = owner
+                entries.append((owner, start + len(key) + 2, len(value)))
+        return entries
+
+    def _rebuild(self):
+        """Index a file in the line layout; convert anything else (e.g. an older templates.json) first."""
+        entries = self._scan()
+        if entries is None:
+            print(f"📦 Converting {self.path} to the indexed layout…")
+            with open(self.path, encoding="utf-8") as f:
+                raw = json.load(f)
+            values = sorted(
+                (int(owner), json.dumps(tpl, ensure_ascii=False).encode("utf-8"))
+                for owner, tpl in raw.items() if owner.isdigit()
+            )
+            del raw
+            self._write_file(f"{self.path}.tmp", iter(values))
+            os.replace(f"{self.path}.tmp", self.path)
+            entries = self._scan()
+        self._write_index(self.index_path, entries, self.path)
+
+    # Lookups
+    def _lookup(self, owner_id: int) -> bytes | None:
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) // 2
+            owner, offset, length = TEMPLATE_INDEX.unpack_from(
+                self._index, TEMPLATE_HEADER.size + mid * TEMPLATE_INDEX.size
+            )
+            if owner < owner_id:
+                low = mid + 1
+            elif owner > owner_id:
+                high = mid
+            else:
+                return self._data[offset:offset + length]
+        return None
+
+    def _load(self, owner_id: int) -> TemplateRecord | None:
+        if owner_id in self._overlay:
+            return self._overlay[owner_id]
+        raw = self._lookup(owner_id)
+        return TemplateRecord.from_json(json.loads(raw)) if raw is not None else None
+
+    def _store(self, owner_id: int, tpl: TemplateRecord):
+        if owner_id not in self._overlay and self._lookup(owner_id) is None:
+            self._added += 1
+        self._overlay[owner_id] = tpl
+        self._unlogged.append(json.dumps([owner_id, tpl.to_json()], ensure_ascii=False).encode("utf-8") + b"\n")
+        self.mark_dirty()
+
+    # Write-behind change log
+    def _flushed(self):
+        if len(self._overlay) >= self.compact_after and not self._compacting:
+            spawn(self.compact())
+
+    def _append(self, lines: list[bytes]) -> int:
+        payload = b"".join(lines)
+        with self._log_lock:
+            with open(self.log_path, "ab") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+        return len(payload)
+
+    def _take_lines(self) -> list[bytes]:
+        self.dirty = False
+        lines, self._unlogged = self._unlogged, []
+        return lines
+
+    async def flush(self):
+        if not self.dirty:
+            return
+        lines = self._take_lines()
+        start = time.perf_counter()
+        try:
+            size = await asyncio.to_thread(self._append, lines)
+        except OSError as e:
+            print(f"⚠️ Failed to write {self.log_path}: {e!r}")
+            self._unlogged[:0] = lines
+            self.mark_dirty()
+            return
+        self._record(start, size)
+
+    def flush_sync(self):
+        if not self.dirty:
+            return
+        start = time.perf_counter()
+        self._record(start, self._append(self._take_lines()))
+
+    # Compaction
+    def _merged(self, changes: dict[int, TemplateRecord]):
+        """(owner, value bytes) of the indexed file with `changes` applied, sorted by owner."""
+        changed = sorted(changes)
+        i = 0
+        for n in range(self._count):
+            owner, offset, length = TEMPLATE_INDEX.unpack_from(
+                self._index, TEMPLATE_HEADER.size + n * TEMPLATE_INDEX.size
+            )
+            while i < len(changed) and changed[i] < owner:
+                yield changed[i], json.dumps(changes[changed[i]].to_json(), ensure_ascii=False).encode("utf-8")
+                i += 1
+            if i < len(changed) and changed[i] == owner:
+                i += 1
+                yield owner, json.dumps(changes[owner].to_json(), ensure_ascii=False).encode("utf-8")
+            else:
+                yield owner, self._data[offset:offset + length]
+        for owner in changed[i:]:
+            yield owner, json.dumps(changes[owner].to_json(), ensure_ascii=False).encode("utf-8")
+
+    @staticmethod
+    def _write_file(path: str, values) -> list[tuple[int, int, int]]:
+        entries = []
+        with open(path, "wb") as f:
+            f.write(b"{\n")
+            position = 2
+            for n, (owner, value) in enumerate(values):
+                prefix = (b",\n" if n else b"") + b'"%d": ' % owner
+                f.write(prefix)
+                f.write(value)
+                entries.append((owner, position + len(prefix), len(value)))
+                position += len(prefix) + len(value)
+            f.write(b"\n}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return entries
+
+    @staticmethod
+    def _write_index(path: str, entries: list[tuple[int, int, int]], data_path: str):
+        # Stamped with the data file's size and mtime (kept by os.replace); a mismatch on open means "rebuild"
+        stat = os.stat(data_path)
+        with open(path, "wb") as f:
+            f.write(TEMPLATE_HEADER.pack(TEMPLATE_INDEX_MAGIC, len(entries), stat.st_size, stat.st_mtime_ns))
+            for entry in entries:
+                f.write(TEMPLATE_INDEX.pack(*entry))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rotate_log(self):
+        # Changes from here on go to a fresh log; the rotated one is dropped once folded in
+        if not os.path.exists(self.log_path):
+            return
+        old = f"{self.log_path}.old"
+        if not os.path.exists(old):
+            return os.replace(self.log_path, old)
+        # A previous compaction failed: keep its entries too
+        with open(self.log_path, "rb") as src, open(old, "ab") as dst:
+            dst.write(src.read())
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.remove(self.log_path)
+
+    def _compact_files(self, changes: dict[int, TemplateRecord]):
+        entries = self._write_file(f"{self.path}.tmp", self._merged(changes))
+        self._write_index(f"{self.index_path}.tmp", entries, f"{self.path}.tmp")
+
+    async def compact(self):
+        """Fold the overlay into templates.json and its index in a worker thread."""
+        if self._compacting:
+            return
+        self._compacting = True
+        try:
+            await self.flush()
+            with self._log_lock:
+                self._rotate_log()
+            changes = dict(self._overlay)
+            start = time.perf_counter()
+            await asyncio.to_thread(self._compact_files, changes)
+            self._close()
+            os.replace(f"{self.path}.tmp", self.path)
+            os.replace(f"{self.index_path}.tmp", self.index_path)
+            if os.path.exists(f"{self.log_path}.old"):
+                os.remove(f"{self.log_path}.old")
+            self._map()
+            for owner, tpl in changes.items():
+                if self._overlay.get(owner) is tpl:
+                    del self._overlay[owner]
+            self._recount()
+            self.compactions += 1
+            print(f"🗜️ Compacted {len(changes)} template changes into {self.path} "
+                  f"in {time.perf_counter() - start:.2f}s")
+        except OSError as e:
+            print(f"⚠️ Template compaction failed: {e!r}")
+            if self._index is None and os.path.exists(self.path):
+                self._map()
+                self._recount()
+        finally:
+            self._compacting = False
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "indexed":            self._count,
+            "overlay":            len(self._overlay),
+            "compactions":        self.compactions,
+            **self.cache_stats(),
+        }
+
+class SqliteTemplates(_TemplateCache):
+    """Templates read per owner from SQLite; uncached in cluster mode, where other workers write too."""
+
+    def __init__(self, store: SqliteStore, cache_size: int):
+        super().__init__(0 if CLUSTERED else cache_size)
+        self.store = store
+        self._unwritten: dict[int, TemplateRecord] = {}  # queued for the writer thread, not committed yet
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        # Counted once on open, then kept current by the writer; never a COUNT(*) on the loop
+        return self.store.template_rows or 0
+
+    def open(self):
+        self.store.template_count()
+
+    def _load(self, owner_id: int) -> TemplateRecord | None:
+        with self._lock:
+            if owner_id in self._unwritten:
+                return self._unwritten[owner_id]
+        return self.store.get_template(owner_id)
+
+    async def _load_async(self, owner_id: int) -> TemplateRecord | None:
+        return await asyncio.to_thread(self._load, owner_id)
+
+    def _store(self, owner_id: int, tpl: TemplateRecord):
+        with self._lock:
+            self._unwritten[owner_id] = tpl
+        def written():
+            with self._lock:
+                if self._unwritten.get(owner_id) is tpl:
+                    del self._unwritten[owner_id]
+        self.store.put_template(owner_id, tpl, written)
+
+if db is not None:
+    templates = SqliteTemplates(db, TEMPLATE_CACHE_SIZE)
+else:
+    templates = TemplateStore(TEMPLATES_PATH, TEMPLATE_CACHE_SIZE, TEMPLATE_COMPACT_AFTER)
+
+_templates_opened = False
+
+async def load_templates():
+    """Open the template store, once per process (not on every reconnect)."""
+    global _templates_opened
+    if not _templates_opened:
+        _templates_opened = True
+        await asyncio.to_thread(templates.open)
+
+def update_template_from_channel(owner_id: int, channel: discord.VoiceChannel, deputies):
+    invited = []
+    kicked = []
+    for target, perm in channel.overwrites.items():
+        # Uncached members (minimal intents) come back as discord.Object(type=User)
+        if isinstance(target, discord.Member) or getattr(target, "type", None) in (discord.User, discord.Member):
+            if perm.connect is True:
+                invited.append(target.id)
+            if perm.connect is False:
+                kicked.append(target.id)
+    default_overwrite = channel.overwrites.get(channel.guild.default_role)
+    visible = True
+    locked = False
+    if default_overwrite:
+        if default_overwrite.view_channel is not None:
+            visible = default_overwrite.view_channel
+        if default_overwrite.connect is not None:
+            locked = not default_overwrite.connect
+    tpl = TemplateRecord(channel.name, channel.user_limit, invited, kicked, deputies, visible, locked)
+    templates.put(owner_id, tpl)
+
+async def get_user_template(owner_id: int) -> TemplateRecord | None:
+    return await templates.fetch(owner_id)
+
+def get_user_vc(owner_id: int, guild_id: int) -> VCRecord | None:
+    record = private_vcs.owned_by(owner_id, guild_id)
+    if record is not None and record.channel is None:
+        # Channel was deleted out-of-band: drop the stale record
+        private_vcs.pop(record.channel_id, None)
+        auto_delete.cancel(record.channel_id)
+        return None
+    return record
+
+
+# ——— Latency Metrics ——————————————————————————————————————————————
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class LatencyRecorder:
+    """Rolling window of latency samples with percentile summaries, plus cumulative histogram buckets."""
+
+    def __init__(self, name: str, window: int = 2048, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name    = name
+        self.samples: deque[float] = deque(maxlen=window)
+        self.count   = 0
+        self.total   = 0.0
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # last slot: above the largest bound
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.bucket_counts[bisect_left(self.buckets, seconds)] += 1
+
+    def percentile(self, p: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "p50":   round(self.percentile(0.50), 6),
+            "p99":   round(self.percentile(0.99), 6),
+        }
+
+trigger_to_move    = LatencyRecorder("trigger_to_move")
+voice_state_update = LatencyRecorder("voice_state_update")
+command_latency: dict[str, LatencyRecorder] = {}
+command_errors:  dict[str, int] = {}
+rest_latency:    dict[str, LatencyRecorder] = {}
+
+def _observe_rest(route: str, waited: float, duration: float, error):
+    recorder = rest_latency.get(route)
+    if recorder is None:
+        recorder = rest_latency[route] = LatencyRecorder(route)
+    recorder.observe(duration)
+
+class LoopLagMonitor:
+    """Event-loop lag: how late a sleep of `interval` seconds wakes up."""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.lag      = 0.0
+        self.max_lag  = 0.0
+        self.beat     = time.monotonic()  # last wakeup; the diagnostics watchdog reads it from its thread
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - started - self.interval)
+            self.max_lag = max(self.max_lag, self.lag)
+            self.beat = time.monotonic()
+            if diagnostics.enabled and self.lag >= diagnostics.threshold:
+                diagnostics.log.warning("loop lag %.0f ms", self.lag * 1000)
+
+loop_lag = LoopLagMonitor()
+
+_background_tasks: set[asyncio.Task] = set()
+
+def spawn(coro) -> asyncio.Task:
+    """Run `coro` in the background, keeping a reference until it finishes."""
+    task = asyncio.get_running_loop().create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+# ——— Diagnostics ————————————————————————————————————————————————
+DIAG_LOG_PATH    = os.getenv("BOT_DIAG_LOG", os.path.join(BASE_DIR, "diagnostics.log"))
+DIAG_MODE        = os.getenv("BOT_DIAGNOSTICS", "off")  # "off", "on" or "profile"; /vcdiag switches at runtime
+SLOW_CALLBACK_S  = float(os.getenv("BOT_SLOW_CALLBACK_MS", "250")) / 1000
+PROFILE_INTERVAL = 0.01  # seconds between stack samples while profiling
+PROFILE_REPORT_S = 60    # seconds between profile summaries
+
+class Diagnostics:
+    """Loop stall detection and sampling profiles, written to a rotating log file.
+
+    A watchdog thread checks the loop-lag heartbeat; when the loop has not
+    come back for longer than `threshold`, it logs the loop thread's stack
+    and the handler running it. With profiling on it also samples that stack
+    every PROFILE_INTERVAL and attributes samples to the handler registered
+    for the current task (voice state updates, panel buttons, slash commands).
+    Handlers only pay a dict insert, and only while profiling.
+    """
+
+    def __init__(self, path: str = DIAG_LOG_PATH, threshold: float = SLOW_CALLBACK_S):
+        self.path      = path
+        self.threshold = threshold
+        self.enabled   = False
+        self.profiling = False
+        self.stalls    = 0
+        self.log = logging.getLogger("voicy.diagnostics")
+        self.log.setLevel(logging.INFO)
+        self.log.propagate = False
+        self._handlers: dict[asyncio.Task, str] = {}
+        self._samples:  dict[str, Counter] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread = 0
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    @property
+    def mode(self) -> str:
+        return "profile" if self.profiling else "on" if self.enabled else "off"
+
+    def set_mode(self, mode: str):
+        """Switch to "off", "on" or "profile"; must be called on the loop thread."""
+        if mode == "off":
+            return self._disable()
+        if not self.log.handlers:
+            handler = RotatingFileHandler(self.path, maxBytes=5 * 2**20, backupCount=3, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+            self.log.addHandler(handler)
+        if self.profiling and mode != "profile":
+            self._report()
+        self.profiling = mode == "profile"
+        self.enabled   = True
+        self._loop        = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="voicy-watchdog", daemon=True)
+            self._thread.start()
+        self.log.info("diagnostics %s (slow callback threshold %.0f ms)", self.mode, self.threshold * 1000)
+
+    def _disable(self):
+        if not self.enabled:
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.profiling:
+            self._report()
+        self.log.info("diagnostics off")
+        self.enabled = self.profiling = False
+        self._handlers.clear()
+
+    def enter(self, name: str):
+        """Attribute profile samples of the current task to `name` until it finishes."""
+        if not self.profiling:
+            return
+        task = asyncio.current_task()
+        if task is not None and task not in self._handlers:
+            self._handlers[task] = name
+            task.add_done_callback(self._leave)
+
+    def _leave(self, task: asyncio.Task):
+        self._handlers.pop(task, None)
+
+    def _current(self) -> str:
+        # Read from the watchdog thread; a stale answer only mislabels one sample
+        task = asyncio.current_task(self._loop)
+        if task is None:
+            return "loop callback"
+        return self._handlers.get(task) or getattr(task.get_coro(), "__qualname__", task.get_name())
+
+    def _watch(self):
+        reported = None
+        next_report = time.monotonic() + PROFILE_REPORT_S
+        while not self._stop.wait(PROFILE_INTERVAL if self.profiling else self.threshold / 4):
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            beat = loop_lag.beat
+            stalled = time.monotonic() - beat - loop_lag.interval
+            if stalled >= self.threshold and reported != beat:
+                reported = beat
+                self.stalls += 1
+                self.log.warning("loop blocked for %.0f ms in %s\n%s", stalled * 1000, self._current(),
+                                 "".join(traceback.format_stack(frame, limit=25)).rstrip())
+            if self.profiling:
+                self._sample(frame)
+                if time.monotonic() >= next_report:
+                    next_report = time.monotonic() + PROFILE_REPORT_S
+                    self._report()
+
+    def _sample(self, frame):
+        task = asyncio.current_task(self._loop)
+        name = self._handlers.get(task) if task is not None else None
+        if name is None:
+            return
+        leaf = frame.f_code
+        own = next((f.f_code for f, _ in traceback.walk_stack(frame) if f.f_code.co_filename == __file__), None)
+        counts = self._samples.setdefault(name, Counter())
+        counts[f"{leaf.co_name} ({os.path.basename(leaf.co_filename)}:{frame.f_lineno})"] += 1
+        if own is not None and own is not leaf:
+            counts[f"bot.py:{own.co_name}"] += 1
+
+    def _report(self):
+        samples, self._samples = self._samples, {}
+        for name, counts in sorted(samples.items()):
+            top = ", ".join(f"{where} ×{n}" for where, n in counts.most_common(8))
+            self.log.info("profile %s: %s", name, top)
+
+diagnostics = Diagnostics()
+
+
+# ——— Traffic Recorder ——————————————————————————————————————————————
+RECORD_PATH = os.getenv("BOT_RECORD", "")  # append anonymized traffic here for bench.replay; "" disables
+
+class TrafficRecorder:
+    """Anonymized, append-only log of voice state updates and interactions, replayed by bench.replay.
+
+    One JSON array per line: `[t, "v", guild, member, before, after]` for voice
+    updates and `[t, "i", guild, user, name, options, channel]` for commands and
+    panel buttons, with `t` in seconds since the session started. Ids are keyed
+    hashes with a random key per process, so sessions (delimited by a
+    `[0, "session", version]` line) do not share ids. Channels are recorded by
+    role: `["t"]` trigger, `["p", owner]` a private VC, `["o", id]` any other.
+    Free-text options (names) are dropped; numbers and flags are kept.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str = RECORD_PATH):
+        self.path    = path
+        self.events  = 0
+        self._key    = os.urandom(16)
+        self._file   = None
+        self._start  = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def anon(self, snowflake: int) -> int:
+        digest = hashlib.blake2b(snowflake.to_bytes(8, "little"), key=self._key, digest_size=6).digest()
+        return int.from_bytes(digest, "little")
+
+    def _write(self, kind: str, *fields):
+        if self._file is None:
+            self._file  = open(self.path, "a", encoding="utf-8", buffering=1 << 16)
+            self._start = asyncio.get_running_loop().time()
+            self._file.write(json.dumps([0, "session", self.VERSION]) + "\n")
+        t = round(asyncio.get_running_loop().time() - self._start, 3)
+        self._file.write(json.dumps([t, kind, *fields], separators=(",", ":")) + "\n")
+        self.events += 1
+
+    def _channel(self, channel_id: int | None, guild_id: int):
+        if channel_id is None:
+            return None
+        trigger_id = config["guilds"].get(str(guild_id), {}).get("trigger_channel_id", CREATE_VC_CHANNEL_ID)
+        if channel_id == trigger_id:
+            return ["t"]
+        if (data := private_vcs.get(channel_id)) is not None:
+            return ["p", self.anon(data.owner)]
+        return ["o", self.anon(channel_id)]
+
+    def voice(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+        gid = member.guild.id
+        self._write("v", self.anon(gid), self.anon(member.id),
+                    self._channel(before.channel and before.channel.id, gid),
+                    self._channel(after.channel and after.channel.id, gid))
+
+    def interaction(self, interaction: discord.Interaction, name: str):
+        options, pending = {}, list((interaction.data or {}).get("options", ()))
+        while pending:
+            opt = pending.pop()
+            if opt.get("type") in (1, 2):        # subcommand (group): its options are nested
+                pending.extend(opt.get("options", ()))
+            elif opt.get("type") in (4, 5, 10):  # integer, boolean, number
+                options[opt["name"]] = opt["value"]
+            elif opt.get("type") in (6, 8, 9):  # user, role, mentionable
+                options[opt["name"]] = self.anon(int(opt["value"]))
+        gid = interaction.guild_id or 0
+        self._write("i", self.anon(gid), self.anon(interaction.user.id), name, options,
+                    self._channel(interaction.channel_id, gid))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+traffic_recorder = TrafficRecorder()
+
+# ——— REST Scheduler ——————————————————————————————————————————————
+PRIORITY_USER        = 0  # a member is waiting on it: moves, channel creation
+PRIORITY_INTERACTIVE = 1  # owner-initiated edits and deletes
+PRIORITY_BACKGROUND  = 2  # panels, threads, DMs, cleanup deletes
+
+# Concurrent in-flight calls per route; anything above waits in priority order
+ROUTE_LIMITS = {
+    "move_member":    8,
+    "create_channel": 4,
+    "edit_channel":   4,
+    "delete_channel": 2,
+    "send_message":   4,
+    "create_thread":  2,
+    "fetch":          4,
+    "dm":             2,
+}
+DEFAULT_ROUTE_LIMIT = 4
+GLOBAL_REST_LIMIT   = int(os.getenv("BOT_REST_CONCURRENCY", "16"))  # in-flight calls across all routes
+
+class _PriorityGate:
+    """Counting semaphore whose waiters are woken by priority, then FIFO."""
+
+    def __init__(self, limit: int):
+        self.limit   = limit
+        self.active  = 0
+        self.waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq    = itertools.count()
+
+    async def acquire(self, priority: int):
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)  # hand the slot over, `active` stays the same
+                return
+        self.active -= 1
+
+class _Route(_PriorityGate):
+    def __init__(self, limit: int):
+        super().__init__(limit)
+        self.calls        = 0
+        self.errors       = 0
+        self.rate_limited = 0
+        self.wait_seconds = 0.0
+        self.max_wait     = 0.0
+        self.call_seconds = 0.0
+
+class RestScheduler:
+    """Single gate for the Discord REST calls the bot makes.
+
+    Calls hold a slot of their route and of a global pool; when either is
+    saturated, callers queue by priority (then FIFO), so moving a member never
+    waits behind cleanup deletes. Queue depth, wait time, call duration and
+    429s are tracked per route.
+    """
+
+    def __init__(self, limits: dict[str, int] = ROUTE_LIMITS, global_limit: int = GLOBAL_REST_LIMIT):
+        self.limits = dict(limits)
+        self._routes: dict[str, _Route] = {}
+        self._global = _PriorityGate(global_limit)
+        self.observers = []  # callables (route, waited_s, duration_s, error | None)
+
+    def _route(self, name: str) -> _Route:
+        route = self._routes.get(name)
+        if route is None:
+            route = self._routes[name] = _Route(self.limits.get(name, DEFAULT_ROUTE_LIMIT))
+        return route
+
+    async def call(self, name: str, priority: int, fn, /, *args, **kwargs):
+        route = self._route(name)
+        loop = asyncio.get_running_loop()
+        queued_at = loop.time()
+        await route.acquire(priority)
+        try:
+            await self._global.acquire(priority)
+        except BaseException:
+            route.release()
+            raise
+        waited = loop.time() - queued_at
+        route.wait_seconds += waited
+        route.max_wait = max(route.max_wait, waited)
+        started = time.perf_counter()
+        error = None
+        try:
+            return await fn(*args, **kwargs)
+        except discord.HTTPException as e:
+            error = e
+            route.errors += 1
+            if e.status == 429:
+                route.rate_limited += 1
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            route.calls += 1
+            route.call_seconds += duration
+            self._global.release()
+            route.release()
+            for observer in self.observers:
+                observer(name, waited, duration, error)
+
+    def queue_depth(self, name: str | None = None) -> int:
+        if name is not None:
+            return len(self._route(name).waiters)
+        return sum(len(r.waiters) for r in self._routes.values()) + len(self._global.waiters)
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "limit":        r.limit,
+                "active":       r.active,
+                "queued":       len(r.waiters),
+                "calls":        r.calls,
+                "errors":       r.errors,
+                "rate_limited": r.rate_limited,
+                "avg_wait":     round(r.wait_seconds / r.calls, 6) if r.calls else 0.0,
+                "max_wait":     round(r.max_wait, 6),
+                "avg_call":     round(r.call_seconds / r.calls, 6) if r.calls else 0.0,
+            }
+            for name, r in self._routes.items()
+        }
+
+rest = RestScheduler()
+rest.observers.append(_observe_rest)
+
+# ——— Member Resolution ————————————————————————————————————————————
+class MemberResolver:
+    """guild.get_member() backed by a bounded LRU of members fetched on a cache miss.
+
+    With minimal intents the gateway cache only holds members in voice, so
+    template invites, deputies and list commands resolve everyone else here.
+    """
+
+    def __init__(self, size: int = MEMBER_CACHE_SIZE, ttl: float = MEMBER_CACHE_TTL):
+        self.size = size
+        self.ttl  = ttl
+        self._lru: OrderedDict[tuple[int, int], tuple[float, discord.Member | None]] = OrderedDict()
+        self.hits    = 0
+        self.misses  = 0
+        self.fetches = 0
+
+    def get(self, guild: discord.Guild, user_id: int) -> discord.Member | None:
+        """Cached lookup only, never touches the network."""
+        member = guild.get_member(user_id)
+        if member is not None:
+            self.hits += 1
+            return member
+        cached = self._lru.get((guild.id, user_id))
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            self._lru.move_to_end((guild.id, user_id))
+            self.hits += 1
+            return cached[1]
+        return None
+
+    def _known(self, guild: discord.Guild, user_id: int) -> bool:
+        cached = self._lru.get((guild.id, user_id))
+        return cached is not None and time.monotonic() - cached[0] < self.ttl
+
+    async def resolve(self, guild: discord.Guild, user_id: int) -> discord.Member | None:
+        member = self.get(guild, user_id)
+        if member is not None or self._known(guild, user_id):
+            return member  # negative results (left the guild) are cached too
+        self.misses += 1
+        self.fetches += 1
+        try:
+            member = await rest.call("fetch", PRIORITY_INTERACTIVE, guild.fetch_member, user_id)
+        except (discord.NotFound, discord.Forbidden):
+            member = None
+        self._lru[(guild.id, user_id)] = (time.monotonic(), member)
+        self._lru.move_to_end((guild.id, user_id))
+        while len(self._lru) > self.size:
+            self._lru.popitem(last=False)
+        return member
+
+    def forget(self, guild_id: int, user_id: int):
+        self._lru.pop((guild_id, user_id), None)
+
+member_resolver = MemberResolver()
+
+async def iter_guild_members(guild: discord.Guild):
+    """All members of a guild: the cache when it is complete, otherwise streamed over REST."""
+    if guild.chunked or not MINIMAL_INTENTS:
+        for m in guild.members:
+            yield m
+    else:
+        # Page by page through the scheduler, so a scan never holds up moves or edits
+        after = None
+        while True:
+            async def page():
+                kwargs = {"after": after} if after is not None else {}
+                return [m async for m in guild.fetch_members(limit=MEMBER_PAGE_SIZE, **kwargs)]
+            members = await rest.call("fetch_members", PRIORITY_BACKGROUND, page)
+            for m in members:
+                yield m
+            if len(members) < MEMBER_PAGE_SIZE:
+                return
+            after = discord.Object(members[-1].id)
+
+
+class DeniedMembers:
+    """Per-guild set of members the permission index turns away, for /vcrevoke_list.
+
+    Built once by a scan that yields to the loop every `batch` members, then
+    kept current from member join/leave/update events and permission changes:
+    a user entry rechecks that member, a role entry or role update rechecks
+    the cached holders of the role. Only when the holders cannot be listed
+    from the cache is the set dropped for a rescan; `ttl` bounds staleness
+    from updates to members the gateway never reports.
+    """
+
+    def __init__(self, ttl: float = DENIED_MEMBERS_TTL, batch: int = 1000):
+        self.ttl   = ttl
+        self.batch = batch
+        self._sets:     dict[str, tuple[float, set[int]]] = {}
+        self._builds:   dict[str, asyncio.Task] = {}
+        self._roles:    dict[str, dict[int, discord.Role]] = {}  # guild id → roles waiting for a recheck
+        self._rechecks: dict[str, asyncio.Task] = {}
+        self._lookups:  dict[str, set[asyncio.Task]] = {}  # guild id → fetches of uncached changed members
+
+    async def get(self, guild: discord.Guild) -> set[int]:
+        gid = str(guild.id)
+        pending = [*self._lookups.get(gid, ()), *filter(None, [self._rechecks.get(gid)])]
+        if pending:
+            await asyncio.shield(asyncio.gather(*pending))
+        if self._fresh(gid):
+            return self._sets[gid][1]
+        task = self._builds.get(gid)
+        if task is None:
+            # Concurrent /vcrevoke_list calls share one scan
+            task = self._builds[gid] = asyncio.ensure_future(self._build(guild))
+            task.add_done_callback(lambda _: self._builds.pop(gid, None))
+        return await asyncio.shield(task)
+
+    async def _build(self, guild: discord.Guild) -> set[int]:
+        gid = str(guild.id)
+        index = get_perm_index(gid)
+        denied: set[int] = set()
+        scanned = 0
+        async for m in iter_guild_members(guild):
+            if index.check(m) is not None:
+                denied.add(m.id)
+            scanned += 1
+            if scanned % self.batch == 0:
+                await asyncio.sleep(0)
+        self._sets[gid] = (time.monotonic(), denied)
+        return denied
+
+    def _fresh(self, guild_id: str) -> bool:
+        cached = self._sets.get(guild_id)
+        return cached is not None and time.monotonic() - cached[0] < self.ttl
+
+    def ready(self, guild_id: str) -> bool:
+        """True if get() can answer without scanning or rechecking."""
+        return self._fresh(guild_id) and guild_id not in self._rechecks and guild_id not in self._lookups
+
+    def update(self, member: discord.Member):
+        cached = self._sets.get(str(member.guild.id))
+        if cached is None:
+            return
+        if get_perm_index(str(member.guild.id)).check(member) is None:
+            cached[1].discard(member.id)
+        else:
+            cached[1].add(member.id)
+
+    def discard(self, guild_id: str, user_id: int):
+        cached = self._sets.get(guild_id)
+        if cached is not None:
+            cached[1].discard(user_id)
+
+    def user_changed(self, guild_id: str, user_id: int):
+        if guild_id not in self._sets:
+            return
+        guild  = bot.get_guild(int(guild_id))
+        if guild is None:
+            return self.invalidate(guild_id)
+        member = member_resolver.get(guild, user_id)
+        if member is not None:
+            return self.update(member)
+        # Not cached (minimal intents): fetch that one member instead of rescanning the guild
+        task = asyncio.ensure_future(self._lookup(guild, user_id))
+        self._lookups.setdefault(guild_id, set()).add(task)
+        task.add_done_callback(lambda done: self._lookup_done(guild_id, done))
+
+    def _lookup_done(self, guild_id: str, task: asyncio.Task):
+        lookups = self._lookups.get(guild_id)
+        if lookups is not None:
+            lookups.discard(task)
+            if not lookups:
+                del self._lookups[guild_id]
+
+    async def _lookup(self, guild: discord.Guild, user_id: int):
+        try:
+            member = await member_resolver.resolve(guild, user_id)
+        except discord.HTTPException:
+            return self.invalidate(str(guild.id))
+        if member is not None:
+            self.update(member)
+        else:
+            self.discard(str(guild.id), user_id)  # left the guild
+
+    def targets_changed(self, guild_id: str, keys):
+        """Recheck the members that changed ('user'/'role', id) permission entries can affect."""
+        if guild_id not in self._sets:
+            return
+        guild = bot.get_guild(int(guild_id))
+        roles = []
+        for kind, target_id in keys:
+            if kind == "user":
+                self.user_changed(guild_id, target_id)
+            elif guild is None or (role := guild.get_role(target_id)) is None:
+                self.invalidate(guild_id)
+                return
+            else:
+                roles.append(role)
+        if roles:
+            self.roles_changed(roles)
+
+    def roles_changed(self, roles: list[discord.Role]):
+        """Recheck the holders of `roles` in the background; get() waits for it."""
+        guild = roles[0].guild
+        gid = str(guild.id)
+        if gid not in self._sets:
+            return
+        if MINIMAL_INTENTS and not guild.chunked:
+            self.invalidate(gid)  # holders outside the cache can't be listed
+            return
+        self._roles.setdefault(gid, {}).update((role.id, role) for role in roles)
+        if gid not in self._rechecks:
+            task = self._rechecks[gid] = asyncio.ensure_future(self._recheck(gid))
+            task.add_done_callback(lambda _: self._rechecks.pop(gid, None))
+
+    async def _recheck(self, guild_id: str):
+        while guild_id in self._sets and (roles := self._roles.pop(guild_id, None)):
+            holders = {m.id: m for role in roles.values() for m in role.members}
+            for n, m in enumerate(holders.values(), 1):
+                self.update(m)
+                if n % self.batch == 0:
+                    await asyncio.sleep(0)
+
+    def invalidate(self, guild_id: str):
+        self._sets.pop(guild_id, None)
+        self._roles.pop(guild_id, None)
+
+denied_members = DeniedMembers()
+
+# ——— Auto-Delete Scheduler ——————————————————————————————————————
+class DeletionScheduler:
+    """Auto-delete deadlines for empty private VCs, served by one background task.
+
+    A channel is armed when it empties and disarmed as soon as someone joins;
+    due channels are deleted together in one batch.
+    """
+
+    def __init__(self):
+        self._deadlines: dict[int, float] = {}
+        self._heap: list[tuple[float, int]] = []
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self.deleted = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._deadlines)
+
+    def arm(self, channel_id: int, delay_s: float):
+        deadline = asyncio.get_running_loop().time() + delay_s
+        self._deadlines[channel_id] = deadline
+        heapq.heappush(self._heap, (deadline, channel_id))
+        # Cancelled/re-armed entries stay in the heap until popped; compact under churn
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(dl, cid) for cid, dl in self._deadlines.items()]
+            heapq.heapify(self._heap)
+        if self._wakeup and self._heap[0] == (deadline, channel_id):
+            self._wakeup.set()
+
+    def cancel(self, channel_id: int):
+        self._deadlines.pop(channel_id, None)
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def _drop_stale(self):
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            self._drop_stale()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - loop.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            now = loop.time()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                deadline, channel_id = heapq.heappop(self._heap)
+                if self._deadlines.get(channel_id) == deadline:
+                    del self._deadlines[channel_id]
+                    due.append(channel_id)
+            results = await asyncio.gather(
+                *(delete_private_vc(cid, if_empty=True, priority=PRIORITY_BACKGROUND, recycle=True) for cid in due),
+                return_exceptions=True,
+            )
+            for channel_id, result in zip(due, results):
+                if isinstance(result, Exception):
+                    print(f"⚠️ Auto-delete of {channel_id} failed: {result!r}")
+                elif result:
+                    self.deleted += 1
+
+auto_delete = DeletionScheduler()
+
+async def delete_private_vc(channel_id: int, if_empty: bool = False,
+                            priority: int = PRIORITY_INTERACTIVE, recycle: bool = False) -> bool:
+    """Delete a private VC and its management thread. Returns False if it was not deleted.
+
+    With `recycle`, the channel goes back to the guild's warm pool instead when it has room.
+    """
+    data = private_vcs.get(channel_id)
+    channel = data.channel if data else None
+    if data is None or (if_empty and channel and channel.members):
+        return False
+    private_vcs.pop(channel_id, None)
+    auto_delete.cancel(channel_id)
+    if recycle and channel and await warm_pool.recycle(data, channel):
+        return True
+    if channel:
+        try:
+            await rest.call("delete_channel", priority, channel.delete)
+        except discord.NotFound:
+            pass
+        except discord.HTTPException:
+            # Still there: keep it registered and try again later rather than orphan it
+            private_vcs[channel_id] = data
+            if not channel.members:
+                auto_delete.arm(channel_id, DELETE_RETRY_S)
+            raise
+    if data.thread_id:
+        # By id: archived threads drop out of the cache
+        try:
+            await rest.call("delete_channel", PRIORITY_BACKGROUND, bot.http.delete_channel, data.thread_id)
+        except discord.NotFound:
+            pass
+    return True
+
+
+# ——— Channel Edit Pipeline ————————————————————————————————————————
+class _PendingEdit:
+    def __init__(self, channel: discord.VoiceChannel):
+        self.channel    = channel
+        self.overwrites: dict = {}  # (kind, id) → (target, PermissionOverwrite (replace), dict (patch) or None (remove))
+        self.fields:     dict = {}  # name / user_limit
+        self.futures:    list[asyncio.Future] = []
+
+def _overwrite_key(target) -> tuple[str, int]:
+    # A cached Member and the Object(type=User) discord.py reports for an uncached one are the same overwrite
+    is_role = isinstance(target, discord.Role) or getattr(target, "type", None) is discord.Role
+    return ("role" if is_role else "member", target.id)
+
+def _merge_overwrite_change(old, new):
+    if old is None or not isinstance(new, dict):
+        return new
+    if isinstance(old, dict):
+        return {**old, **new}
+    merged = discord.PermissionOverwrite.from_pair(*old.pair())
+    merged.update(**new)
+    return merged
+
+class ChannelEditQueue:
+    """Per-channel edit queue.
+
+    Overwrite, name and limit changes requested within `delay` seconds are
+    merged into a single channel.edit(), and edits to the same channel never
+    overlap. Each caller's awaitable resolves with the edited channel.
+    """
+
+    def __init__(self, delay: float = EDIT_DEBOUNCE):
+        self.delay = delay
+        self._pending: dict[int, _PendingEdit] = {}
+        self._tail:    dict[int, asyncio.Task] = {}
+        self._latest:  dict[int, discord.VoiceChannel] = {}  # result of the last edit, newer than the cache
+        self.requests = 0
+        self.edits    = 0
+
+    def submit(self, channel: discord.VoiceChannel, overwrites: dict | None = None, **fields) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(channel.id)
+        if batch is None:
+            batch = self._pending[channel.id] = _PendingEdit(channel)
+            prev = self._tail.get(channel.id)
+            self._tail[channel.id] = loop.create_task(self._apply(channel.id, prev))
+        for target, change in (overwrites or {}).items():
+            key = _overwrite_key(target)
+            queued = batch.overwrites.get(key, (target, None))[1]
+            batch.overwrites[key] = (target, _merge_overwrite_change(queued, change))
+        batch.fields.update(fields)
+        future = loop.create_future()
+        batch.futures.append(future)
+        self.requests += 1
+        return future
+
+    async def _apply(self, channel_id: int, prev: asyncio.Task | None):
+        await asyncio.sleep(self.delay)
+        if prev is not None:
+            await asyncio.wait([prev])
+        batch = self._pending.pop(channel_id)
+        channel = self._latest.get(channel_id, batch.channel)
+        kwargs = dict(batch.fields)
+        if batch.overwrites:
+            current = {_overwrite_key(target): (target, ow) for target, ow in channel.overwrites.items()}
+            for key, (target, change) in batch.overwrites.items():
+                if change is None:
+                    current.pop(key, None)
+                else:
+                    old = current.get(key, (target, discord.PermissionOverwrite()))[1]
+                    current[key] = (target, _merge_overwrite_change(old, change))
+            kwargs["overwrites"] = dict(current.values())
+        try:
+            edited = await rest.call("edit_channel", PRIORITY_INTERACTIVE, batch.channel.edit, **kwargs) or channel
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            self.edits += 1
+            self._latest[channel_id] = edited
+            for future in batch.futures:
+                if not future.done():
+                    future.set_result(edited)
+        finally:
+            if self._tail.get(channel_id) is asyncio.current_task() and channel_id not in self._pending:
+                del self._tail[channel_id]
+                self._latest.pop(channel_id, None)
+
+channel_edits = ChannelEditQueue()
+
+async def edit_channel(channel: discord.VoiceChannel, overwrites: dict | None = None, **fields) -> discord.VoiceChannel:
+    """Queue a merged edit of `channel` and wait until it is applied.
+
+    `overwrites` maps targets to a PermissionOverwrite (replace), a dict of
+    permission values (patch onto the current overwrite) or None (remove).
+    """
+    return await channel_edits.submit(channel, overwrites, **fields)
+
+# ——— Active VC Persistence & Startup Reconciliation ————————————————————
+# Records read at startup; every save keeps them until reconcile has adopted or dropped them
+_unreconciled: dict | None = None
+
+def _active_snapshot(shard_id: int | None = None) -> dict:
+    def ours(guild_id: int) -> bool:
+        return shard_id is None or shard_of(guild_id) == shard_id
+    pool = warm_pool.snapshot(ours)
+    channels = [record.to_json() for record in private_vcs.values() if ours(record.guild_id)]
+    if _unreconciled is not None:
+        channels += [rec for rec in _unreconciled["channels"]
+                     if ours(rec["guild"]) and rec["channel"] not in private_vcs]
+        for gid, ids in _unreconciled["pool"].items():
+            if ours(int(gid)):
+                pool[gid] = list(dict.fromkeys([*pool.get(gid, ()), *ids]))
+    return {"pool": pool, "channels": channels}
+
+def _active_files() -> list[JsonFile]:
+    """One file per shard in cluster mode, so a re-partitioned cluster still finds every record."""
+    if not SHARD_IDS:
+        return [JsonFile(ACTIVE_VCS_PATH, _active_snapshot)]
+    root, ext = os.path.splitext(ACTIVE_VCS_PATH)
+    return [
+        JsonFile(f"{root}.shard-{shard_id}{ext}", lambda shard_id=shard_id: _active_snapshot(shard_id))
+        for shard_id in SHARD_IDS
+    ]
+
+active_files = _active_files()
+
+def save_active():
+    for store in active_files:
+        store.mark_dirty()
+
+private_vcs.on_change = save_active
+
+def _create_category_id(guild: discord.Guild) -> int:
+    cfg = config["guilds"].get(str(guild.id), {})
+    return cfg.get("create_category_id", cfg.get("default_category_id", VC_CATEGORY_ID))
+
+def _create_categories(guild: discord.Guild) -> set[int]:
+    cfg = config["guilds"].get(str(guild.id), {})
+    return {cfg.get("default_category_id", VC_CATEGORY_ID), _create_category_id(guild)}
+
+async def _restore_record(rec: dict, sem: asyncio.Semaphore, now: float):
+    async with sem:
+        guild = bot.get_guild(rec["guild"])
+        if guild is None or rec["channel"] in private_vcs:
+            return
+        channel = guild.get_channel(rec["channel"])
+        if not isinstance(channel, discord.VoiceChannel) or channel.category_id not in _create_categories(guild):
+            return  # gone or no longer ours: drop the record
+        record = VCRecord.from_json(rec)
+        record.empty_since = None
+        remaining = None
+        if not channel.members:
+            record.empty_since = rec.get("empty_since") or now
+            remaining = record.empty_since + record.timeout * 60 - now
+        private_vcs[channel.id] = record
+        if remaining is not None and remaining <= 0:
+            await delete_private_vc(channel.id, if_empty=True, priority=PRIORITY_BACKGROUND)
+            return
+        if remaining is not None:
+            auto_delete.arm(channel.id, remaining)
+
+def load_active_vcs():
+    """Read the recorded VCs once per process, before anything can save over them."""
+    global _unreconciled
+    if _unreconciled is not None:
+        return
+    records, pool = [], {}
+    for store in active_files:
+        if not os.path.exists(store.path):
+            continue
+        try:
+            with open(store.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read {store.path}: {e!r}")
+            continue
+        records.extend(state.get("channels", []))
+        pool.update(state.get("pool", {}))
+    _unreconciled = {"channels": records, "pool": pool}
+
+async def reconcile_active_vcs():
+    """Re-adopt private VCs recorded before a restart, delete expired ones, drop stale records."""
+    global _unreconciled
+    load_active_vcs()
+    records, pool = _unreconciled["channels"], _unreconciled["pool"]
+    warm_pool.restore(pool)
+    sem = asyncio.Semaphore(RECONCILE_CONCURRENCY)
+    results = await asyncio.gather(
+        *(_restore_record(rec, sem, time.time()) for rec in records), return_exceptions=True
+    )
+    for rec, result in zip(records, results):
+        if isinstance(result, Exception):
+            print(f"⚠️ Could not restore VC {rec.get('channel')}: {result!r}")
+    _unreconciled = None
+    save_active()
+    print(f"♻️ Reconciled {len(records)} recorded VCs, {len(private_vcs)} active.")
+
+
+# ——— Warm Channel Pool ————————————————————————————————————————————
+class WarmPool:
+    """Optional per-guild pool of hidden, pre-created voice channels.
+
+    A trigger join takes a channel from the pool and turns it into the user's
+    VC with a single edit instead of a create round trip. The pool size
+    follows the recent join rate within the guild's configured min/max, and
+    timed-out VCs are recycled into it while it is below target.
+    """
+
+    def __init__(self):
+        self._channels: dict[int, list[int]] = {}  # guild id → warm channel ids
+        self._joins:    dict[int, deque[float]] = {}
+        self._refilling: set[int] = set()
+        self.hits     = 0
+        self.misses   = 0
+        self.created  = 0
+        self.recycled = 0
+
+    @staticmethod
+    def limits(guild_id: int) -> tuple[int, int]:
+        pool_cfg = config["guilds"].get(str(guild_id), {}).get("warm_pool", {})
+        return pool_cfg.get("min", 0), pool_cfg.get("max", 0)
+
+    def enabled(self, guild_id: int) -> bool:
+        return self.limits(guild_id)[1] > 0
+
+    def size(self, guild_id: int | None = None) -> int:
+        if guild_id is not None:
+            return len(self._channels.get(guild_id, ()))
+        return sum(len(ids) for ids in self._channels.values())
+
+    def note_join(self, guild_id: int):
+        joins = self._joins.setdefault(guild_id, deque())
+        now = time.monotonic()
+        joins.append(now)
+        while joins and joins[0] < now - WARM_POOL_WINDOW:
+            joins.popleft()
+
+    def target(self, guild_id: int) -> int:
+        low, high = self.limits(guild_id)
+        joins = self._joins.get(guild_id, ())
+        wanted = math.ceil(len(joins) / WARM_POOL_WINDOW * WARM_POOL_HORIZON)
+        return max(low, min(high, wanted))
+
+    @staticmethod
+    def _hidden(guild: discord.Guild) -> dict:
+        return {guild.default_role: discord.PermissionOverwrite(view_channel=False, connect=False)}
+
+    def take(self, guild: discord.Guild, category_id: int | None) -> discord.VoiceChannel | None:
+        ids = self._channels.get(guild.id)
+        while ids:
+            channel = guild.get_channel(ids.pop())
+            if isinstance(channel, discord.VoiceChannel) and channel.category_id == category_id and not channel.members:
+                self.hits += 1
+                save_active()
+                return channel
+        if self.enabled(guild.id):
+            self.misses += 1
+        return None
+
+    async def refill(self, guild: discord.Guild, category):
+        if guild.id in self._refilling or not self.enabled(guild.id):
+            return
+        self._refilling.add(guild.id)
+        try:
+            ids = self._channels.setdefault(guild.id, [])
+            while len(ids) < self.target(guild.id):
+                channel = await rest.call(
+                    "create_channel", PRIORITY_BACKGROUND, guild.create_voice_channel,
+                    name=WARM_POOL_NAME, category=category, overwrites=self._hidden(guild), user_limit=0
+                )
+                ids.append(channel.id)
+                self.created += 1
+                save_active()
+            while len(ids) > self.limits(guild.id)[1]:
+                channel = guild.get_channel(ids.pop())
+                save_active()
+                if channel is not None:
+                    await rest.call("delete_channel", PRIORITY_BACKGROUND, channel.delete)
+        except discord.HTTPException as e:
+            print(f"⚠️ Warm pool refill for guild {guild.id} failed: {e!r}")
+        finally:
+            self._refilling.discard(guild.id)
+
+    @staticmethod
+    async def _chat_is_clean(channel: discord.VoiceChannel, panel_id: int | None) -> bool:
+        if not MINIMAL_INTENTS:
+            return channel.last_message_id in (None, panel_id)
+        # Without the guild_messages intent last_message_id never moves, so ask Discord
+        async def recent():
+            return [message.id async for message in channel.history(limit=2)]
+        return all(message_id == panel_id for message_id in await rest.call("history", PRIORITY_BACKGROUND, recent))
+
+    async def discard(self, channel: discord.VoiceChannel):
+        """Delete a channel taken from the pool that could not be handed off."""
+        self.hits   -= 1
+        self.misses += 1
+        try:
+            await rest.call("delete_channel", PRIORITY_BACKGROUND, channel.delete)
+        except discord.NotFound:
+            pass
+        except discord.HTTPException as e:
+            print(f"⚠️ Failed to delete warm pool channel {channel.id}: {e!r}")
+
+    async def recycle(self, data: VCRecord, channel: discord.VoiceChannel) -> bool:
+        """Reset a timed-out VC and put it back into the pool. Returns False if it should be deleted."""
+        guild = channel.guild
+        if not self.enabled(guild.id) or self.size(guild.id) >= self.target(guild.id):
+            return False
+        try:
+            # Only recycle channels whose chat holds nothing but the panel
+            if not await self._chat_is_clean(channel, data.message):
+                return False
+            await rest.call(
+                "edit_channel", PRIORITY_BACKGROUND, channel.edit,
+                name=WARM_POOL_NAME, overwrites=self._hidden(guild), user_limit=0
+            )
+            if data.message:
+                await rest.call(
+                    "delete_channel", PRIORITY_BACKGROUND, channel.get_partial_message(data.message).delete
+                )
+            if data.thread_id:
+                await rest.call("delete_channel", PRIORITY_BACKGROUND, bot.http.delete_channel, data.thread_id)
+        except discord.HTTPException:
+            return False
+        self._channels.setdefault(guild.id, []).append(channel.id)
+        self.recycled += 1
+        save_active()
+        return True
+
+    def snapshot(self, include=lambda guild_id: True) -> dict:
+        return {str(gid): list(ids) for gid, ids in self._channels.items() if ids and include(gid)}
+
+    def restore(self, data: dict):
+        for gid, ids in data.items():
+            guild = bot.get_guild(int(gid))
+            if guild is None:
+                continue
+            categories = _create_categories(guild)
+            self._channels[guild.id] = [
+                cid for cid in ids
+                if isinstance(channel := guild.get_channel(cid), discord.VoiceChannel)
+                and channel.category_id in categories and not channel.members and cid not in private_vcs
+            ]
+
+    def stats(self) -> dict:
+        return {"size": self.size(), "hits": self.hits, "misses": self.misses,
+                "created": self.created, "recycled": self.recycled}
+
+warm_pool = WarmPool()
+
+PERSISTED_FILES = (config_file, *active_files, templates if db is None else db)
+
+async def flush_all():
+    for store in PERSISTED_FILES:
+        await store.flush()
+
+def persistence_stats() -> dict:
+    return {os.path.basename(store.path): store.stats() for store in PERSISTED_FILES}
+
+
+# ——— Metrics Endpoint ————————————————————————————————————————————
+METRICS_HOST = os.getenv("BOT_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("BOT_METRICS_PORT", "0"))  # 0: endpoint disabled
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class MetricsWriter:
+    """Prometheus text exposition format (version 0.0.4)."""
+
+    def __init__(self):
+        self.lines: list[str] = []
+
+    def _head(self, name: str, kind: str, help_text: str):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def scalar(self, name: str, kind: str, help_text: str, values):
+        """`values`: a number, or (labels dict, number) pairs."""
+        self._head(name, kind, help_text)
+        if isinstance(values, (int, float)):
+            values = [({}, values)]
+        for labels, value in values:
+            tags = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+            self.lines.append(f"{name}{{{tags}}} {value}" if tags else f"{name} {value}")
+
+    def histogram(self, name: str, help_text: str, recorders):
+        """`recorders`: (labels dict, LatencyRecorder) pairs."""
+        self._head(name, "histogram", help_text)
+        for labels, r in recorders:
+            tags = "".join(f'{k}="{_label(v)}",' for k, v in labels.items())
+            cumulative = 0
+            for bound, n in zip((*r.buckets, "+Inf"), r.bucket_counts):
+                cumulative += n
+                self.lines.append(f'{name}_bucket{{{tags}le="{bound}"}} {cumulative}')
+            tags = tags.rstrip(",")
+            suffix = f"{{{tags}}}" if tags else ""
+            self.lines.append(f"{name}_sum{suffix} {r.total}")
+            self.lines.append(f"{name}_count{suffix} {r.count}")
+
+    def text(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+def render_metrics() -> str:
+    w = MetricsWriter()
+    w.histogram("voicy_voice_state_update_seconds", "Time spent handling on_voice_state_update.",
+                [({}, voice_state_update)])
+    w.histogram("voicy_trigger_to_move_seconds", "Trigger channel join until the member is moved.",
+                [({}, trigger_to_move)])
+    w.histogram("voicy_command_seconds", "Slash command handling time.",
+                [({"command": name}, r) for name, r in sorted(command_latency.items())])
+    w.scalar("voicy_command_errors_total", "counter", "Slash commands that raised.",
+             [({"command": name}, n) for name, n in sorted(command_errors.items())])
+    w.histogram("voicy_rest_call_seconds", "Discord REST call duration by route.",
+                [({"route": name}, r) for name, r in sorted(rest_latency.items())])
+    routes = sorted(rest.stats().items())
+    w.scalar("voicy_rest_rate_limited_total", "counter", "Discord REST calls answered with 429.",
+             [({"route": name}, r["rate_limited"]) for name, r in routes])
+    w.scalar("voicy_rest_errors_total", "counter", "Discord REST calls that failed.",
+             [({"route": name}, r["errors"]) for name, r in routes])
+    w.scalar("voicy_rest_queued", "gauge", "REST calls waiting for a slot.", rest.queue_depth())
+    w.scalar("voicy_private_vcs", "gauge", "Active private voice channels.", len(private_vcs))
+    w.scalar("voicy_templates", "gauge", "Stored per-user templates.", len(templates))
+    w.scalar("voicy_pending_deletions", "gauge", "Empty private VCs waiting for auto-delete.", auto_delete.pending)
+    w.scalar("voicy_event_loop_lag_seconds", "gauge", "Latest event-loop lag sample.", loop_lag.lag)
+    w.scalar("voicy_event_loop_lag_max_seconds", "gauge", "Largest event-loop lag since start.", loop_lag.max_lag)
+    files = sorted(persistence_stats().items())
+    w.scalar("voicy_persist_writes_total", "counter", "Write-behind commits of files and the SQLite database.",
+             [({"file": name}, st["writes"]) for name, st in files])
+    w.scalar("voicy_persist_bytes_total", "counter", "Bytes written by write-behind commits.",
+             [({"file": name}, st["bytes"]) for name, st in files])
+    return w.text()
+
+class MetricsServer:
+    """Minimal HTTP/1.0 server for GET /metrics; rendering happens only when scraped."""
+
+    def __init__(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.host = host
+        self.port = port
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self):
+        if not self.port or self._server is not None:
+            return
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        print(f"📈 Metrics on http://{self.host}:{self.port}/metrics")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", render_metrics().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+metrics_server = MetricsServer()
+
+
+# ——— Bot Initialization ——————————————————————————————————————
+class VoicyTree(app_commands.CommandTree):
+    """Command tree that times every slash command for the metrics endpoint."""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.guild_id is None:
+            # Commands are registered guild-only; this catches registrations made before that
+            await interaction.response.send_message(t("error_guild_only"), ephemeral=True)
+            return False
+        interaction.extras["started"] = time.perf_counter()
+        if interaction.command is not None:
+            diagnostics.enter(f"/{interaction.command.qualified_name}")
+            if traffic_recorder.enabled:
+                traffic_recorder.interaction(interaction, interaction.command.qualified_name)
+        return True
+
+    @staticmethod
+    def _observe(interaction: discord.Interaction) -> str | None:
+        started = interaction.extras.get("started")
+        if interaction.command is None or started is None:
+            return None
+        name = interaction.command.qualified_name
+        recorder = command_latency.get(name)
+        if recorder is None:
+            recorder = command_latency[name] = LatencyRecorder(name)
+        recorder.observe(time.perf_counter() - started)
+        return name
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        if name := self._observe(interaction):
+            command_errors[name] = command_errors.get(name, 0) + 1
+        await super().on_error(interaction, error)
+
+class VoicyBot(commands.AutoShardedBot if SHARDED else commands.Bot):
+    async def setup_hook(self):
+        # One-time, per-process work; runs after login and before the gateway connects
+        startup.mark("login")
+        load_active_vcs()
+        # One registration serves the panels of every VC, old and new
+        self.add_dynamic_items(PanelButton, LegacyPanelButton)
+        permission_expiry.start()
+        auto_delete.start()
+        loop_lag.start()
+        await metrics_server.start()
+        await load_templates()
+        startup.mark("templates")
+        if DIAG_MODE != "off":
+            diagnostics.set_mode(DIAG_MODE)
+        if not SHARD_IDS or 0 in SHARD_IDS:  # commands are global: one cluster worker syncs them
+            try:
+                synced = await sync_commands()
+            except discord.HTTPException as e:
+                # Keep running on the commands Discord already has; the hash stays unrecorded, so the next start retries
+                print(f"⚠️ Command sync failed: {e!r}")
+                startup.mark("sync (failed)")
+            else:
+                startup.mark("sync" if synced else "sync (unchanged)")
+
+    async def close(self):
+        # Pending write-behind state must hit the disk before the loop goes away
+        await flush_all()
+        await metrics_server.close()
+        diagnostics.set_mode("off")
+        traffic_recorder.close()
+        await super().close()
+        if db is not None:
+            db.close()
+
+def build_intents() -> tuple[discord.Intents, dict]:
+    """Gateway intents plus cache options; minimal mode keeps only what the bot uses."""
+    if not MINIMAL_INTENTS:
+        return discord.Intents.all(), {}
+    intents = discord.Intents.none()
+    intents.guilds       = True  # channels, categories, roles
+    intents.voice_states = True  # trigger joins/leaves, members of voice channels
+    intents.members      = True  # role updates, fetch_member / fetch_members
+    member_cache = discord.MemberCacheFlags.none()
+    member_cache.voice = True
+    return intents, {"member_cache_flags": member_cache, "chunk_guilds_at_startup": False}
+
+def shard_options() -> dict:
+    if not SHARDED:
+        return {}
+    options = {"shard_count": SHARD_COUNT}  # None: Discord's recommended count
+    if SHARD_IDS:
+        options["shard_ids"] = SHARD_IDS
+    return options
+
+intents, cache_options = build_intents()
+bot = VoicyBot(
+    command_prefix="!", intents=intents, tree_cls=VoicyTree,
+    allowed_contexts=app_commands.AppCommandContext(guild=True),  # every command acts on a guild's VCs
+    **cache_options, **shard_options(),
+)
+tree = bot.tree
+
+command_sync: dict[str, str] = {}
+if os.path.exists(COMMAND_SYNC_PATH):
+    with open(COMMAND_SYNC_PATH, encoding="utf-8") as f:
+        command_sync = json.load(f)
+command_sync_file = JsonFile(COMMAND_SYNC_PATH, lambda: dict(command_sync), indent=2)
+
+async def command_tree_hash(guild: discord.abc.Snowflake | None = None) -> str:
+    """Hash of the payload tree.sync() would upload for `guild` (None: global commands)."""
+    translator = tree.translator
+    payload = [
+        await cmd.get_translated_payload(tree, translator) if translator else cmd.to_dict(tree)
+        for cmd in tree.get_commands(guild=guild)
+    ]
+    payload.sort(key=lambda cmd: (cmd.get("type", 1), cmd["name"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+async def sync_commands() -> bool:
+    """Sync the command tree unless it is unchanged since the last sync. Returns True if it synced.
+
+    With BOT_DEV_GUILD the commands are copied to and synced with that guild
+    only, where changes show up immediately.
+    """
+    guild = discord.Object(DEV_GUILD_ID) if DEV_GUILD_ID else None
+    if guild is not None:
+        tree.copy_global_to(guild=guild)
+    key = f"{bot.application_id}:{DEV_GUILD_ID or 'global'}"
+    digest = await command_tree_hash(guild)
+    if not FORCE_SYNC and command_sync.get(key) == digest:
+        return False
+    await tree.sync(guild=guild)
+    command_sync[key] = digest
+    command_sync_file.mark_dirty()
+    await command_sync_file.flush()
+    return True
+
+_reconciled = False
+
+@bot.event
+async def on_ready():
+    # Fires again after every reconnect: only per-connection work belongs here
+    global _reconciled
+    if not _reconciled:
+        _reconciled = True
+        startup.mark("gateway")
+        await reconcile_active_vcs()
+        for guild in bot.guilds:
+            if warm_pool.enabled(guild.id):
+                spawn(warm_pool.refill(guild, guild.get_channel(_create_category_id(guild))))
+        startup.mark("reconcile")
+        startup.report()
+    shards = f" Shards {SHARD_IDS[0]}-{SHARD_IDS[-1]} of {SHARD_COUNT}." if SHARD_IDS else ""
+    print(f"✅ Bot {bot.user} ready! Loaded {len(templates)} templates.{shards}")
 
-def get_user_template(owner_id: int) -> dict | None:
-    return templates.get(owner_id)
 
-def get_user_vc(owner_id: int):
-    return next((info for info in private_vcs.values() if info["owner"] == owner_id), None)
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    VoicyTree._observe(interaction)
 
 
-# ——— Bot Initialization ——————————————————————————————————————
-intents = discord.Intents.all()
-bot = commands.Bot(command_prefix="!", intents=intents)
-tree = bot.tree
+@bot.event
+async def on_member_remove(member: discord.Member):
+    member_resolver.forget(member.guild.id, member.id)
+    denied_members.discard(str(member.guild.id), member.id)
+
 
 @bot.event
-async def on_ready():
-    await tree.sync()
-    await bot.wait_until_ready()
-    await load_templates()
-    print(f"✅ Bot {bot.user} ready! Loaded {len(templates)} templates.")
+async def on_member_join(member: discord.Member):
+    denied_members.update(member)
+
+
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    if before.roles != after.roles:
+        denied_members.update(after)
+
+
+@bot.event
+async def on_guild_role_delete(role: discord.Role):
+    denied_members.roles_changed([role])
+
+
+@bot.event
+async def on_guild_role_update(before: discord.Role, after: discord.Role):
+    if before.permissions.administrator != after.permissions.administrator:
+        denied_members.roles_changed([after])
 
 
 # ——— Modals for Rename & Limit ——————————————————————————————————
 
 class RenameModal(Modal):
     def __init__(self, channel: discord.VoiceChannel, owner_id: int):
-        super().__init__(title=t("modal_rename_title"))
+        super().__init__(title=t("modal_rename_title", channel.guild.id))
         self.channel = channel
         self.owner_id = owner_id
-        self.input = TextInput(label=t("modal_rename_label"), max_length=100)
+        self.input = TextInput(label=t("modal_rename_label", channel.guild.id), max_length=100)
         self.add_item(self.input)
 
     async def on_submit(self, interaction: discord.Interaction):
         new_name = self.input.value
-        await self.channel.edit(name=new_name)
-        tpl = private_vcs[self.channel.id]
-        update_template_from_channel(self.owner_id, self.channel, tpl["deputies"])
-        await interaction.response.send_message(
-            t("modal_rename_success", name=new_name), ephemeral=True
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        channel = await edit_channel(self.channel, name=new_name)
+        update_template_from_channel(self.owner_id, channel, private_vcs[self.channel.id].deputies)
+        await interaction.followup.send(
+            t("modal_rename_success", interaction.guild_id, name=new_name), ephemeral=True
         )
 
 class LimitModal(Modal):
     def __init__(self, channel: discord.VoiceChannel, owner_id: int):
-        super().__init__(title=t("modal_limit_title"))
+        super().__init__(title=t("modal_limit_title", channel.guild.id))
         self.channel = channel
         self.owner_id = owner_id
-        self.input = TextInput(label=t("modal_limit_label"), max_length=2)
+        self.input = TextInput(label=t("modal_limit_label", channel.guild.id), max_length=2)
         self.add_item(self.input)
 
     async def on_submit(self, interaction: discord.Interaction):
@@ -156,94 +2957,90 @@ class LimitModal(Modal):
             if not 0 <= n <= 99:
                 raise ValueError
         except ValueError:
-            return await interaction.response.send_message(t("modal_limit_error"), ephemeral=True)
-        await self.channel.edit(user_limit=n)
-        tpl = private_vcs[self.channel.id]
-        update_template_from_channel(self.owner_id, self.channel, tpl["deputies"])
-        await interaction.response.send_message(t("modal_limit_success", limit=n), ephemeral=True)
+            return await interaction.response.send_message(t("modal_limit_error", interaction.guild_id), ephemeral=True)
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        channel = await edit_channel(self.channel, user_limit=n)
+        update_template_from_channel(self.owner_id, channel, private_vcs[self.channel.id].deputies)
+        await interaction.followup.send(t("modal_limit_success", interaction.guild_id, limit=n), ephemeral=True)
 
 
 # ——— User Select Components ——————————————————————————————————
 
 class InviteUserSelect(UserSelect):
     def __init__(self, channel: discord.VoiceChannel, owner_id: int):
-        super().__init__(placeholder=t("select_invite_placeholder"))
+        super().__init__(placeholder=t("select_invite_placeholder", channel.guild.id))
         self.channel = channel
         self.owner_id = owner_id
 
     async def callback(self, interaction: discord.Interaction):
         member = self.values[0]
-        perms = self.channel.overwrites
-        perms[member] = discord.PermissionOverwrite(view_channel=True, connect=True)
-        await self.channel.edit(overwrites=perms)
-        tpl = private_vcs[self.channel.id]
-        update_template_from_channel(self.owner_id, self.channel, tpl["deputies"])
-        await interaction.response.send_message(
-            t("modal_invite_success", user=member.mention), ephemeral=True
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        channel = await edit_channel(self.channel, {
+            member: discord.PermissionOverwrite(view_channel=True, connect=True)
+        })
+        update_template_from_channel(self.owner_id, channel, private_vcs[self.channel.id].deputies)
+        await interaction.followup.send(
+            t("modal_invite_success", interaction.guild_id, user=member.mention), ephemeral=True
         )
         self.view.stop()
 
 class KickUserSelect(UserSelect):
     def __init__(self, channel: discord.VoiceChannel, owner_id: int):
-        super().__init__(placeholder=t("select_kick_placeholder"))
+        super().__init__(placeholder=t("select_kick_placeholder", channel.guild.id))
         self.channel = channel
         self.owner_id = owner_id
 
     async def callback(self, interaction: discord.Interaction):
         member = self.values[0]
-        perms = self.channel.overwrites
-        perms[member] = discord.PermissionOverwrite(connect=False)
-        await self.channel.edit(overwrites=perms)
-        tpl = private_vcs[self.channel.id]
-        update_template_from_channel(self.owner_id, self.channel, tpl["deputies"])
-        await interaction.response.send_message(
-            t("modal_kick_success", user=member.mention), ephemeral=True
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        channel = await edit_channel(self.channel, {member: discord.PermissionOverwrite(connect=False)})
+        update_template_from_channel(self.owner_id, channel, private_vcs[self.channel.id].deputies)
+        await interaction.followup.send(
+            t("modal_kick_success", interaction.guild_id, user=member.mention), ephemeral=True
         )
         self.view.stop()
 
 class AssignUserSelect(UserSelect):
     def __init__(self, channel: discord.VoiceChannel, owner_id: int):
-        super().__init__(placeholder=t("select_assign_placeholder"))
+        super().__init__(placeholder=t("select_assign_placeholder", channel.guild.id))
         self.channel = channel
         self.owner_id = owner_id
 
     async def callback(self, interaction: discord.Interaction):
         member = self.values[0]
-        tpl = private_vcs[self.channel.id]
-        deps = tpl.setdefault("deputies", [])
-        if member.id in deps:
-            return await interaction.response.send_message(t("modal_assign_error"), ephemeral=True)
-        deps.append(member.id)
-        perms = self.channel.overwrites
-        perms[member] = discord.PermissionOverwrite(
-            view_channel=True, connect=True, manage_channels=True
-        )
-        await self.channel.edit(overwrites=perms)
-        update_template_from_channel(self.owner_id, self.channel, deps)
-        await interaction.response.send_message(
-            f"✅ {member.mention} {t('button_assign').lower()}!", ephemeral=True
+        data = private_vcs[self.channel.id]
+        if data.is_deputy(member.id):
+            return await interaction.response.send_message(t("modal_assign_error", interaction.guild_id), ephemeral=True)
+        data.add_deputy(member.id)
+        private_vcs.changed()
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        channel = await edit_channel(self.channel, {
+            member: discord.PermissionOverwrite(view_channel=True, connect=True, manage_channels=True)
+        })
+        update_template_from_channel(self.owner_id, channel, data.deputies)
+        await interaction.followup.send(
+            f"✅ {member.mention} {t('button_assign', interaction.guild_id).lower()}!", ephemeral=True
         )
         self.view.stop()
 
 class RemoveUserSelect(UserSelect):
     def __init__(self, channel: discord.VoiceChannel, owner_id: int):
-        super().__init__(placeholder=t("select_unassign_placeholder"))
+        super().__init__(placeholder=t("select_unassign_placeholder", channel.guild.id))
         self.channel = channel
         self.owner_id = owner_id
 
     async def callback(self, interaction: discord.Interaction):
         member = self.values[0]
-        tpl = private_vcs[self.channel.id]
-        deps = tpl.get("deputies", [])
-        if member.id not in deps:
-            return await interaction.response.send_message(t("modal_unassign_error"), ephemeral=True)
-        deps.remove(member.id)
-        perms = self.channel.overwrites
-        perms.pop(member, None)
-        await self.channel.edit(overwrites=perms)
-        update_template_from_channel(self.owner_id, self.channel, deps)
-        await interaction.response.send_message(
-            f"✅ {member.mention} {t('button_unassign').lower()}!", ephemeral=True
+        data = private_vcs[self.channel.id]
+        if not data.is_deputy(member.id):
+            return await interaction.response.send_message(t("modal_unassign_error", interaction.guild_id), ephemeral=True)
+        data.remove_deputy(member.id)
+        private_vcs.changed()
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        channel = await edit_channel(self.channel, {member: None})
+        update_template_from_channel(self.owner_id, channel, data.deputies)
+        await interaction.followup.send(
+            f"✅ {member.mention} {t('button_unassign', interaction.guild_id).lower()}!", ephemeral=True
         )
         self.view.stop()
 
@@ -271,108 +3068,394 @@ class RemoveSelectView(View):
         self.add_item(RemoveUserSelect(channel, owner_id))
 
 
-# ——— Management Buttons View ——————————————————————————————————
+# ——— Paged Lists ——————————————————————————————————————————————
 
-class ChannelManagementView(View):
-    def __init__(self, channel: discord.VoiceChannel, owner_id: int):
-        super().__init__(timeout=None)
-        self.channel = channel
-        self.owner_id = owner_id
+class PagedListView(View):
+    """Embed list with ◀/▶ buttons; `await render(start, stop)` builds only the lines of the shown page."""
 
-    def owner_check(self, interaction):
-        if interaction.user.id != self.owner_id:
-            asyncio.create_task(interaction.response.send_message(
-                t("error_not_owner"), ephemeral=True
-            ))
-            return False
-        return True
+    def __init__(self, guild_id: int, title: str, count: int, render, page_size: int = LIST_PAGE_SIZE):
+        super().__init__(timeout=300)
+        self.guild_id  = guild_id
+        self.title     = title
+        self.count     = count
+        self.render    = render
+        self.page_size = page_size
+        self.pages     = max(1, math.ceil(count / page_size))
+        self.page      = 0
+
+    async def embed(self) -> discord.Embed:
+        start = self.page * self.page_size
+        embed = discord.Embed(
+            title=self.title,
+            description="\n".join(await self.render(start, min(start + self.page_size, self.count))),
+            color=discord.Color.blurple()
+        )
+        embed.set_footer(text=t("list_page", self.guild_id, page=self.page + 1, pages=self.pages))
+        return embed
 
-    @button(label=t("button_rename"),    style=discord.ButtonStyle.primary,   custom_id="rename_btn")
-    async def rename_btn(self, interaction, button: UIButton):
-        if not self.owner_check(interaction): return
-        await interaction.response.send_modal(RenameModal(self.channel, self.owner_id))
+    async def send(self, interaction: discord.Interaction):
+        self._sync_buttons()
+        kwargs = {"view": self} if self.pages > 1 else {}
+        if not interaction.response.is_done():
+            # Uncached users on the page are fetched before it can be shown
+            await interaction.response.defer(ephemeral=True, thinking=True)
+        await interaction.followup.send(embed=await self.embed(), ephemeral=True, **kwargs)
 
-    @button(label=t("button_limit"),     style=discord.ButtonStyle.secondary, custom_id="limit_btn")
-    async def limit_btn(self, interaction, button: UIButton):
-        if not self.owner_check(interaction): return
-        await interaction.response.send_modal(LimitModal(self.channel, self.owner_id))
+    def _sync_buttons(self):
+        self.prev_btn.disabled = self.page == 0
+        self.next_btn.disabled = self.page >= self.pages - 1
 
-    @button(label=t("button_invite"),    style=discord.ButtonStyle.success,   custom_id="invite_btn")
-    async def invite_btn(self, interaction, button: UIButton):
-        if not self.owner_check(interaction): return
-        await interaction.response.send_message(
-            t("button_invite"), view=InviteSelectView(self.channel, self.owner_id), ephemeral=True
+    async def _show(self, interaction: discord.Interaction, page: int):
+        self.page = max(0, min(self.pages - 1, page))
+        self._sync_buttons()
+        await interaction.response.defer()
+        await interaction.edit_original_response(embed=await self.embed(), view=self)
+
+    @button(label="◀", style=discord.ButtonStyle.secondary)
+    async def prev_btn(self, interaction, button: UIButton):
+        await self._show(interaction, self.page - 1)
+
+    @button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_btn(self, interaction, button: UIButton):
+        await self._show(interaction, self.page + 1)
+
+
+async def _entity_name(guild: discord.Guild, entry: dict) -> str:
+    if entry["type"] == "user":
+        m = await member_resolver.resolve(guild, entry["id"])
+        return m.mention if m else f"`User ID {entry['id']}`"
+    r = guild.get_role(entry["id"])
+    return r.mention if r else f"`Role ID {entry['id']}`"
+
+def _entry_lines(guild: discord.Guild, entries: list, key: str):
+    """Page renderer for permission entries; names and expiries are resolved per page."""
+    async def render(start: int, stop: int) -> list[str]:
+        page = entries[start:stop]
+        names = await asyncio.gather(*(_entity_name(guild, e) for e in page))
+        lines = []
+        for e, name in zip(page, names):
+            exp = datetime.utcfromtimestamp(e["expires"]).strftime("%Y-%m-%d %H:%M UTC") \
+                  if e["expires"] else t("never", guild.id)
+            lines.append(t(key, guild.id, entity=name, expires=exp))
+        return lines
+    return render
+
+def _entity_lines(guild: discord.Guild, entries: list):
+    async def render(start: int, stop: int) -> list[str]:
+        return list(await asyncio.gather(*(_entity_name(guild, e) for e in entries[start:stop])))
+    return render
+
+def _mention_lines(user_ids: list[int]):
+    async def render(start: int, stop: int) -> list[str]:
+        return [f"<@{uid}>" for uid in user_ids[start:stop]]
+    return render
+
+
+# ——— Management Panel ——————————————————————————————————————————
+# Button order and style of the panel posted in every private VC
+PANEL_BUTTONS = {
+    "rename":    discord.ButtonStyle.primary,
+    "limit":     discord.ButtonStyle.secondary,
+    "invite":    discord.ButtonStyle.success,
+    "kick":      discord.ButtonStyle.danger,
+    "visible":   discord.ButtonStyle.success,
+    "invisible": discord.ButtonStyle.secondary,
+    "lock":      discord.ButtonStyle.danger,
+    "unlock":    discord.ButtonStyle.success,
+    "assign":    discord.ButtonStyle.primary,
+    "unassign":  discord.ButtonStyle.danger,
+    "delete":    discord.ButtonStyle.danger,
+}
+
+async def _panel_modal(interaction: discord.Interaction, data: VCRecord, modal_cls):
+    await interaction.response.send_modal(modal_cls(data.channel, data.owner))
+
+async def _panel_select(interaction: discord.Interaction, data: VCRecord, action: str, view_cls):
+    await interaction.response.send_message(
+        t(f"button_{action}", interaction.guild_id), view=view_cls(data.channel, data.owner), ephemeral=True
+    )
+
+async def _panel_everyone(interaction: discord.Interaction, data: VCRecord, action: str, **perms):
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    channel = await edit_channel(data.channel, {data.channel.guild.default_role: perms})
+    update_template_from_channel(data.owner, channel, data.deputies)
+    await interaction.followup.send(t(f"button_{action}", interaction.guild_id), ephemeral=True)
+
+async def _delete_and_reply(interaction: discord.Interaction, channel_id: int):
+    # The thread delete waits behind background calls, so acknowledge before deleting
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    try:
+        await delete_private_vc(channel_id)
+    except discord.HTTPException as e:
+        print(f"⚠️ Failed to delete VC {channel_id}: {e!r}")
+        return await interaction.followup.send(t("error_delete_failed", interaction.guild_id), ephemeral=True)
+    await interaction.followup.send(t("button_delete", interaction.guild_id), ephemeral=True)
+
+async def _panel_delete(interaction: discord.Interaction, data: VCRecord):
+    await _delete_and_reply(interaction, data.channel_id)
+
+PANEL_ACTIONS = {
+    "rename":    lambda i, d: _panel_modal(i, d, RenameModal),
+    "limit":     lambda i, d: _panel_modal(i, d, LimitModal),
+    "invite":    lambda i, d: _panel_select(i, d, "invite", InviteSelectView),
+    "kick":      lambda i, d: _panel_select(i, d, "kick", KickSelectView),
+    "visible":   lambda i, d: _panel_everyone(i, d, "visible", view_channel=True),
+    "invisible": lambda i, d: _panel_everyone(i, d, "invisible", view_channel=False),
+    "lock":      lambda i, d: _panel_everyone(i, d, "lock", connect=False),
+    "unlock":    lambda i, d: _panel_everyone(i, d, "unlock", connect=True),
+    "assign":    lambda i, d: _panel_select(i, d, "assign", AssignSelectView),
+    "unassign":  lambda i, d: _panel_select(i, d, "unassign", RemoveSelectView),
+    "delete":    _panel_delete,
+}
+
+async def run_panel_action(interaction: discord.Interaction, action: str, channel_id: int):
+    """Run a panel button for the VC's current owner, looked up in the registry on every click."""
+    data = private_vcs.get(channel_id)
+    if data is None or interaction.user.id != data.owner or data.channel is None:
+        return await interaction.response.send_message(
+            t("error_not_owner", interaction.guild_id), ephemeral=True
         )
+    await PANEL_ACTIONS[action](interaction, data)
 
-    @button(label=t("button_kick"),      style=discord.ButtonStyle.danger,    custom_id="kick_btn")
-    async def kick_btn(self, interaction, button: UIButton):
-        if not self.owner_check(interaction): return
-        await interaction.response.send_message(
-            t("button_kick"), view=KickSelectView(self.channel, self.owner_id), ephemeral=True
+def _panel_entered(interaction: discord.Interaction, action: str) -> bool:
+    diagnostics.enter(f"button:{action}")
+    if traffic_recorder.enabled:
+        traffic_recorder.interaction(interaction, f"button:{action}")
+    return True
+
+class PanelButton(discord.ui.DynamicItem[UIButton], template=r"vc:(?P<action>[a-z]+):(?P<channel>\d+)"):
+    """Panel button whose custom_id names the action and the VC.
+
+    Registered once with `add_dynamic_items`: clicks on any panel, including
+    those posted before a restart, build a throwaway item from the custom_id,
+    so no view is kept in memory per channel.
+    """
+
+    def __init__(self, action: str, channel_id: int, label: str | None = None):
+        super().__init__(UIButton(label=label, style=PANEL_BUTTONS[action], custom_id=f"vc:{action}:{channel_id}"))
+        self.action     = action
+        self.channel_id = channel_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: UIButton, match: re.Match):
+        if match["action"] not in PANEL_ACTIONS:
+            raise ValueError(f"unknown panel action {match['action']!r}")
+        return cls(match["action"], int(match["channel"]), item.label)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return _panel_entered(interaction, self.action)
+
+    async def callback(self, interaction: discord.Interaction):
+        await run_panel_action(interaction, self.action, self.channel_id)
+
+class LegacyPanelButton(discord.ui.DynamicItem[UIButton], template=rf"(?P<action>{'|'.join(PANEL_BUTTONS)})_btn"):
+    """Buttons of panels posted before custom_ids carried the VC (`rename_btn`, ...).
+
+    Panels are posted in the VC's own chat, so the interaction's channel is the VC.
+    """
+
+    def __init__(self, action: str, label: str | None = None):
+        super().__init__(UIButton(label=label, style=PANEL_BUTTONS[action], custom_id=f"{action}_btn"))
+        self.action = action
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: UIButton, match: re.Match):
+        return cls(match["action"], item.label)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return _panel_entered(interaction, self.action)
+
+    async def callback(self, interaction: discord.Interaction):
+        await run_panel_action(interaction, self.action, interaction.channel_id)
+
+def panel_view(channel: discord.VoiceChannel) -> View:
+    """Buttons for a new panel, labelled in the guild's language; nothing of it is kept after sending."""
+    lang = locale_for(channel.guild.id)
+    view = View(timeout=None)
+    for action in PANEL_BUTTONS:
+        view.add_item(PanelButton(action, channel.id, lang(f"button_{action}")))
+    return view
+
+
+# ——— Private VC Creation ————————————————————————————————————————————
+
+def _template_overwrites(guild: discord.Guild, member: discord.Member, tpl: TemplateRecord) -> dict:
+    # Template members are addressed by id: Discord resolves them, so the join path fetches nobody
+    overwrites = {
+        guild.default_role: discord.PermissionOverwrite(
+            view_channel=tpl.visible,
+            connect=not tpl.locked
         )
+    }
+    for uid in tpl.invited:
+        overwrites[discord.Object(uid, type=discord.Member)] = discord.PermissionOverwrite(view_channel=True, connect=True)
+    for uid in tpl.kicked:
+        overwrites[discord.Object(uid, type=discord.Member)] = discord.PermissionOverwrite(connect=False)
+    for uid in (member.id, *tpl.deputies):
+        overwrites[discord.Object(uid, type=discord.Member)] = discord.PermissionOverwrite(
+            view_channel=True, connect=True, manage_channels=True
+        )
+    return overwrites
 
-    @button(label=t("button_visible"),   style=discord.ButtonStyle.success,   custom_id="visible_btn")
-    async def visible_btn(self, interaction, button: UIButton):
-        if not self.owner_check(interaction): return
-        perms = self.channel.overwrites
-        perms[self.channel.guild.default_role] = discord.PermissionOverwrite(view_channel=True)
-        await self.channel.edit(overwrites=perms)
-        tpl = private_vcs[self.channel.id]
-        update_template_from_channel(self.owner_id, self.channel, tpl["deputies"])
-        await interaction.response.send_message(t("button_visible"), ephemeral=True)
-
-    @button(label=t("button_invisible"), style=discord.ButtonStyle.secondary, custom_id="invisible_btn")
-    async def invisible_btn(self, interaction, button: UIButton):
-        if not self.owner_check(interaction): return
-        perms = self.channel.overwrites
-        perms[self.channel.guild.default_role] = discord.PermissionOverwrite(view_channel=False)
-        await self.channel.edit(overwrites=perms)
-        tpl = private_vcs[self.channel.id]
-        update_template_from_channel(self.owner_id, self.channel, tpl["deputies"])
-        await interaction.response.send_message(t("button_invisible"), ephemeral=True)
-
-    @button(label=t("button_lock"),      style=discord.ButtonStyle.danger,    custom_id="lock_btn")
-    async def lock_btn(self, interaction, button: UIButton):
-        if not self.owner_check(interaction): return
-        perms = self.channel.overwrites
-        perms[self.channel.guild.default_role] = discord.PermissionOverwrite(connect=False)
-        await self.channel.edit(overwrites=perms)
-        tpl = private_vcs[self.channel.id]
-        update_template_from_channel(self.owner_id, self.channel, tpl["deputies"])
-        await interaction.response.send_message(t("button_lock"), ephemeral=True)
-
-    @button(label=t("button_unlock"),    style=discord.ButtonStyle.success,   custom_id="unlock_btn")
-    async def unlock_btn(self, interaction, button: UIButton):
-        if not self.owner_check(interaction): return
-        perms = self.channel.overwrites
-        perms[self.channel.guild.default_role] = discord.PermissionOverwrite(connect=True)
-        await self.channel.edit(overwrites=perms)
-        tpl = private_vcs[self.channel.id]
-        update_template_from_channel(self.owner_id, self.channel, tpl["deputies"])
-        await interaction.response.send_message(t("button_unlock"), ephemeral=True)
-
-    @button(label=t("button_assign"),    style=discord.ButtonStyle.primary,   custom_id="assign_btn")
-    async def assign_btn(self, interaction, button: UIButton):
-        if not self.owner_check(interaction): return
-        await interaction.response.send_message(
-            t("button_assign"), view=AssignSelectView(self.channel, self.owner_id), ephemeral=True
+async def move_with_retry(member: discord.Member, channel: discord.VoiceChannel) -> bool:
+    """Move `member` into `channel`, retrying with backoff while the new channel propagates.
+
+    Gives up (returns False) once the member is no longer connected to voice.
+    """
+    for delay in (*MOVE_RETRY_DELAYS, None):
+        if member.voice is None:
+            return False
+        try:
+            await rest.call("move_member", PRIORITY_USER, member.move_to, channel)
+            return True
+        except discord.HTTPException:
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
+    return False
+
+PANEL_COMMANDS = ("limit", "rename", "invite", "kick", "visible", "invisible", "lock", "unlock", "assign", "unassign", "delete")
+
+def _panel_description(lang: Locale) -> list[str]:
+    """embed_desc with the command list rendered, split where the owner mention goes."""
+    commands_list = "\n".join(f"• /{cmd} — {lang('cmd_' + cmd + '_desc')}" for cmd in PANEL_COMMANDS)
+    return lang("embed_desc", owner="\0", commands=commands_list).split("\0")
+
+def panel_embed(guild_id: int, owner: discord.Member) -> discord.Embed:
+    lang = locale_for(guild_id)
+    return discord.Embed(
+        title=lang("embed_title"),
+        description=owner.mention.join(lang.cached("panel_description", _panel_description)),
+        color=discord.Color.blurple()
+    )
+
+async def post_panel(vc: discord.VoiceChannel, member: discord.Member):
+    """Post the management embed and thread for a fresh VC, then record them in the registry."""
+    embed = panel_embed(vc.guild.id, member)
+    msg = thread = None
+    try:
+        msg = await rest.call(
+            "send_message", PRIORITY_BACKGROUND, vc.send,
+            embed=embed, view=panel_view(vc)
         )
+        thread = await rest.call(
+            "create_thread", PRIORITY_BACKGROUND, msg.create_thread,
+            name=f"{member.display_name}-management", auto_archive_duration=60
+        )
+        await rest.call(
+            "send_message", PRIORITY_BACKGROUND, thread.send,
+            f"{member.mention}, manage your channel here 👇"
+        )
+    except Exception:
+        pass
 
-    @button(label=t("button_unassign"),  style=discord.ButtonStyle.danger,    custom_id="unassign_btn")
-    async def unassign_btn(self, interaction, button: UIButton):
-        if not self.owner_check(interaction): return
-        await interaction.response.send_message(
-            t("button_unassign"), view=RemoveSelectView(self.channel, self.owner_id), ephemeral=True
+    data = private_vcs.get(vc.id)
+    if data is None:
+        # Channel was deleted while the panel was being posted
+        if thread:
+            try:
+                await rest.call("delete_channel", PRIORITY_BACKGROUND, thread.delete)
+            except discord.HTTPException:
+                pass
+        return
+    data.thread_id = thread.id if thread else None
+    data.message   = msg.id if msg else None
+    private_vcs.changed()
+
+async def create_private_vc(member: discord.Member, category, received: float):
+    """Create `member`'s VC from their template, register it and move them in."""
+    guild = member.guild
+    tpl   = await get_user_template(member.id) or TemplateRecord()
+    settings = dict(
+        name=tpl.name or f"{member.display_name}'s VC",
+        overwrites=_template_overwrites(guild, member, tpl),
+        user_limit=tpl.user_limit
+    )
+    warm_pool.note_join(guild.id)
+    vc = warm_pool.take(guild, category.id if category else None)
+    if vc is not None:
+        try:
+            await rest.call("edit_channel", PRIORITY_USER, vc.edit, **settings)
+        except discord.HTTPException as e:
+            # Nobody owns the pool channel now: drop it and create a fresh one instead
+            print(f"⚠️ Warm pool handoff of {vc.id} failed, creating instead: {e!r}")
+            spawn(warm_pool.discard(vc))
+            vc = None
+    if vc is None:
+        vc = await rest.call(
+            "create_channel", PRIORITY_USER, guild.create_voice_channel, category=category, **settings
         )
+    if warm_pool.enabled(guild.id):
+        spawn(warm_pool.refill(guild, category))
+    # Register before anything else awaits, so a fast leave finds the channel
+    private_vcs[vc.id] = VCRecord(guild.id, vc.id, member.id, deputies=tpl.deputies)
+    spawn(post_panel(vc, member))
+
+    moved = False
+    try:
+        moved = await move_with_retry(member, vc)
+    finally:
+        if moved:
+            trigger_to_move.observe(time.perf_counter() - received)
+        elif not vc.members and vc.id in private_vcs:
+            # Member left before landing in it: let the usual timeout clean it up
+            auto_delete.arm(vc.id, DEFAULT_TIMEOUT * 60)
+            private_vcs[vc.id].empty_since = time.time()
+            private_vcs.changed()
+    return vc
+
+
+class CreationGate:
+    """Admission control for VC creation.
 
-    @button(label=t("button_delete"),    style=discord.ButtonStyle.danger,    custom_id="delete_btn")
-    async def delete_btn(self, interaction, button: UIButton):
-        if not self.owner_check(interaction): return
-        await self.channel.delete()
-        data = private_vcs.pop(self.channel.id, {})
-        if thread := data.get("thread"):
-            await thread.delete()
-        await interaction.response.send_message(t("button_delete"), ephemeral=True)
+    Concurrent trigger joins of the same member share one in-flight creation.
+    Per guild, at most `concurrency` creations run at once and up to
+    `queue_limit` members wait their turn while staying in the trigger channel.
+    """
+
+    def __init__(self, concurrency: int = CREATE_CONCURRENCY, queue_limit: int = CREATE_QUEUE_LIMIT):
+        self.concurrency = concurrency
+        self.queue_limit = queue_limit
+        self._inflight: dict[tuple[int, int], asyncio.Task] = {}
+        self._slots:    dict[int, asyncio.Semaphore] = {}
+        self._waiting:  dict[int, int] = {}
+        self.collapsed = 0
+        self.rejected  = 0
+
+    def queued(self, guild_id: int | None = None) -> int:
+        if guild_id is not None:
+            return self._waiting.get(guild_id, 0)
+        return sum(self._waiting.values())
+
+    async def run(self, member: discord.Member, create) -> bool:
+        """Run `create()` once per member at a time. Returns False if the guild queue is full."""
+        key = (member.guild.id, member.id)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.collapsed += 1
+            await asyncio.shield(task)
+            return True
+        if self.queued(member.guild.id) >= self.queue_limit:
+            self.rejected += 1
+            return False
+        self._waiting[member.guild.id] = self.queued(member.guild.id) + 1
+        task = self._inflight[key] = spawn(self._admit(member.guild.id, create))
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        await asyncio.shield(task)
+        return True
+
+    async def _admit(self, guild_id: int, create):
+        slots = self._slots.setdefault(guild_id, asyncio.Semaphore(self.concurrency))
+        try:
+            await slots.acquire()
+        finally:
+            self._waiting[guild_id] -= 1
+        try:
+            await create()
+        finally:
+            slots.release()
+
+creation_gate = CreationGate()
 
 
 # ——— Voice State Update: Config + Private VC Logic —————————————————————
@@ -381,132 +3464,74 @@ class ChannelManagementView(View):
 async def on_voice_state_update(member: discord.Member,
                                 before: discord.VoiceState,
                                 after: discord.VoiceState):
-    # 0) Clean up stale record if channel was deleted out-of-band
-    existing = get_user_vc(member.id)
-    if existing:
-        chan_id = existing["channel"].id
-        if member.guild.get_channel(chan_id) is None:
-            private_vcs.pop(chan_id, None)
-            existing = None
-
-    # 1) Config-based permission cleanup & fetch trigger/category
+    received = time.perf_counter()
+    if traffic_recorder.enabled:
+        traffic_recorder.voice(member, before, after)
+    diagnostics.enter("voice_state_update")
+    try:
+        await handle_voice_state_update(member, before, after, received)
+    finally:
+        voice_state_update.observe(time.perf_counter() - received)
+
+async def handle_voice_state_update(member: discord.Member,
+                                    before: discord.VoiceState,
+                                    after: discord.VoiceState,
+                                    received: float):
+    # 0) Look up the member's VC (drops the record if the channel was deleted out-of-band)
+    existing = get_user_vc(member.id, member.guild.id)
+
+    # 1) Arm/disarm auto-delete when a private VC empties or gets joined
+    if before.channel != after.channel:
+        if after.channel and after.channel.id in private_vcs:
+            auto_delete.cancel(after.channel.id)
+            if private_vcs[after.channel.id].empty_since is not None:
+                private_vcs[after.channel.id].empty_since = None
+                private_vcs.changed()
+        if before.channel and before.channel.id in private_vcs and not before.channel.members:
+            data = private_vcs[before.channel.id]
+            auto_delete.arm(before.channel.id, data.timeout * 60)
+            data.empty_since = time.time()
+            private_vcs.changed()
+
+    # 2) Fetch trigger/category (expired permissions are pruned by permission_expiry)
     gid = str(member.guild.id)
     cfg = config["guilds"].get(gid, {})
-    perms = cfg.setdefault("permissions", {"allowed": [], "banned": []})
-    now_ts = int(datetime.utcnow().timestamp())
-    for list_name in ("allowed", "banned"):
-        perms[list_name] = [
-            e for e in perms.get(list_name, [])
-            if e["expires"] is None or e["expires"] > now_ts
-        ]
-    save_config()
 
     trigger_id = cfg.get("trigger_channel_id", CREATE_VC_CHANNEL_ID)
     default_cat = cfg.get("default_category_id", VC_CATEGORY_ID)
     create_cat  = cfg.get("create_category_id", default_cat)
 
-    # 2) Handle join trigger -> move to existing or create new VC
+    # 3) Handle join trigger -> move to existing or create new VC
     if after.channel and after.channel.id == trigger_id:
-        # Permission check: banned
-        if any(e["type"] == "user" and e["id"] == member.id for e in perms["banned"]):
+        # Permission check: banned users/roles, allowed-list if non-empty
+        if denied := get_perm_index(gid).check(member):
             try:
-                await member.send(t("error_banned"))
+                await rest.call("dm", PRIORITY_BACKGROUND, member.send, t(denied, member.guild.id))
             except:
                 pass
             return
-        # Permission check: allowed-list if non-empty
-        if perms["allowed"]:
-            ok = any(e["type"] == "user" and e["id"] == member.id for e in perms["allowed"])
-            if not ok and not member.guild_permissions.administrator:
-                try:
-                    await member.send(t("error_no_permission"))
-                except:
-                    pass
-                return
 
         # If user already has a VC, just move them
         if existing:
-            return await member.move_to(existing["channel"])
-
-        # Otherwise, create new VC
-        guild    = member.guild
-        category = guild.get_channel(create_cat)
-        tpl      = get_user_template(member.id) or {}
-
-        name        = tpl.get("name", f"{member.display_name}'s VC")
-        user_limit  = tpl.get("user_limit", 5)
-        default_view    = tpl.get("visible", True)
-        default_connect = not tpl.get("locked", False)
-
-        overwrites = {
-            guild.default_role: discord.PermissionOverwrite(
-                view_channel=default_view,
-                connect=default_connect
-            )
-        }
-        for uid in tpl.get("invited", []):
-            m = guild.get_member(uid)
-            if m:
-                overwrites[m] = discord.PermissionOverwrite(view_channel=True, connect=True)
-        for uid in tpl.get("kicked", []):
-            m = guild.get_member(uid)
-            if m:
-                overwrites[m] = discord.PermissionOverwrite(connect=False)
-        overwrites[member] = discord.PermissionOverwrite(
-            view_channel=True, connect=True, manage_channels=True
-        )
-        for uid in tpl.get("deputies", []):
-            m = guild.get_member(uid)
-            if m:
-                overwrites[m] = discord.PermissionOverwrite(
-                    view_channel=True, connect=True, manage_channels=True
-                )
-
-        vc = await guild.create_voice_channel(
-            name=name,
-            category=category,
-            overwrites=overwrites,
-            user_limit=user_limit
-        )
-        await asyncio.sleep(1)
-        await member.move_to(vc)
+            await rest.call("move_member", PRIORITY_USER, member.move_to, existing.channel)
+            trigger_to_move.observe(time.perf_counter() - received)
+            return
 
-        # Send management embed & view
-        commands_list = "\n".join(
-            f"• /{cmd} — {t('cmd_' + cmd + '_desc')}"
-            for cmd in ["limit","rename","invite","kick","visible","invisible","lock","unlock","assign","unassign","delete"]
-        )
-        embed = discord.Embed(
-            title=t("embed_title"),
-            description=t("embed_desc", owner=member.mention, commands=commands_list),
-            color=discord.Color.blurple()
-        )
-        try:
-            msg = await vc.send(embed=embed, view=ChannelManagementView(vc, member.id))
-            thread = await msg.create_thread(name=f"{member.display_name}-management", auto_archive_duration=60)
-            await thread.send(f"{member.mention}, manage your channel here 👇")
-        except Exception:
-            thread = None
-
-        private_vcs[vc.id] = {
-            "owner":    member.id,
-            "channel":  vc,
-            "thread":   thread,
-            "timeout":  DEFAULT_TIMEOUT,
-            "deputies": tpl.get("deputies", [])
-        }
-        return
+        # Otherwise, create new VC once it's their turn and move them in as soon as it exists
+        async def create():
+            if member.voice is None or member.voice.channel is None or member.voice.channel.id != trigger_id:
+                return  # left the trigger while waiting
+            if existing := get_user_vc(member.id, member.guild.id):
+                await rest.call("move_member", PRIORITY_USER, member.move_to, existing.channel)
+                trigger_to_move.observe(time.perf_counter() - received)
+                return
+            await create_private_vc(member, member.guild.get_channel(create_cat), received)
 
-    # 3) Auto-delete empty private VC after timeout
-    if before.channel and before.channel.id in private_vcs:
-        data = private_vcs[before.channel.id]
-        if not before.channel.members:
-            await asyncio.sleep(data["timeout"] * 60)
-            if not data["channel"].members:
-                await data["channel"].delete()
-                if data["thread"]:
-                    await data["thread"].delete()
-                private_vcs.pop(before.channel.id, None)
+        if not await creation_gate.run(member, create):
+            try:
+                await rest.call("dm", PRIORITY_BACKGROUND, member.send, t("error_busy", member.guild.id))
+            except discord.HTTPException:
+                pass
 
 
 # —————————————————— ADMIN CONFIG & PERMISSION COMMANDS ——————————————————
@@ -518,9 +3543,9 @@ async def vcconfig_trigger_set(interaction: discord.Interaction, channel: discor
     cfg = config["guilds"].setdefault(gid, {})
     cfg["trigger_channel_id"] = channel.id
     cfg.setdefault("default_category_id", channel.category_id)
-    save_config()
+    save_config(gid)
     await interaction.response.send_message(
-        t("vcconfig_trigger_set_success", channel=channel.name), ephemeral=True
+        t("vcconfig_trigger_set_success", interaction.guild_id, channel=channel.name), ephemeral=True
     )
 
 @tree.command(name="vcconfig_default_cat", description=t("cmd_vcconfig_default_cat"))
@@ -529,9 +3554,9 @@ async def vcconfig_default_cat(interaction: discord.Interaction, category: disco
     gid = str(interaction.guild.id)
     cfg = config["guilds"].setdefault(gid, {})
     cfg["default_category_id"] = category.id
-    save_config()
+    save_config(gid)
     await interaction.response.send_message(
-        t("vcconfig_default_cat_success", category=category.name), ephemeral=True
+        t("vcconfig_default_cat_success", interaction.guild_id, category=category.name), ephemeral=True
     )
 
 @tree.command(name="vcconfig_create_cat", description=t("cmd_vcconfig_create_cat"))
@@ -540,9 +3565,53 @@ async def vcconfig_create_cat(interaction: discord.Interaction, category: discor
     gid = str(interaction.guild.id)
     cfg = config["guilds"].setdefault(gid, {})
     cfg["create_category_id"] = category.id
-    save_config()
+    save_config(gid)
+    await interaction.response.send_message(
+        t("vcconfig_create_cat_success", interaction.guild_id, category=category.name), ephemeral=True
+    )
+
+@tree.command(name="vcconfig_warm_pool", description=t("cmd_vcconfig_warm_pool"))
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.describe(
+    minimum="Channels to keep warm even when idle",
+    maximum="Upper bound for the pool (0 disables it)"
+)
+async def vcconfig_warm_pool(interaction: discord.Interaction,
+                             minimum: app_commands.Range[int, 0, 25],
+                             maximum: app_commands.Range[int, 0, 25]):
+    gid = str(interaction.guild.id)
+    cfg = config["guilds"].setdefault(gid, {})
+    cfg["warm_pool"] = {"min": min(minimum, maximum), "max": maximum}
+    save_config(gid)
+    spawn(warm_pool.refill(interaction.guild, interaction.guild.get_channel(_create_category_id(interaction.guild))))
+    await interaction.response.send_message(
+        t("vcconfig_warm_pool_success", interaction.guild_id, minimum=min(minimum, maximum), maximum=maximum), ephemeral=True
+    )
+
+@tree.command(name="vcconfig_lang", description=t("cmd_vcconfig_lang"))
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.choices(language=[app_commands.Choice(name=code, value=code) for code in LANGUAGES])
+async def vcconfig_lang(interaction: discord.Interaction, language: app_commands.Choice[str]):
+    gid = str(interaction.guild.id)
+    cfg = config["guilds"].setdefault(gid, {})
+    cfg["lang"] = language.value
+    save_config(gid)
+    await interaction.response.send_message(
+        t("vcconfig_lang_success", interaction.guild_id, language=language.value), ephemeral=True
+    )
+
+@tree.command(name="vcdiag", description=t("cmd_vcdiag"))
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.choices(mode=[app_commands.Choice(name=mode, value=mode) for mode in ("off", "on", "profile")])
+async def vcdiag(interaction: discord.Interaction, mode: app_commands.Choice[str]):
+    # Process-wide, so reserved for the bot's owner rather than any guild's admins
+    if not await bot.is_owner(interaction.user):
+        return await interaction.response.send_message(
+            t("error_not_owner", interaction.guild_id), ephemeral=True
+        )
+    diagnostics.set_mode(mode.value)
     await interaction.response.send_message(
-        t("vcconfig_create_cat_success", category=category.name), ephemeral=True
+        t("vcdiag_success", interaction.guild_id, mode=mode.value, path=diagnostics.path), ephemeral=True
     )
 
 @tree.command(
@@ -569,15 +3638,7 @@ async def vcperm_grant(
     minutes: int = 0,
     seconds: int = 0
 ):
-    total_secs = (
-        years   * 365 * 24 * 3600 +
-        months  * 30  * 24 * 3600 +
-        days    * 24  * 3600 +
-        hours   * 3600 +
-        minutes * 60 +
-        seconds
-    )
-    duration = total_secs if total_secs > 0 else None
+    duration = _duration(years, months, days, hours, minutes, seconds)
 
     _add_permission(str(interaction.guild.id), "allowed", user.id, duration)
 
@@ -585,13 +3646,13 @@ async def vcperm_grant(
         expires_at = (datetime.utcnow() + timedelta(seconds=duration)) \
                      .strftime("%Y-%m-%d %H:%M UTC")
         await interaction.response.send_message(
-            t("vcperm_grant_success", user=user.mention)
+            t("vcperm_grant_success", interaction.guild_id, user=user.mention)
             + f" (до {expires_at})",
             ephemeral=True
         )
     else:
         await interaction.response.send_message(
-            t("vcperm_grant_success", user=user.mention),
+            t("vcperm_grant_success", interaction.guild_id, user=user.mention),
             ephemeral=True
         )
 
@@ -620,35 +3681,23 @@ async def vcperm_revoke(
     seconds: int = 0
 ):
     gid   = str(interaction.guild.id)
-    perms = config["guilds"].setdefault(gid, {}).setdefault("permissions", {"allowed": [], "banned": []})
-    perms["allowed"] = [
-        e for e in perms.get("allowed", [])
-        if not (e["type"] == "user" and e["id"] == user.id)
-    ]
 
-    total_secs = (
-        years   * 365*24*3600 +
-        months  * 30*24*3600 +
-        days    * 24*3600 +
-        hours   * 3600 +
-        minutes * 60 +
-        seconds
-    )
-    duration = total_secs if total_secs > 0 else None
+    duration = _duration(years, months, days, hours, minutes, seconds)
 
-    _add_permission(gid, "banned", user.id, duration)
+    _update_permissions(gid, add={"banned": [_perm_entry("user", user.id, duration)]},
+                        remove={"allowed": {("user", user.id)}})
 
     if duration:
         expires_at = (datetime.utcnow() + timedelta(seconds=duration)) \
                      .strftime("%Y-%m-%d %H:%M UTC")
         await interaction.response.send_message(
-            t("vcperm_revoke_success", user=user.mention)
+            t("vcperm_revoke_success", interaction.guild_id, user=user.mention)
             + f" (до {expires_at})",
             ephemeral=True
         )
     else:
         await interaction.response.send_message(
-            t("vcperm_revoke_success", user=user.mention),
+            t("vcperm_revoke_success", interaction.guild_id, user=user.mention),
             ephemeral=True
         )
 
@@ -674,14 +3723,7 @@ async def vcban_add(
     minutes: int = 0,
     seconds: int = 0
 ):
-    total_secs = (
-        years  * 365 * 24 * 3600 +
-        days   * 24  * 3600 +
-        hours  * 3600 +
-        minutes * 60 +
-        seconds
-    )
-    duration = total_secs if total_secs > 0 else None
+    duration = _duration(years=years, days=days, hours=hours, minutes=minutes, seconds=seconds)
 
     _add_permission(str(interaction.guild.id), "banned", user.id, duration)
 
@@ -689,28 +3731,172 @@ async def vcban_add(
         expires_at = (datetime.utcnow() + timedelta(seconds=duration)) \
                      .strftime("%Y-%m-%d %H:%M UTC")
         await interaction.response.send_message(
-            t("vcban_add_success", user=user.mention) +
+            t("vcban_add_success", interaction.guild_id, user=user.mention) +
             f" (до {expires_at})",
             ephemeral=True
         )
     else:
         await interaction.response.send_message(
-            t("vcban_add_success", user=user.mention),
+            t("vcban_add_success", interaction.guild_id, user=user.mention),
             ephemeral=True
         )
 
 @tree.command(name="vcban_remove", description=t("cmd_vcban_remove_desc"))
 @app_commands.checks.has_permissions(administrator=True)
 async def vcban_remove(interaction: discord.Interaction, user: discord.Member):
-    gid = str(interaction.guild.id)
+    _remove_permission(str(interaction.guild.id), "banned", "user", user.id)
+    await interaction.response.send_message(
+        t("vcban_remove_success", interaction.guild_id, user=user.mention), ephemeral=True
+    )
+
+
+# ——— Bulk Permissions ——————————————————————————————————————————————
+PERM_LISTS             = ("allowed", "banned")
+PERM_CSV_FIELDS        = ("list", "type", "id", "expires")
+PERM_IMPORT_MAX_BYTES  = 1 << 20
+MENTION_RE             = re.compile(r"<@(!|&)?(\d+)>|(\d{15,20})")
+
+def _parse_targets(guild: discord.Guild, text: str) -> tuple[list[tuple[str, int]], list[str]]:
+    """(type, id) of the members, roles and raw ids in `text`, and the tokens that are none of these."""
+    targets, unknown = [], []
+    for token in text.replace(",", " ").split():
+        m = MENTION_RE.fullmatch(token)
+        if token == "@everyone":
+            targets.append(("role", guild.default_role.id))
+        elif m is None or (m.group(1) == "&" and guild.get_role(int(m.group(2))) is None):
+            unknown.append(token)
+        elif m.group(1) == "&":
+            targets.append(("role", int(m.group(2))))
+        elif m.group(2):
+            targets.append(("user", int(m.group(2))))
+        else:
+            # A bare id is a role if the guild has one with it, a member otherwise
+            target_id = int(m.group(3))
+            targets.append(("role" if guild.get_role(target_id) else "user", target_id))
+    return list(dict.fromkeys(targets)), unknown
+
+async def _bulk_permissions(interaction: discord.Interaction, targets: str, success_key: str,
+                            add_to: str | None = None, remove_from: str | None = None,
+                            duration: int | None = None):
+    parsed, unknown = _parse_targets(interaction.guild, targets)
+    if not parsed:
+        return await interaction.response.send_message(
+            t("bulk_no_targets", interaction.guild_id), ephemeral=True
+        )
+    _update_permissions(
+        str(interaction.guild.id),
+        add={add_to: [_perm_entry(kind, target_id, duration) for kind, target_id in parsed]} if add_to else None,
+        remove={remove_from: set(parsed)} if remove_from else None,
+    )
+    message = t(success_key, interaction.guild_id, count=len(parsed))
+    if unknown:
+        message += "\n" + t("bulk_unknown", interaction.guild_id, tokens=", ".join(unknown[:10]))
+    await interaction.response.send_message(message, ephemeral=True)
+
+@tree.command(name="vcperm_grant_bulk", description=t("cmd_vcperm_grant_bulk_desc"))
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.describe(targets="Members, roles or ids, e.g. @Event @alice 123456789012345678",
+                       days="Days", hours="Hours", minutes="Minutes")
+async def vcperm_grant_bulk(interaction: discord.Interaction, targets: str,
+                            days: int = 0, hours: int = 0, minutes: int = 0):
+    await _bulk_permissions(interaction, targets, "vcperm_grant_bulk_success",
+                            add_to="allowed", duration=_duration(days=days, hours=hours, minutes=minutes))
+
+@tree.command(name="vcperm_revoke_bulk", description=t("cmd_vcperm_revoke_bulk_desc"))
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.describe(targets="Members, roles or ids, e.g. @Event @alice 123456789012345678",
+                       days="Days", hours="Hours", minutes="Minutes")
+async def vcperm_revoke_bulk(interaction: discord.Interaction, targets: str,
+                             days: int = 0, hours: int = 0, minutes: int = 0):
+    await _bulk_permissions(interaction, targets, "vcperm_revoke_bulk_success",
+                            add_to="banned", remove_from="allowed",
+                            duration=_duration(days=days, hours=hours, minutes=minutes))
+
+@tree.command(name="vcban_add_bulk", description=t("cmd_vcban_add_bulk_desc"))
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.describe(targets="Members, roles or ids, e.g. @Event @alice 123456789012345678",
+                       days="Days", hours="Hours", minutes="Minutes")
+async def vcban_add_bulk(interaction: discord.Interaction, targets: str,
+                         days: int = 0, hours: int = 0, minutes: int = 0):
+    await _bulk_permissions(interaction, targets, "vcban_add_bulk_success",
+                            add_to="banned", duration=_duration(days=days, hours=hours, minutes=minutes))
+
+@tree.command(name="vcban_remove_bulk", description=t("cmd_vcban_remove_bulk_desc"))
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.describe(targets="Members, roles or ids, e.g. @Event @alice 123456789012345678")
+async def vcban_remove_bulk(interaction: discord.Interaction, targets: str):
+    await _bulk_permissions(interaction, targets, "vcban_remove_bulk_success", remove_from="banned")
+
+def _read_permission_table(raw: bytes, filename: str) -> tuple[dict[str, list[dict]], int]:
+    """Entries per list from a CSV or JSON table as written by /vcperm_export, and the count of unusable rows.
+
+    Raises ValueError (or TypeError, csv.Error) if the file is neither.
+    """
+    text = raw.decode("utf-8-sig")
+    if filename.lower().endswith(".json") or text.lstrip().startswith("{"):
+        data = json.loads(text)
+        rows = [(list_name, e.get("type"), e.get("id"), e.get("expires"))
+                for list_name in PERM_LISTS for e in data.get(list_name) or () if isinstance(e, dict)]
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        if reader.fieldnames is None or not set(PERM_CSV_FIELDS) <= set(reader.fieldnames):
+            raise ValueError("missing CSV columns")
+        rows = [(r["list"], r["type"], r["id"], r["expires"]) for r in reader]
+    table, skipped, now_ts = {list_name: [] for list_name in PERM_LISTS}, 0, _now_ts()
+    for list_name, kind, target_id, expires in rows:
+        try:
+            target_id = int(target_id)
+            expires   = int(expires) if expires not in (None, "") else None
+        except (TypeError, ValueError):
+            skipped += 1
+            continue
+        if list_name not in PERM_LISTS or kind not in ("user", "role") or (expires is not None and expires <= now_ts):
+            skipped += 1
+            continue
+        table[list_name].append({"type": kind, "id": target_id, "expires": expires})
+    return table, skipped
+
+@tree.command(name="vcperm_export", description=t("cmd_vcperm_export_desc"))
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.choices(format=[app_commands.Choice(name=fmt, value=fmt) for fmt in ("csv", "json")])
+async def vcperm_export(interaction: discord.Interaction, format: app_commands.Choice[str]):
+    gid   = str(interaction.guild.id)
     perms = config["guilds"].get(gid, {}).get("permissions", {})
-    perms["banned"] = [
-        e for e in perms.get("banned", [])
-        if not (e["type"] == "user" and e["id"] == user.id)
-    ]
-    save_config()
+    table = {list_name: perms.get(list_name, []) for list_name in PERM_LISTS}
+    if format.value == "json":
+        data = json.dumps(table, indent=2)
+    else:
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(PERM_CSV_FIELDS)
+        writer.writerows(
+            (list_name, e["type"], e["id"], "" if e["expires"] is None else e["expires"])
+            for list_name, entries in table.items() for e in entries
+        )
+        data = buf.getvalue()
     await interaction.response.send_message(
-        t("vcban_remove_success", user=user.mention), ephemeral=True
+        t("vcperm_export_success", interaction.guild_id, count=sum(map(len, table.values()))),
+        file=discord.File(io.BytesIO(data.encode("utf-8")), filename=f"permissions-{gid}.{format.value}"),
+        ephemeral=True
+    )
+
+@tree.command(name="vcperm_import", description=t("cmd_vcperm_import_desc"))
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.describe(file="CSV or JSON from /vcperm_export", replace="Replace the current table instead of merging")
+async def vcperm_import(interaction: discord.Interaction, file: discord.Attachment, replace: bool = False):
+    if file.size > PERM_IMPORT_MAX_BYTES:
+        return await interaction.response.send_message(
+            t("vcperm_import_too_large", interaction.guild_id, size=PERM_IMPORT_MAX_BYTES // 1024), ephemeral=True
+        )
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    try:
+        table, skipped = _read_permission_table(await file.read(), file.filename)
+    except (ValueError, TypeError, AttributeError, csv.Error):
+        return await interaction.followup.send(t("vcperm_import_invalid", interaction.guild_id), ephemeral=True)
+    _update_permissions(str(interaction.guild.id), add=table, replace=replace)
+    await interaction.followup.send(
+        t("vcperm_import_success", interaction.guild_id, count=sum(map(len, table.values())), skipped=skipped),
+        ephemeral=True
     )
 
 
@@ -726,29 +3912,16 @@ async def vcban_list(interaction: discord.Interaction):
                      .get("banned", [])
     if not banned:
         return await interaction.response.send_message(
-            t("vcban_list_empty"), ephemeral=True
+            t("vcban_list_empty", interaction.guild_id), ephemeral=True
         )
 
-    lines = []
-    for e in banned:
-        if e["type"] == "user":
-            m = interaction.guild.get_member(e["id"])
-            name = m.mention if m else f"`User ID {e['id']}`"
-        else:
-            r = interaction.guild.get_role(e["id"])
-            name = r.mention if r else f"`Role ID {e['id']}`"
-
-        if e["expires"]:
-            exp = datetime.utcfromtimestamp(e["expires"]).strftime("%Y-%m-%d %H:%M UTC")
-        else:
-            exp = t("never")
-        lines.append(t("vcban_list_entry", entity=name, expires=exp))
-
-    header = t("vcban_list_header", count=len(lines))
-    await interaction.response.send_message(
-        header + "\n" + "\n".join(lines),
-        ephemeral=True
-    )
+    banned = list(banned)
+    await PagedListView(
+        interaction.guild_id,
+        t("vcban_list_header", interaction.guild_id, count=len(banned)),
+        len(banned),
+        _entry_lines(interaction.guild, banned, "vcban_list_entry")
+    ).send(interaction)
 
 
 @tree.command(
@@ -765,28 +3938,17 @@ async def vcperm_list(interaction: discord.Interaction):
     if not allowed:
         total = interaction.guild.member_count
         return await interaction.response.send_message(
-            t("vcperm_list_all", count=total),
+            t("vcperm_list_all", interaction.guild_id, count=total),
             ephemeral=True
         )
 
-    lines = []
-    for e in allowed:
-        if e["type"] == "user":
-            m    = interaction.guild.get_member(e["id"])
-            name = m.mention if m else f"`User ID {e['id']}`"
-        else:
-            r    = interaction.guild.get_role(e["id"])
-            name = r.mention if r else f"`Role ID {e['id']}`"
-
-        exp = datetime.utcfromtimestamp(e["expires"]).strftime("%Y-%m-%d %H:%M UTC") \
-              if e["expires"] else t("never")
-        lines.append(t("vcperm_list_entry", entity=name, expires=exp))
-
-    header = t("vcperm_list_header", count=len(lines))
-    await interaction.response.send_message(
-        header + "\n" + "\n".join(lines),
-        ephemeral=True
-    )
+    allowed = list(allowed)
+    await PagedListView(
+        interaction.guild_id,
+        t("vcperm_list_header", interaction.guild_id, count=len(allowed)),
+        len(allowed),
+        _entry_lines(interaction.guild, allowed, "vcperm_list_entry")
+    ).send(interaction)
 
 
 @tree.command(
@@ -800,35 +3962,30 @@ async def vcrevoke_list(interaction: discord.Interaction):
     allowed = perms.get("allowed", [])
     banned  = perms.get("banned", [])
 
-    lines = []
-
     if allowed:
-        allowed_ids = {e["id"] for e in allowed if e["type"] == "user"}
-        for m in interaction.guild.members:
-            if m.guild_permissions.administrator:
-                continue
-            if m.id not in allowed_ids:
-                lines.append(m.mention)
-        header = t("vcrevoke_list_header", count=len(lines))
+        # Cached per guild and kept current incrementally; only a cold cache scans the members
+        if not denied_members.ready(gid):
+            await interaction.response.defer(ephemeral=True, thinking=True)
+        ids = sorted(await denied_members.get(interaction.guild))
+        view = PagedListView(
+            interaction.guild_id,
+            t("vcrevoke_list_header", interaction.guild_id, count=len(ids)),
+            len(ids),
+            _mention_lines(ids)
+        )
     else:
         if not banned:
             return await interaction.response.send_message(
-                t("vcrevoke_list_empty"), ephemeral=True
+                t("vcrevoke_list_empty", interaction.guild_id), ephemeral=True
             )
-        for e in banned:
-            if e["type"] == "user":
-                m    = interaction.guild.get_member(e["id"])
-                name = m.mention if m else f"`User ID {e['id']}`"
-            else:
-                r    = interaction.guild.get_role(e["id"])
-                name = r.mention if r else f"`Role ID {e['id']}`"
-            lines.append(name)
-        header = t("vcrevoke_list_banned_header", count=len(lines))
-
-    await interaction.response.send_message(
-        header + "\n" + "\n".join(lines),
-        ephemeral=True
-    )
+        banned = list(banned)
+        view = PagedListView(
+            interaction.guild_id,
+            t("vcrevoke_list_banned_header", interaction.guild_id, count=len(banned)),
+            len(banned),
+            _entity_lines(interaction.guild, banned)
+        )
+    await view.send(interaction)
 
 @tree.command(
     name="vcperm_grant_all",
@@ -839,9 +3996,11 @@ async def vcperm_grant_all(interaction: discord.Interaction):
     gid = str(interaction.guild.id)
     cfg = config["guilds"].setdefault(gid, {})
     cfg["permissions"] = {"allowed": [], "banned": []}
-    save_config()
+    perm_indexes[gid] = PermissionIndex()
+    denied_members.invalidate(gid)
+    save_config(gid, permissions=True)
     await interaction.response.send_message(
-        t("vcperm_grant_all_success"), ephemeral=True
+        t("vcperm_grant_all_success", interaction.guild_id), ephemeral=True
     )
 
 @tree.command(
@@ -856,202 +4015,255 @@ async def vcperm_revoke_all(interaction: discord.Interaction):
         "allowed": [],
         "banned": [{"type":"role", "id": interaction.guild.default_role.id, "expires": None}]
     }
-    save_config()
+    perm_indexes[gid] = PermissionIndex.build(cfg["permissions"])
+    denied_members.invalidate(gid)
+    save_config(gid, permissions=True)
     await interaction.response.send_message(
-        t("vcperm_revoke_all_success"), ephemeral=True
+        t("vcperm_revoke_all_success", interaction.guild_id), ephemeral=True
     )
     
 # —————————————————— SLASH-COMMANDS FOR PRIVATE VC MANAGEMENT ——————————————————
 
 @tree.command(name="limit", description=t("cmd_limit_desc"))
 async def limit_cmd(interaction: discord.Interaction, number: int):
-    data = get_user_vc(interaction.user.id)
+    data = get_user_vc(interaction.user.id, interaction.guild_id)
     if not data:
         return await interaction.response.send_message(
-            t("error_not_owner"), ephemeral=True
+            t("error_not_owner", interaction.guild_id), ephemeral=True
         )
     n = max(0, min(99, number))
-    await data["channel"].edit(user_limit=n)
-    update_template_from_channel(data["owner"], data["channel"], data["deputies"])
-    await interaction.response.send_message(
-        t("modal_limit_success", limit=n), ephemeral=True
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    channel = await edit_channel(data.channel, user_limit=n)
+    update_template_from_channel(data.owner, channel, data.deputies)
+    await interaction.followup.send(
+        t("modal_limit_success", interaction.guild_id, limit=n), ephemeral=True
     )
 
 @tree.command(name="rename", description=t("cmd_rename_desc"))
 async def rename_cmd(interaction: discord.Interaction, name: str):
-    data = get_user_vc(interaction.user.id)
+    data = get_user_vc(interaction.user.id, interaction.guild_id)
     if not data:
         return await interaction.response.send_message(
-            t("error_not_owner"), ephemeral=True
+            t("error_not_owner", interaction.guild_id), ephemeral=True
         )
-    await data["channel"].edit(name=name)
-    update_template_from_channel(data["owner"], data["channel"], data["deputies"])
-    await interaction.response.send_message(
-        t("modal_rename_success", name=name), ephemeral=True
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    channel = await edit_channel(data.channel, name=name)
+    update_template_from_channel(data.owner, channel, data.deputies)
+    await interaction.followup.send(
+        t("modal_rename_success", interaction.guild_id, name=name), ephemeral=True
     )
 
 @tree.command(name="invite", description=t("cmd_invite_desc"))
 async def invite_cmd(interaction: discord.Interaction, user: discord.Member):
-    data = get_user_vc(interaction.user.id)
+    data = get_user_vc(interaction.user.id, interaction.guild_id)
     if not data:
         return await interaction.response.send_message(
-            t("error_not_owner"), ephemeral=True
+            t("error_not_owner", interaction.guild_id), ephemeral=True
         )
-    perms = data["channel"].overwrites
-    perms[user] = discord.PermissionOverwrite(view_channel=True, connect=True)
-    await data["channel"].edit(overwrites=perms)
-    update_template_from_channel(data["owner"], data["channel"], data["deputies"])
-    await interaction.response.send_message(
-        t("modal_invite_success", user=user.mention), ephemeral=True
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    channel = await edit_channel(data.channel, {
+        user: discord.PermissionOverwrite(view_channel=True, connect=True)
+    })
+    update_template_from_channel(data.owner, channel, data.deputies)
+    await interaction.followup.send(
+        t("modal_invite_success", interaction.guild_id, user=user.mention), ephemeral=True
     )
 
 @tree.command(name="kick", description=t("cmd_kick_desc"))
 async def kick_cmd(interaction: discord.Interaction, user: discord.Member):
-    data = get_user_vc(interaction.user.id)
+    data = get_user_vc(interaction.user.id, interaction.guild_id)
     if not data:
         return await interaction.response.send_message(
-            t("error_not_owner"), ephemeral=True
+            t("error_not_owner", interaction.guild_id), ephemeral=True
         )
-    perms = data["channel"].overwrites
-    perms[user] = discord.PermissionOverwrite(connect=False)
-    await data["channel"].edit(overwrites=perms)
-    update_template_from_channel(data["owner"], data["channel"], data["deputies"])
-    await interaction.response.send_message(
-        t("modal_kick_success", user=user.mention), ephemeral=True
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    channel = await edit_channel(data.channel, {user: discord.PermissionOverwrite(connect=False)})
+    update_template_from_channel(data.owner, channel, data.deputies)
+    await interaction.followup.send(
+        t("modal_kick_success", interaction.guild_id, user=user.mention), ephemeral=True
     )
 
 @tree.command(name="assign", description=t("cmd_assign_desc"))
 async def assign_cmd(interaction: discord.Interaction, user: discord.Member):
-    data = get_user_vc(interaction.user.id)
+    data = get_user_vc(interaction.user.id, interaction.guild_id)
     if not data:
         return await interaction.response.send_message(
-            t("error_not_owner"), ephemeral=True
+            t("error_not_owner", interaction.guild_id), ephemeral=True
         )
-    deps = data.setdefault("deputies", [])
-    if user.id in deps:
+    if data.is_deputy(user.id):
         return await interaction.response.send_message(
-            f"❌ {user.mention} {t('button_assign').lower()}.", ephemeral=True
+            f"❌ {user.mention} {t('button_assign', interaction.guild_id).lower()}.", ephemeral=True
         )
-    deps.append(user.id)
-    perms = data["channel"].overwrites
-    perms[user] = discord.PermissionOverwrite(
-        view_channel=True, connect=True, manage_channels=True
-    )
-    await data["channel"].edit(overwrites=perms)
-    update_template_from_channel(data["owner"], data["channel"], deps)
-    await interaction.response.send_message(
-        f"✅ {user.mention} {t('button_assign').lower()}!", ephemeral=True
+    data.add_deputy(user.id)
+    private_vcs.changed()
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    channel = await edit_channel(data.channel, {
+        user: discord.PermissionOverwrite(view_channel=True, connect=True, manage_channels=True)
+    })
+    update_template_from_channel(data.owner, channel, data.deputies)
+    await interaction.followup.send(
+        f"✅ {user.mention} {t('button_assign', interaction.guild_id).lower()}!", ephemeral=True
     )
 
 @tree.command(name="unassign", description=t("cmd_unassign_desc"))
 async def unassign_cmd(interaction: discord.Interaction, user: discord.Member):
-    data = get_user_vc(interaction.user.id)
+    data = get_user_vc(interaction.user.id, interaction.guild_id)
     if not data:
         return await interaction.response.send_message(
-            t("error_not_owner"), ephemeral=True
+            t("error_not_owner", interaction.guild_id), ephemeral=True
         )
-    deps = data.get("deputies", [])
-    if user.id not in deps:
+    if not data.is_deputy(user.id):
         return await interaction.response.send_message(
-            f"❌ {user.mention} {t('button_unassign').lower()}.", ephemeral=True
+            f"❌ {user.mention} {t('button_unassign', interaction.guild_id).lower()}.", ephemeral=True
         )
-    deps.remove(user.id)
-    perms = data["channel"].overwrites
-    perms.pop(user, None)
-    await data["channel"].edit(overwrites=perms)
-    update_template_from_channel(data["owner"], data["channel"], deps)
-    await interaction.response.send_message(
-        f"✅ {user.mention} {t('button_unassign').lower()}!", ephemeral=True
+    data.remove_deputy(user.id)
+    private_vcs.changed()
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    channel = await edit_channel(data.channel, {user: None})
+    update_template_from_channel(data.owner, channel, data.deputies)
+    await interaction.followup.send(
+        f"✅ {user.mention} {t('button_unassign', interaction.guild_id).lower()}!", ephemeral=True
     )
 
 @tree.command(name="delete", description=t("cmd_delete_desc"))
 async def delete_cmd(interaction: discord.Interaction):
-    data = get_user_vc(interaction.user.id)
+    data = get_user_vc(interaction.user.id, interaction.guild_id)
     if not data:
         return await interaction.response.send_message(
-            t("error_not_owner"), ephemeral=True
+            t("error_not_owner", interaction.guild_id), ephemeral=True
         )
-    await data["channel"].delete()
-    if data["thread"]:
-        await data["thread"].delete()
-    private_vcs.pop(data["channel"].id, None)
-    await interaction.response.send_message(
-        t("button_delete"), ephemeral=True
-    )
+    await _delete_and_reply(interaction, data.channel_id)
 
 @tree.command(name="lock", description=t("cmd_lock_desc"))
 async def lock_cmd(interaction: discord.Interaction):
-    data = get_user_vc(interaction.user.id)
+    data = get_user_vc(interaction.user.id, interaction.guild_id)
     if not data:
         return await interaction.response.send_message(
-            t("error_not_owner"), ephemeral=True
+            t("error_not_owner", interaction.guild_id), ephemeral=True
         )
-    perms = data["channel"].overwrites
-    default = perms.get(data["channel"].guild.default_role, discord.PermissionOverwrite())
-    perms[data["channel"].guild.default_role] = discord.PermissionOverwrite(
-        connect=False, view_channel=default.view_channel
-    )
-    await data["channel"].edit(overwrites=perms)
-    update_template_from_channel(data["owner"], data["channel"], data["deputies"])
-    await interaction.response.send_message(
-        t("button_lock"), ephemeral=True
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    channel = await edit_channel(data.channel, {data.channel.guild.default_role: {"connect": False}})
+    update_template_from_channel(data.owner, channel, data.deputies)
+    await interaction.followup.send(
+        t("button_lock", interaction.guild_id), ephemeral=True
     )
 
 @tree.command(name="unlock", description=t("cmd_unlock_desc"))
 async def unlock_cmd(interaction: discord.Interaction):
-    data = get_user_vc(interaction.user.id)
+    data = get_user_vc(interaction.user.id, interaction.guild_id)
     if not data:
         return await interaction.response.send_message(
-            t("error_not_owner"), ephemeral=True
+            t("error_not_owner", interaction.guild_id), ephemeral=True
         )
-    perms = data["channel"].overwrites
-    default = perms.get(data["channel"].guild.default_role, discord.PermissionOverwrite())
-    perms[data["channel"].guild.default_role] = discord.PermissionOverwrite(
-        connect=True, view_channel=default.view_channel
-    )
-    await data["channel"].edit(overwrites=perms)
-    update_template_from_channel(data["owner"], data["channel"], data["deputies"])
-    await interaction.response.send_message(
-        t("button_unlock"), ephemeral=True
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    channel = await edit_channel(data.channel, {data.channel.guild.default_role: {"connect": True}})
+    update_template_from_channel(data.owner, channel, data.deputies)
+    await interaction.followup.send(
+        t("button_unlock", interaction.guild_id), ephemeral=True
     )
 
 @tree.command(name="visible", description=t("cmd_visible_desc"))
 async def visible_cmd(interaction: discord.Interaction):
-    data = get_user_vc(interaction.user.id)
+    data = get_user_vc(interaction.user.id, interaction.guild_id)
     if not data:
         return await interaction.response.send_message(
-            t("error_not_owner"), ephemeral=True
+            t("error_not_owner", interaction.guild_id), ephemeral=True
         )
-    perms = data["channel"].overwrites
-    default = perms.get(data["channel"].guild.default_role, discord.PermissionOverwrite())
-    perms[data["channel"].guild.default_role] = discord.PermissionOverwrite(
-        view_channel=True, connect=default.connect
-    )
-    await data["channel"].edit(overwrites=perms)
-    update_template_from_channel(data["owner"], data["channel"], data["deputies"])
-    await interaction.response.send_message(
-        t("button_visible"), ephemeral=True
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    channel = await edit_channel(data.channel, {data.channel.guild.default_role: {"view_channel": True}})
+    update_template_from_channel(data.owner, channel, data.deputies)
+    await interaction.followup.send(
+        t("button_visible", interaction.guild_id), ephemeral=True
     )
 
 @tree.command(name="invisible", description=t("cmd_invisible_desc"))
 async def invisible_cmd(interaction: discord.Interaction):
-    data = get_user_vc(interaction.user.id)
+    data = get_user_vc(interaction.user.id, interaction.guild_id)
     if not data:
         return await interaction.response.send_message(
-            t("error_not_owner"), ephemeral=True
+            t("error_not_owner", interaction.guild_id), ephemeral=True
         )
-    perms = data["channel"].overwrites
-    default = perms.get(data["channel"].guild.default_role, discord.PermissionOverwrite())
-    perms[data["channel"].guild.default_role] = discord.PermissionOverwrite(
-        view_channel=False, connect=default.connect
-    )
-    await data["channel"].edit(overwrites=perms)
-    update_template_from_channel(data["owner"], data["channel"], data["deputies"])
-    await interaction.response.send_message(
-        t("button_invisible"), ephemeral=True
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    channel = await edit_channel(data.channel, {data.channel.guild.default_role: {"view_channel": False}})
+    update_template_from_channel(data.owner, channel, data.deputies)
+    await interaction.followup.send(
+        t("button_invisible", interaction.guild_id), ephemeral=True
     )
 
 
+# ——— Cluster Launcher ————————————————————————————————————————————
+WORKER_RESTART_DELAY = 5  # seconds before a crashed worker is started again
+
+async def _gateway_info(token: str) -> tuple[int, int]:
+    """Recommended shard count and identify concurrency from GET /gateway/bot."""
+    http = discord.http.HTTPClient(asyncio.get_running_loop())
+    try:
+        await http.static_login(token)
+        shards, _, limits = await http.get_bot_gateway()
+    finally:
+        await http.close()
+    return shards, limits.get("max_concurrency", 1)
+
+def run_cluster(token: str):
+    """Run WORKERS bot processes, each on a contiguous range of shards, restarting crashed ones."""
+    recommended, max_concurrency = asyncio.run(_gateway_info(token))
+    shard_count = SHARD_COUNT or max(recommended, WORKERS)
+    workers = min(WORKERS, shard_count)
+    ranges = [range(i * shard_count // workers, (i + 1) * shard_count // workers) for i in range(workers)]
+    procs: dict[int, subprocess.Popen] = {}
+    restart_at: dict[int, float] = {}
+    stopping = False
+
+    def start(i: int):
+        shards = ranges[i]
+        env = dict(os.environ, BOT_WORKERS="1", BOT_SHARD_COUNT=str(shard_count),
+                   BOT_SHARD_IDS=f"{shards.start}-{shards.stop - 1}")
+        if METRICS_PORT:
+            env["BOT_METRICS_PORT"] = str(METRICS_PORT + i)  # one endpoint per worker
+        procs[i] = subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env)
+        print(f"🚀 Worker {i} (pid {procs[i].pid}): shards {shards.start}-{shards.stop - 1} of {shard_count}")
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for i, shards in enumerate(ranges):
+            if stopping:
+                break
+            start(i)
+            # Discord allows max_concurrency identifies per 5 s across all processes
+            time.sleep(5 * math.ceil(len(shards) / max_concurrency))
+        while not stopping:
+            time.sleep(1)
+            for i, proc in procs.items():
+                code = proc.poll()
+                if code in (None, 0):
+                    continue
+                if i not in restart_at:
+                    print(f"⚠️ Worker {i} exited with {code}, restarting in {WORKER_RESTART_DELAY}s")
+                    restart_at[i] = time.monotonic() + WORKER_RESTART_DELAY
+                elif time.monotonic() >= restart_at[i]:
+                    del restart_at[i]
+                    start(i)
+    except KeyboardInterrupt:
+        pass  # Ctrl+C already reached every worker in the process group
+    else:
+        # SIGINT lets each worker close the bot and flush its state
+        for proc in procs.values():
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGINT)
+    for proc in procs.values():
+        proc.wait()
+
+
 # ─── Run Bot ───────────────────────────────────────────────────────────────────
 if __name__ == "__main__":
-    bot.run(os.getenv("TOKEN"))
+    if WORKERS > 1 and not SHARD_IDS:
+        run_cluster(os.getenv("TOKEN"))
+    else:
+        startup.mark("init")
+        bot.run(os.getenv("TOKEN"))
+        for store in PERSISTED_FILES:
+            store.flush_sync()